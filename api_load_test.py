@@ -0,0 +1,137 @@
+"""
+Load-test client for the APU Programming Café API server (api_server.py).
+
+Opens many concurrent keep-alive connections. Each simulated client logs in, then
+issues a mix of reads (modules, invoice, schedule) and writes (send and delete an
+enrollment request) and logs out. Prints throughput and latency percentiles.
+
+Usage: python api_load_test.py [--clients 200] [--requests 20]
+                               [--email alice@apu.edu.my] [--password pass123]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+READ_PATHS = ["/modules", "/student/invoice", "/student/schedule", "/student/requests"]
+
+
+async def call(reader, writer, method, path, payload=None, token=None):
+    """Send one request on an open connection and return (status, body)"""
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    headers = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    if payload is not None:
+        headers.append("Content-Type: application/json")
+    if token:
+        headers.append(f"Authorization: Bearer {token}")
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    data = await reader.readexactly(length) if length else b"{}"
+    return status, json.loads(data)
+
+async def timed_call(stats, reader, writer, method, path, payload=None, token=None):
+    """Make a call and record its latency and outcome"""
+    start = time.perf_counter()
+    status, data = await call(reader, writer, method, path, payload, token)
+    stats["latencies"].append(time.perf_counter() - start)
+    if status >= 500:
+        stats["errors"] += 1
+    return status, data
+
+async def run_client(args, stats, modules):
+    """One simulated user session"""
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    except OSError:
+        stats["errors"] += 1
+        return
+
+    try:
+        status, data = await timed_call(stats, reader, writer, "POST", "/login",
+                                        {"email": args.email, "password": args.password})
+        if status != 200:
+            stats["errors"] += 1
+            return
+        token = data["data"]["token"]
+
+        for _ in range(args.requests):
+            if modules and random.random() < args.write_ratio:
+                module = random.choice(modules)
+                status, _ = await timed_call(stats, reader, writer, "POST", "/student/request",
+                                             {"module": module["module"], "level": module["level"]}, token)
+                if status == 200:
+                    await timed_call(stats, reader, writer, "POST", "/student/delete_request",
+                                     {"number": 1}, token)
+            else:
+                await timed_call(stats, reader, writer, "GET", random.choice(READ_PATHS), token=token)
+
+        await timed_call(stats, reader, writer, "POST", "/logout", {}, token)
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        stats["errors"] += 1
+    finally:
+        writer.close()
+
+def percentile(sorted_values, fraction):
+    """Return the value at a fraction (0-1) of a sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_load_test(args):
+    """Run all clients concurrently and print a summary"""
+    # Fetch the module list once with a throwaway session
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    status, data = await call(reader, writer, "POST", "/login", {"email": args.email, "password": args.password})
+    if status != 200:
+        print(f"Login failed for {args.email}: {data.get('error')}")
+        writer.close()
+        return
+    token = data["data"]["token"]
+    _, data = await call(reader, writer, "GET", "/modules", token=token)
+    modules = data.get("data", [])
+    await call(reader, writer, "POST", "/logout", {}, token)
+    writer.close()
+
+    stats = {"latencies": [], "errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(args, stats, modules) for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(stats["latencies"])
+    print("\n=== API Load Test Results ===")
+    print(f"Clients: {args.clients}")
+    print(f"Requests completed: {len(latencies)}")
+    print(f"Errors: {stats['errors']}")
+    print(f"Elapsed: {elapsed:.2f}s")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} requests/sec" if elapsed else "Throughput: n/a")
+    print(f"Latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms")
+    print(f"Latency p95: {percentile(latencies, 0.95) * 1000:.1f} ms")
+    print(f"Latency p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+def main():
+    """Parse arguments and run the load test"""
+    parser = argparse.ArgumentParser(description="Load-test the APU Programming Café API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=200, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=20, help="requests per user after login")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="fraction of requests that write")
+    parser.add_argument("--email", default="alice@apu.edu.my", help="student account to log in as")
+    parser.add_argument("--password", default="pass123")
+    asyncio.run(run_load_test(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,769 @@
+"""
+Asyncio HTTP/JSON API server for the APU Programming Café Management System.
+
+Exposes the administrator, trainer, lecturer and student operations to the kiosk
+and web front ends. Clients log in with the same email/password as the interactive
+menu (POST /login) and send the returned token as "Authorization: Bearer <token>".
+
+Reads are answered from one in-process indexed copy of the data files, which is
+brought up to date incrementally before each request, including after writes made
+by other processes. Writes are queued to a single writer task, which applies them
+through the shared data operations one at a time.
+The notifications those operations queue are delivered by a background worker
+thread, never on the request path.
+
+Usage: python api_server.py [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+import programming_management_system as pms
+
+SESSION_TIMEOUT = 3600          # seconds of inactivity before a token expires
+MAX_BODY_SIZE = 1024 * 1024     # bytes
+ANY_ROLE = "any"
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+               404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+               500: "Internal Server Error"}
+
+SESSIONS = {}       # token -> {"username", "role", "expires"}
+INDEX = {}          # table name -> indexed copy of that data file
+WRITE_QUEUE = None  # created when the server starts
+
+
+class ApiError(Exception):
+    """Error returned to the client as a JSON response with an HTTP status"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# ============= INDEXED DATA =============
+# The index is built once and then followed like a log: lines appended to a
+# data file since the last look are folded into it, fixed-width status changes
+# are applied from their events, and a table is only built again when one of
+# its files was replaced or shrunk. Before every request the data files'
+# signatures are compared with the ones the index was read at, so writes made
+# by other processes (the menus, scheduled jobs) are picked up as well.
+
+ALL_TABLES = ("users", "trainers", "classes", "enrollments", "requests", "feedback")
+
+INDEX_STATE = {"signature": None, "events": None, "followers": {}, "lock": None}
+
+# Events whose change is a status patched in place, with the table they patch
+PATCH_EVENTS = {"payment_made": "enrollments", "request_status_changed": "requests"}
+
+# Events that change rows without touching their files' lines (student details kept in profiles)
+REBUILD_EVENTS = {"profile_updated": "enrollments"}
+
+def enrollment_to_dict(fields):
+    """Convert a zstudents.txt row to a dictionary"""
+    fields = fields + ["TBD"] * (12 - len(fields))
+    return {"name": fields[0], "tp_number": fields[1], "module": fields[2], "level": fields[3],
+            "trainer": fields[4], "email": fields[5], "contact": fields[6], "month": fields[7],
+            "charges": fields[8], "status": fields[9], "student_id": fields[10], "address": fields[11]}
+
+def new_table(table):
+    """Return the empty indexed form of a table"""
+    if table == "users":
+        return {}
+    if table == "classes":
+        return {"by_trainer": {}, "by_key": {}}
+    if table == "enrollments":
+        return {"by_student": {}, "by_trainer": {}, "by_tp": {}}
+    if table in ("requests", "feedback"):
+        return []
+    raise ValueError(f"Unknown table: {table}")
+
+def add_lines(table, data, lines, first=1, profiles=None):
+    """Fold data file lines into a table's indexed form; first is the line number of the first one.
+    Returns the number of lines."""
+    count = 0
+    for count, line in enumerate(lines, 1):
+        fields = line.strip().split(",")
+        if table == "users":
+            if len(fields) >= 4:
+                data[fields[0]] = {"username": fields[0], "email": fields[1], "role": fields[3]}
+
+        elif table == "classes":
+            if len(fields) >= 3:
+                fields = fields + ["TBD"] * (5 - len(fields))
+                entry = {"module": fields[0], "trainer": fields[1], "level": fields[2],
+                         "charges": fields[3], "schedule": fields[4],
+                         "capacity": int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else None}
+                data["by_trainer"].setdefault(fields[1], []).append(entry)
+                data["by_key"].setdefault((fields[0], fields[2]), []).append(entry)
+
+        elif table == "enrollments":
+            if len(fields) >= 10:
+                entry = enrollment_to_dict(pms.expand_enrollment(fields, profiles) if profiles else fields)
+                data["by_student"].setdefault(entry["name"], []).append(entry)
+                data["by_trainer"].setdefault(entry["trainer"], []).append(entry)
+                data["by_tp"].setdefault(entry["tp_number"], []).append(entry)
+
+        elif table == "requests":
+            if len(fields) >= 4:
+                data.append({"number": first + count - 1, "student": fields[0], "module": fields[1],
+                             "level": fields[2], "status": fields[3],
+                             "timestamp": fields[4] if len(fields) > 4 else "",
+                             "decided_at": fields[5] if len(fields) > 5 else ""})
+
+        elif line.strip():
+            data.append(line.strip())
+    return count
+
+def apply_patch_event(event):
+    """Apply a status that was patched in place to the indexed rows it changed"""
+    data = event["data"]
+    if event["type"] == "payment_made":
+        month = pms.partition_key(data["month"]) if data.get("month") else None
+        for entry in INDEX["enrollments"]["by_student"].get(data["student"], []):
+            if entry["status"] == "unpaid" and (month is None or pms.partition_key(entry["month"]) == month):
+                entry["status"] = "paid"
+        return
+
+    key = (data["student"], data["module"], data["level"], data["timestamp"], data["old_status"])
+    for entry in INDEX["requests"]:
+        if (entry["student"], entry["module"], entry["level"], entry["timestamp"], entry["status"]) == key:
+            entry["status"] = data["new_status"]
+            if data.get("decided_at"):
+                entry["decided_at"] = data["decided_at"]
+            break
+
+def table_files(table):
+    """Return the data files a table is indexed from"""
+    if table == "enrollments":
+        return [file_path for _, file_path in pms.enrollment_files()]
+    return [{"users": pms.USER_FILE, "trainers": pms.TRAINERS_FILE, "classes": pms.TRAINER_MODULES_FILE,
+             "requests": pms.REQUESTS_FILE, "feedback": pms.FEEDBACK_FILE}[table]]
+
+def follow_from_end(file_path, lines):
+    """Follow a file that was just read in full; lines is how many lines it had"""
+    follower = pms.follow_file(file_path)
+    follower.update(signature=pms.file_signature(file_path), totals={"lines": lines})
+    try:
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            f.seek(max(stat.st_size - 1, 0))
+            last = f.read(1)
+    except FileNotFoundError:
+        return follower
+    # Without a final newline the next append_line starts with one, so the file is read again then
+    if last in (b"", b"\n"):
+        follower.update(inode=stat.st_ino, offset=stat.st_size)
+    return follower
+
+def build_table(table):
+    """Load a table's data files into its indexed form; returns (data, {file path: follower})"""
+    if table == "trainers":
+        return pms.read_trainers(), {pms.TRAINERS_FILE: follow_from_end(pms.TRAINERS_FILE, 0)}
+
+    data = new_table(table)
+    profiles = pms.enrollment_profiles() if table == "enrollments" else None
+    followers = {}
+    for file_path in table_files(table):
+        try:
+            count = add_lines(table, data, pms.iter_data_lines(file_path), 1, profiles)
+        except FileNotFoundError:
+            count = 0
+        followers[file_path] = follow_from_end(file_path, count)
+    return data, followers
+
+def read_appended(table):
+    """Return [(new lines, number of the first)] for a table's files, or None if it has to be built again"""
+    followers = INDEX_STATE["followers"].get(table)
+    file_paths = table_files(table)
+    if followers is None or not set(followers) <= set(file_paths):
+        return None
+    for file_path in file_paths:
+        if file_path not in followers:
+            # A partition added since the last refresh is read from its start
+            follower = followers[file_path] = pms.follow_file(file_path)
+            follower.update(signature=None, totals={"lines": 0})
+            if os.path.exists(file_path):
+                follower["inode"] = os.stat(file_path).st_ino
+
+    appended = []
+    for file_path, follower in followers.items():
+        signature = pms.file_signature(file_path)
+        if signature == follower["signature"]:
+            continue
+        if table == "trainers":
+            # Removals are tombstone lines, so the roster is simply read again
+            return None
+        lines, reloaded = pms.read_new_lines(follower)
+        if reloaded:
+            return None
+        follower["signature"] = signature
+        appended.append((lines, follower["totals"]["lines"] + 1))
+        follower["totals"]["lines"] += len(lines)
+    return appended
+
+def index_signature():
+    """Return the signatures of the files that change whenever the indexed data does"""
+    return tuple(pms.file_signature(file_path) for file_path in
+                 (pms.EVENTS_FILE, pms.USER_FILE, pms.TRAINERS_FILE, pms.TRAINER_MODULES_FILE,
+                  pms.STUDENTS_FILE, pms.PARTITION_MANIFEST_FILE, pms.REQUESTS_FILE, pms.FEEDBACK_FILE))
+
+def read_index_changes():
+    """Read what changed in the data files since the index was last refreshed"""
+    changes = {"signature": None, "tables": {}, "lines": [], "patches": [], "profiles": None}
+    try:
+        with pms.transaction():
+            # Under the data lock the tables and the event log are read at one point in time
+            changes["signature"] = index_signature()
+            if changes["signature"] == INDEX_STATE["signature"]:
+                return changes
+
+            stale = set()
+            if INDEX_STATE["events"] is None:
+                stale.update(ALL_TABLES)
+                INDEX_STATE["events"] = follow_from_end(pms.EVENTS_FILE, 0)
+            else:
+                lines, reloaded = pms.read_new_lines(INDEX_STATE["events"])
+                if reloaded:
+                    stale.update(ALL_TABLES)
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event["type"] in PATCH_EVENTS:
+                        changes["patches"].append(event)
+                    elif event["type"] in REBUILD_EVENTS:
+                        stale.add(REBUILD_EVENTS[event["type"]])
+
+            for table in ALL_TABLES:
+                appended = None if table in stale else read_appended(table)
+                if appended is None:
+                    stale.add(table)
+                else:
+                    changes["lines"].extend((table, lines, number) for lines, number in appended if lines)
+            for table in stale:
+                changes["tables"][table], INDEX_STATE["followers"][table] = build_table(table)
+            # A table built again already has its patched statuses
+            changes["patches"] = [e for e in changes["patches"] if PATCH_EVENTS[e["type"]] not in stale]
+            changes["profiles"] = pms.enrollment_profiles()
+    except BaseException:
+        # The followers may have moved past changes that were never applied
+        INDEX_STATE["events"] = None
+        raise
+    return changes
+
+def apply_index_changes(changes):
+    """Fold changes read by read_index_changes into the index"""
+    INDEX.update(changes["tables"])
+    for table, lines, number in changes["lines"]:
+        add_lines(table, INDEX[table], lines, number, changes["profiles"])
+    for event in changes["patches"]:
+        apply_patch_event(event)
+    INDEX_STATE["signature"] = changes["signature"]
+
+async def refresh_index():
+    """Bring the index up to date with the data files, whichever process wrote them"""
+    if index_signature() == INDEX_STATE["signature"]:
+        return
+    async with INDEX_STATE["lock"]:
+        # Reading runs in a worker thread; the index itself only changes here, between requests
+        changes = await asyncio.get_running_loop().run_in_executor(None, read_index_changes)
+        apply_index_changes(changes)
+
+# ============= SINGLE WRITER =============
+
+async def writer_task():
+    """Apply queued writes one at a time and bring the index up to date after each"""
+    loop = asyncio.get_running_loop()
+    while True:
+        func, args, future = await WRITE_QUEUE.get()
+        try:
+            result = await loop.run_in_executor(None, func, *args)
+            await refresh_index()
+            if not future.cancelled():
+                future.set_result(result)
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        finally:
+            WRITE_QUEUE.task_done()
+
+async def submit_write(func, args):
+    """Queue a shared data operation for the writer and wait for its (success, message)"""
+    future = asyncio.get_running_loop().create_future()
+    await WRITE_QUEUE.put((func, args, future))
+    success, message = await future
+    if not success:
+        raise ApiError(400, message)
+    return message
+
+# ============= REQUEST HELPERS =============
+
+def require(params, name, validation_func=None, error_msg=None, separators=pms.FIELD_SEPARATORS):
+    """Return a required, validated string parameter"""
+    value = params.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(400, f"Missing parameter: {name}")
+    value = value.strip()
+    # Values are written into comma/newline-separated records
+    if not pms.validate_field(value, separators):
+        raise ApiError(400, f"Parameter {name} may not contain {'commas or ' if ',' in separators else ''}line breaks.")
+    if validation_func is not None and not validation_func(value):
+        raise ApiError(400, error_msg or f"Invalid value for {name}.")
+    return value
+
+def optional(params, name, validation_func=None, error_msg=None, default=None):
+    """Return a validated string parameter, or default when it is absent or blank"""
+    value = params.get(name)
+    if value is None or not str(value).strip():
+        return default
+    return require({name: str(value)}, name, validation_func, error_msg)
+
+def require_level(params, name="level"):
+    """Return a required coaching level parameter"""
+    return require(params, name, pms.validate_level, f"Level must be one of: {', '.join(pms.LEVELS)}")
+
+def require_int(params, name):
+    """Return a required integer parameter"""
+    try:
+        return int(params.get(name))
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Parameter {name} must be a number.")
+
+# ============= SESSION HANDLERS =============
+
+async def handle_login(session, params):
+    """Issue a session token for valid credentials"""
+    email = require(params, "email")
+    password = require(params, "password")
+    user = await asyncio.get_running_loop().run_in_executor(None, pms.authenticate, email, password)
+    if not user:
+        raise ApiError(401, "Invalid credentials.")
+
+    token = secrets.token_urlsafe(32)
+    SESSIONS[token] = {"username": user[0], "role": user[1], "expires": time.time() + SESSION_TIMEOUT}
+    return {"token": token, "username": user[0], "role": user[1], "role_name": pms.ROLE_NAMES.get(user[1])}
+
+async def handle_logout(session, params):
+    """Revoke the caller's session token"""
+    SESSIONS.pop(session["token"], None)
+    return "Logged out."
+
+async def handle_modules(session, params):
+    """List available modules, levels and trainers"""
+    classes = [entry for entries in INDEX["classes"]["by_trainer"].values() for entry in entries]
+    return sorted(classes, key=lambda c: (c["module"], c["level"], c["trainer"]))
+
+async def handle_update_profile(session, params):
+    """Update the caller's email and/or password"""
+    new_email = optional(params, "email", pms.validate_email, "Invalid email format.")
+    new_password = optional(params, "password", pms.validate_password, "Password must be at least 6 characters long.")
+    return await submit_write(pms.update_user_profile, (session["username"], new_email, new_password))
+
+# ============= ADMINISTRATOR HANDLERS =============
+
+async def handle_admin_users(session, params):
+    """List all user accounts"""
+    return sorted(INDEX["users"].values(), key=lambda u: u["username"])
+
+async def handle_admin_register_user(session, params):
+    """Register a user of any role"""
+    username = require(params, "username", pms.validate_username, "Username must be at least 3 characters long.")
+    email = require(params, "email", pms.validate_email, "Please enter a valid email address.")
+    password = require(params, "password", pms.validate_password, "Password must be at least 6 characters long.")
+    role = require(params, "role", lambda x: x in pms.ROLE_NAMES, "Please enter a valid role (a/b/c/d).")
+    return await submit_write(pms.add_user, (username, email, password, role))
+
+async def handle_admin_delete_user(session, params):
+    """Delete a user account and revoke its sessions"""
+    username = require(params, "username")
+    message = await submit_write(pms.remove_user, (username,))
+    for token, other in list(SESSIONS.items()):
+        if other["username"] == username:
+            SESSIONS.pop(token, None)
+    return message
+
+async def handle_admin_trainers(session, params):
+    """List registered trainers"""
+    return INDEX["trainers"]
+
+async def handle_admin_register_trainer(session, params):
+    """Add a trainer to the trainer list"""
+    trainer = require(params, "trainer", lambda x: len(x) >= 2, "Trainer name must be at least 2 characters.")
+    return await submit_write(pms.add_trainer, (trainer,))
+
+async def handle_admin_delete_trainer(session, params):
+    """Remove a trainer from the trainer list"""
+    trainer = require(params, "trainer")
+    return await submit_write(pms.remove_trainer, (trainer,))
+
+async def handle_admin_assign_trainer(session, params):
+    """Assign a trainer to a module and level"""
+    module = require(params, "module", lambda x: len(x) >= 2, "Module name must be at least 2 characters.")
+    trainer = require(params, "trainer")
+    level = require_level(params)
+    charges = require(params, "charges", pms.validate_charges, "Please enter a valid amount.")
+    return await submit_write(pms.assign_trainer_module, (module, trainer, level, charges))
+
+async def handle_admin_monthly_income(session, params):
+    """Income report for a trainer's module and level"""
+    trainer = require(params, "trainer")
+    module = require(params, "module")
+    level = require(params, "level")
+    month = params.get("month") or None
+
+    for entry in INDEX["classes"]["by_trainer"].get(trainer, []):
+        if entry["module"] == module and entry["level"] == level:
+            try:
+                charges = float(entry["charges"])
+            except ValueError:
+                raise ApiError(400, "Error: Invalid charges format in database.")
+            summary = await asyncio.get_running_loop().run_in_executor(
+                None, pms.get_income_summary, trainer, module, level, month)
+            return {"trainer": trainer, "module": module, "level": level, "month": month, "charges": charges,
+                    "paid_students": summary["paid_count"], "unpaid_students": summary["unpaid_count"],
+                    "total_income": summary["revenue"], "outstanding": summary["outstanding"]}
+    raise ApiError(404, "No matching trainer/module/level found.")
+
+async def handle_admin_feedback(session, params):
+    """List trainer feedback"""
+    return INDEX["feedback"]
+
+# ============= TRAINER HANDLERS =============
+
+async def handle_trainer_classes(session, params):
+    """List the caller's coaching classes"""
+    return INDEX["classes"]["by_trainer"].get(session["username"], [])
+
+async def handle_trainer_update_class(session, params):
+    """Set charges, schedule and/or capacity of one of the caller's classes"""
+    module = require(params, "module")
+    level = require_level(params)
+    charges = params.get("charges")
+    schedule = optional(params, "schedule")
+    capacity = params.get("capacity")
+    if charges is None and schedule is None and capacity is None:
+        raise ApiError(400, "Provide charges, schedule and/or capacity.")
+    if charges is not None and not pms.validate_charges(str(charges)):
+        raise ApiError(400, "Please enter a valid amount.")
+    if capacity is not None and not pms.validate_capacity(str(capacity)):
+        raise ApiError(400, "Capacity must be a positive whole number, or blank for unlimited.")
+    return await submit_write(pms.set_class_details,
+                              (session["username"], module, level,
+                               None if charges is None else str(charges), schedule,
+                               None if capacity is None else str(capacity)))
+
+async def handle_trainer_delete_class(session, params):
+    """Delete one of the caller's coaching classes"""
+    module = require(params, "module")
+    level = require_level(params)
+    return await submit_write(pms.remove_class, (session["username"], module, level))
+
+async def handle_trainer_students(session, params):
+    """List paid students enrolled in the caller's classes"""
+    return [e for e in INDEX["enrollments"]["by_trainer"].get(session["username"], []) if e["status"] == "paid"]
+
+async def handle_trainer_feedback(session, params):
+    """Send feedback to the administrator"""
+    feedback = require(params, "feedback", lambda x: len(x) >= 5, "Feedback must be at least 5 characters long.",
+                       separators="\r\n")
+    return await submit_write(pms.add_feedback, (session["username"], feedback))
+
+# ============= LECTURER HANDLERS =============
+
+async def handle_lecturer_register_student(session, params):
+    """Register a student to a module"""
+    student_name = require(params, "name", lambda x: len(x) >= 2, "Student name must be at least 2 characters.")
+    tp_number = require(params, "tp_number", pms.validate_tp_number,
+                        "TP number must start with 'TP' and be at least 8 characters.")
+    email = require(params, "email", pms.validate_email, "Please enter a valid email address.")
+    contact = require(params, "contact", pms.validate_contact, "Contact number must be at least 10 digits.")
+    module = require(params, "module")
+    level = require_level(params)
+    month = require(params, "month", lambda x: len(x) >= 3, "Month must be at least 3 characters.")
+    address = optional(params, "address", default="")
+
+    # Accept any spelling the menus accept, e.g. "python programming"
+    module = await asyncio.get_running_loop().run_in_executor(None, pms.resolve_module, module) or module
+    trainers = [entry for entry in INDEX["classes"]["by_key"].get((module, level), [])]
+    if not trainers:
+        raise ApiError(400, "No trainer found for this module/level combination.")
+    trainer = trainers[0]["trainer"]
+    charges = trainers[0]["charges"]
+    if not pms.validate_charges(charges):
+        charges = require(params, "charges", pms.validate_charges, "Please enter a valid amount.")
+
+    student_id = await submit_write(pms.enroll_student,
+                                    (student_name, tp_number, module, level, trainer,
+                                     email, contact, month, charges, address))
+    return {"student_id": student_id, "trainer": trainer, "charges": charges}
+
+async def handle_lecturer_enrollments(session, params):
+    """List the enrollments of a student by TP number"""
+    tp_number = require(params, "tp_number")
+    return INDEX["enrollments"]["by_tp"].get(tp_number, [])
+
+async def handle_lecturer_update_enrollment(session, params):
+    """Move a student's enrollment to another module/level"""
+    tp_number = require(params, "tp_number", pms.validate_tp_number,
+                        "TP number must start with 'TP' and be at least 8 characters.")
+    current_module = require(params, "current_module")
+    current_level = require_level(params, "current_level")
+    new_module = require(params, "new_module")
+    new_level = require_level(params, "new_level")
+    return await submit_write(pms.change_enrollment,
+                              (tp_number, current_module, current_level, new_module, new_level))
+
+async def handle_lecturer_requests(session, params):
+    """List all enrollment requests with their numbers"""
+    return INDEX["requests"]
+
+async def handle_lecturer_process_request(session, params):
+    """Approve or reject a request by number"""
+    request_num = require_int(params, "number")
+    action = require(params, "action", lambda x: x in ("approve", "reject"), "Action must be approve or reject.")
+    return await submit_write(pms.process_request, (request_num, action == "approve"))
+
+async def handle_lecturer_delete_student(session, params):
+    """Delete every enrollment of a student"""
+    tp_number = require(params, "tp_number", lambda x: len(x) >= 6, "TP number must be at least 6 characters.")
+    return await submit_write(pms.remove_student, (tp_number,))
+
+# ============= STUDENT HANDLERS =============
+
+async def handle_student_schedule(session, params):
+    """List the caller's paid classes with their schedules"""
+    schedule = []
+    for e in INDEX["enrollments"]["by_student"].get(session["username"], []):
+        if e["status"] != "paid":
+            continue
+        class_schedule = "Schedule TBD"
+        for entry in INDEX["classes"]["by_trainer"].get(e["trainer"], []):
+            if entry["module"] == e["module"] and entry["level"] == e["level"] and entry["schedule"] != "TBD":
+                class_schedule = entry["schedule"]
+                break
+        schedule.append({"module": e["module"], "level": e["level"], "trainer": e["trainer"],
+                         "schedule": class_schedule, "status": e["status"]})
+    return schedule
+
+async def handle_student_requests(session, params):
+    """List the caller's pending requests, numbered for deletion"""
+    pending = [r for r in INDEX["requests"] if r["student"] == session["username"] and r["status"] == "pending"]
+    return [{"number": i, "module": r["module"], "level": r["level"], "timestamp": r["timestamp"]}
+            for i, r in enumerate(pending, 1)]
+
+async def handle_student_recommendations(session, params):
+    """Suggest classes the caller has not taken or requested"""
+    student = session["username"]
+    taken = {(e["module"], e["level"]) for e in INDEX["enrollments"]["by_student"].get(student, [])}
+    taken.update((r["module"], r["level"]) for r in INDEX["requests"]
+                 if r["student"] == student and r["status"] != "rejected")
+    limit = require_int(params, "limit") if "limit" in params else pms.RECOMMENDATION_COUNT
+    recommendations = await asyncio.get_running_loop().run_in_executor(
+        None, pms.recommend_modules, student, limit, taken)
+    return [{"module": module, "level": level, "score": round(score, 4)}
+            for module, level, score in recommendations]
+
+async def handle_student_request(session, params):
+    """Send a request to enroll in an additional class"""
+    module = require(params, "module", lambda x: len(x) >= 2, "Module name must be at least 2 characters.")
+    level = require_level(params)
+    return await submit_write(pms.add_enrollment_request, (session["username"], module, level))
+
+async def handle_student_delete_request(session, params):
+    """Delete one of the caller's pending requests"""
+    request_num = require_int(params, "number")
+    return await submit_write(pms.remove_pending_request, (session["username"], request_num))
+
+async def handle_student_invoice(session, params):
+    """Show the caller's invoice and outstanding total, optionally for one month"""
+    month = params.get("month") or None
+    rows = []
+    total = 0.0
+    for e in INDEX["enrollments"]["by_student"].get(session["username"], []):
+        if month is not None and pms.partition_key(e["month"]) != pms.partition_key(month):
+            continue
+        charges = float(e["charges"]) if pms.validate_charges(e["charges"]) else 0.0
+        rows.append({"module": e["module"], "level": e["level"], "trainer": e["trainer"],
+                     "month": e["month"], "charges": charges, "status": e["status"]})
+        if e["status"] == "unpaid":
+            total += charges
+    return {"enrollments": rows, "total_outstanding": total}
+
+async def handle_student_pay(session, params):
+    """Pay the caller's outstanding charges, optionally for one month"""
+    month = params.get("month") or None
+    return await submit_write(pms.pay_outstanding, (session["username"], month))
+
+# (method, path) -> (handler, role allowed; None = no login needed, ANY_ROLE = any logged-in user)
+ROUTES = {
+    ("POST", "/login"): (handle_login, None),
+    ("POST", "/logout"): (handle_logout, ANY_ROLE),
+    ("GET", "/modules"): (handle_modules, ANY_ROLE),
+    ("POST", "/profile"): (handle_update_profile, ANY_ROLE),
+
+    ("GET", "/admin/users"): (handle_admin_users, pms.ADMIN_ROLE),
+    ("POST", "/admin/register_user"): (handle_admin_register_user, pms.ADMIN_ROLE),
+    ("POST", "/admin/delete_user"): (handle_admin_delete_user, pms.ADMIN_ROLE),
+    ("GET", "/admin/trainers"): (handle_admin_trainers, pms.ADMIN_ROLE),
+    ("POST", "/admin/register_trainer"): (handle_admin_register_trainer, pms.ADMIN_ROLE),
+    ("POST", "/admin/delete_trainer"): (handle_admin_delete_trainer, pms.ADMIN_ROLE),
+    ("POST", "/admin/assign_trainer"): (handle_admin_assign_trainer, pms.ADMIN_ROLE),
+    ("GET", "/admin/monthly_income"): (handle_admin_monthly_income, pms.ADMIN_ROLE),
+    ("GET", "/admin/feedback"): (handle_admin_feedback, pms.ADMIN_ROLE),
+
+    ("GET", "/trainer/classes"): (handle_trainer_classes, pms.TRAINER_ROLE),
+    ("POST", "/trainer/update_class"): (handle_trainer_update_class, pms.TRAINER_ROLE),
+    ("POST", "/trainer/delete_class"): (handle_trainer_delete_class, pms.TRAINER_ROLE),
+    ("GET", "/trainer/students"): (handle_trainer_students, pms.TRAINER_ROLE),
+    ("POST", "/trainer/feedback"): (handle_trainer_feedback, pms.TRAINER_ROLE),
+
+    ("POST", "/lecturer/register_student"): (handle_lecturer_register_student, pms.LECTURER_ROLE),
+    ("GET", "/lecturer/enrollments"): (handle_lecturer_enrollments, pms.LECTURER_ROLE),
+    ("POST", "/lecturer/update_enrollment"): (handle_lecturer_update_enrollment, pms.LECTURER_ROLE),
+    ("GET", "/lecturer/requests"): (handle_lecturer_requests, pms.LECTURER_ROLE),
+    ("POST", "/lecturer/process_request"): (handle_lecturer_process_request, pms.LECTURER_ROLE),
+    ("POST", "/lecturer/delete_student"): (handle_lecturer_delete_student, pms.LECTURER_ROLE),
+
+    ("GET", "/student/schedule"): (handle_student_schedule, pms.STUDENT_ROLE),
+    ("GET", "/student/requests"): (handle_student_requests, pms.STUDENT_ROLE),
+    ("GET", "/student/recommendations"): (handle_student_recommendations, pms.STUDENT_ROLE),
+    ("POST", "/student/request"): (handle_student_request, pms.STUDENT_ROLE),
+    ("POST", "/student/delete_request"): (handle_student_delete_request, pms.STUDENT_ROLE),
+    ("GET", "/student/invoice"): (handle_student_invoice, pms.STUDENT_ROLE),
+    ("POST", "/student/pay"): (handle_student_pay, pms.STUDENT_ROLE),
+}
+
+# ============= HTTP LAYER =============
+
+def get_session(headers):
+    """Return the live session for the request's bearer token"""
+    auth = headers.get("authorization", "")
+    if not auth.startswith("Bearer "):
+        raise ApiError(401, "Login required.")
+    token = auth[len("Bearer "):].strip()
+    session = SESSIONS.get(token)
+    now = time.time()
+    if session is None or session["expires"] < now:
+        SESSIONS.pop(token, None)
+        raise ApiError(401, "Session expired or invalid. Please log in again.")
+    session["expires"] = now + SESSION_TIMEOUT
+    return dict(session, token=token)
+
+async def dispatch(method, target, headers, body):
+    """Route one request and return (status, payload)"""
+    url = urlsplit(target)
+    route = ROUTES.get((method, url.path))
+    if route is None:
+        if any(path == url.path for _, path in ROUTES):
+            return 405, {"ok": False, "error": "Method not allowed."}
+        return 404, {"ok": False, "error": "Not found."}
+
+    handler, role = route
+    try:
+        params = dict(parse_qsl(url.query))
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise ApiError(400, "Request body must be JSON.")
+            if not isinstance(data, dict):
+                raise ApiError(400, "Request body must be a JSON object.")
+            params.update(data)
+
+        session = None
+        if role is not None:
+            session = get_session(headers)
+            if role != ANY_ROLE and session["role"] != role:
+                raise ApiError(403, f"This operation requires the {pms.ROLE_NAMES[role]} role.")
+
+        await refresh_index()
+        return 200, {"ok": True, "data": await handler(session, params)}
+    except ApiError as e:
+        return e.status, {"ok": False, "error": e.message}
+    except Exception as e:
+        print(f"Error handling {method} {url.path}: {e!r}")
+        return 500, {"ok": False, "error": "Internal server error."}
+
+async def handle_connection(reader, writer):
+    """Serve HTTP/1.1 requests on one keep-alive connection"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                break
+            method, target, version = parts
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", "0") or 0)
+            if length > MAX_BODY_SIZE:
+                status, payload = 413, {"ok": False, "error": "Request body too large."}
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await dispatch(method.upper(), target, headers, body)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+            data = json.dumps(payload).encode("utf-8")
+            writer.write((f"{version} {status} {STATUS_TEXT.get(status, 'OK')}\r\n"
+                          "Content-Type: application/json\r\n"
+                          f"Content-Length: {len(data)}\r\n"
+                          f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def run_server(host, port):
+    """Load the index, start the writer task and the notification worker, and serve forever"""
+    global WRITE_QUEUE
+    pms.use_environment_campus()
+    pms.create_files_if_not_exist()
+    pms.start_notification_worker()
+    INDEX_STATE["lock"] = asyncio.Lock()
+    await refresh_index()
+    WRITE_QUEUE = asyncio.Queue()
+    writer = asyncio.create_task(writer_task())
+
+    server = await asyncio.start_server(handle_connection, host, port, backlog=1024)
+    print(f"APU Programming Café API listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        writer.cancel()
+
+def main():
+    """Parse arguments and run the API server"""
+    parser = argparse.ArgumentParser(description="APU Programming Café JSON API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_server(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Scripted load test for the interactive menus of the APU Programming Café Management System.
+
+Runs many simulated users as separate processes against one shared data
+directory. Each user logs in through the real login() and role menus, with
+input() fed from a transcript and the printed output captured, performs its
+role's actions and logs out. Prints p50/p95/p99 latency per menu action, then
+checks the data files: every write a session made must be present exactly once
+(missing = lost update), every row must have a valid shape, the event log's
+sequence numbers must be unique and increasing, and the income aggregates must
+match a full recomputation.
+
+Usage: python menu_load_test.py [--users 16] [--sessions 5] [--actions 4]
+                                [--data-dir path] [--keep]
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+SEED_FILES = ["apu_list.txt", "trainerslist.txt", "trainermodules.txt", "zstudents.txt",
+              "zrequests.txt", "feedback.txt"]
+ROLES = ["admin", "lecturer", "student", "trainer"]
+CLASSES = [("Python Programming", "Beginner"), ("Python Programming", "Intermediate"),
+           ("Java Programming", "Beginner"), ("Java Programming", "Advanced"),
+           ("Web Development", "Intermediate"), ("Database Systems", "Beginner"),
+           ("C++ Programming", "Advanced"), ("Data Structures", "Intermediate")]
+
+
+class ScriptExhausted(Exception):
+    """The menus asked for more input than the transcript holds"""
+
+
+def build_session(role, worker, session, actions):
+    """Return (login email, password, steps, expected writes) for one scripted session.
+    Each step is (action name, inputs); the first input selects the menu option."""
+    steps = []
+    expected = []
+    if role == "admin":
+        email, password, logout = "admin@apu.edu.my", "admin123", "12"
+        for n in range(actions):
+            username = f"lt_user_{worker}_{session}_{n}"
+            steps.append(("register_user", ["1", username, f"{username}@apu.edu.my", "secret123", "d"]))
+            expected.append(("users", username))
+    elif role == "lecturer":
+        email, password, logout = "sarah@apu.edu.my", "pass123", "9"
+        for n in range(actions):
+            if n % 2:
+                steps.append(("view_requests", ["3", "0"]))
+                continue
+            tp_number = f"TPL{worker:03d}{session:03d}{n:03d}"
+            module, level = CLASSES[(worker + n) % len(CLASSES)]
+            steps.append(("register_student", ["1", tp_number, f"Load Student {tp_number}", f"{tp_number}@apu.edu.my",
+                                               "0123456789", module, level, "1 Load Test Rd", "March"]))
+            expected.append(("enrollments", tp_number))
+    elif role == "student":
+        email, password, logout = f"lt_student_{worker}@apu.edu.my", "secret123", "6"
+        for n in range(actions):
+            index = session * actions + n
+            if n % 2 or index >= len(CLASSES):
+                steps.append(("view_schedule", ["1"]))
+                continue
+            module, level = CLASSES[index]
+            steps.append(("send_request", ["2", module, level]))
+            expected.append(("requests", (f"lt_student_{worker}", module, level)))
+    else:
+        email, password, logout = "john@apu.edu.my", "pass123", "7"
+        for n in range(actions):
+            if n % 2:
+                steps.append(("view_students", ["4", "n"]))
+                continue
+            message = f"load test feedback {worker}-{session}-{n}"
+            steps.append(("send_feedback", ["5", message]))
+            expected.append(("feedback", message))
+    steps.append(("logout", [logout]))
+    return email, password, steps, expected
+
+def run_session(pms, email, password, steps, latencies):
+    """Drive login() through a transcript, timing each step; returns the captured output"""
+    feed = [("login", [email, password])] + steps
+    state = {"step": 0, "input": 0, "start": time.perf_counter()}
+
+    def scripted_input(prompt=""):
+        print(prompt, end="")
+        name, inputs = feed[state["step"]]
+        if state["input"] == len(inputs):
+            # The previous step is done once the menu asks for the next choice
+            now = time.perf_counter()
+            latencies.setdefault(name, []).append(now - state["start"])
+            state.update(step=state["step"] + 1, input=0, start=now)
+            if state["step"] == len(feed):
+                raise ScriptExhausted(prompt)
+            name, inputs = feed[state["step"]]
+        value = inputs[state["input"]]
+        state["input"] += 1
+        print(value)
+        return value
+
+    output = io.StringIO()
+    original_input = builtins.input
+    builtins.input = scripted_input
+    try:
+        with contextlib.redirect_stdout(output):
+            pms.login()
+    finally:
+        builtins.input = original_input
+    name, inputs = feed[-1]
+    if state["step"] != len(feed) - 1 or state["input"] != len(inputs):
+        last_line = (output.getvalue().strip().splitlines() or [""])[-1]
+        raise ScriptExhausted(f"session ended early after: {last_line}")
+    latencies.setdefault(name, []).append(time.perf_counter() - state["start"])
+    return output.getvalue()
+
+def run_user(worker, args, start_event, results):
+    """One simulated user: run its sessions and report latencies, expected writes and errors"""
+    import programming_management_system as pms
+
+    role = ROLES[worker % len(ROLES)]
+    latencies = {}
+    expected = []
+    errors = []
+    start_event.wait()
+    for session in range(args.sessions):
+        email, password, steps, session_expected = build_session(role, worker, session, args.actions)
+        try:
+            run_session(pms, email, password, steps, latencies)
+            expected.extend(session_expected)
+        except ScriptExhausted as error:
+            errors.append(f"worker {worker} ({role}) session {session}: transcript out of step at {error}")
+        except Exception as error:
+            errors.append(f"worker {worker} ({role}) session {session}: {type(error).__name__}: {error}")
+    results.put((latencies, expected, errors))
+
+def percentile(sorted_values, fraction):
+    """Return the value at a fraction (0-1) of a sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def check_integrity(pms, expected):
+    """Return a list of problems found in the shared data files"""
+    problems = []
+    found = {"users": {}, "enrollments": {}, "requests": {}, "feedback": {}}
+
+    shapes = {pms.USER_FILE: (4, 4), pms.TRAINER_MODULES_FILE: (5, 6), pms.REQUESTS_FILE: (5, 6)}
+    for file_path, (low, high) in shapes.items():
+        for number, line in enumerate(pms.read_lines(file_path), 1):
+            fields = line.strip().split(",")
+            if line.strip() and not low <= len(fields) <= high:
+                problems.append(f"corrupt row {os.path.basename(file_path)}:{number}: {line.strip()[:80]}")
+    for fields in pms.read_records(pms.USER_FILE):
+        found["users"][fields[0]] = found["users"].get(fields[0], 0) + 1
+    for fields in pms.read_records(pms.REQUESTS_FILE, 3):
+        key = tuple(fields[:3])
+        found["requests"][key] = found["requests"].get(key, 0) + 1
+
+    for fields in pms.iter_enrollments():
+        if len(fields) < 12 or fields[9] not in ("paid", "unpaid"):
+            problems.append(f"corrupt enrollment row: {','.join(fields)[:80]}")
+            continue
+        found["enrollments"][fields[1]] = found["enrollments"].get(fields[1], 0) + 1
+
+    for number, line in enumerate(pms.read_lines(pms.FEEDBACK_FILE), 1):
+        if not line.strip():
+            continue
+        timestamp, sender, message = pms.parse_feedback_line(line)
+        if not sender:
+            problems.append(f"corrupt row feedback.txt:{number}: {line.strip()[:80]}")
+        found["feedback"][message] = found["feedback"].get(message, 0) + 1
+
+    for table, key in expected:
+        count = found[table].get(key, 0)
+        if count == 0:
+            problems.append(f"lost update: {table} {key} is missing")
+        elif count > 1:
+            problems.append(f"duplicate: {table} {key} appears {count} times")
+
+    last_seq = 0
+    for number, line in enumerate(pms.read_lines(pms.EVENTS_FILE), 1):
+        try:
+            seq = json.loads(line)["seq"]
+        except (ValueError, KeyError):
+            problems.append(f"corrupt event line {number}: {line.strip()[:80]}")
+            continue
+        if seq <= last_seq:
+            problems.append(f"event seq {seq} at line {number} is not after {last_seq}")
+        last_seq = max(last_seq, seq)
+
+    for key, have, want in pms.verify_aggregates():
+        problems.append(f"aggregate mismatch {'/'.join(key)}: maintained {have[:2]}, recomputed {want[:2]}")
+    return problems
+
+def main():
+    """Prepare the data directory, run the users and print the results"""
+    parser = argparse.ArgumentParser(description="Load-test the interactive menus with scripted sessions")
+    parser.add_argument("--users", type=int, default=16, help="concurrent simulated users (processes)")
+    parser.add_argument("--sessions", type=int, default=5, help="login sessions per user")
+    parser.add_argument("--actions", type=int, default=4, help="menu actions per session")
+    parser.add_argument("--data-dir", help="data directory to use (default: a fresh copy of the seed data)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data directory")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="menu_load_test_")
+    if not args.data_dir:
+        for name in SEED_FILES:
+            if os.path.exists(os.path.join(script_dir, name)):
+                shutil.copyfile(os.path.join(script_dir, name), os.path.join(data_dir, name))
+    # Set before the import so this process and every worker use the same files
+    os.environ["CAFE_DATA_DIR"] = data_dir
+    import programming_management_system as pms
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pms.create_files_if_not_exist()
+        for worker in range(args.users):
+            if ROLES[worker % len(ROLES)] == "student":
+                pms.add_user(f"lt_student_{worker}", f"lt_student_{worker}@apu.edu.my", "secret123", pms.STUDENT_ROLE)
+
+    print(f"Running {args.users} users x {args.sessions} sessions x {args.actions} actions on {data_dir}")
+    start_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_user, args=(worker, args, start_event, results))
+               for worker in range(args.users)]
+    for process in workers:
+        process.start()
+    start = time.perf_counter()
+    start_event.set()
+    latencies = {}
+    expected = []
+    errors = []
+    for _ in workers:
+        worker_latencies, worker_expected, worker_errors = results.get()
+        for name, values in worker_latencies.items():
+            latencies.setdefault(name, []).extend(values)
+        expected.extend(worker_expected)
+        errors.extend(worker_errors)
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print("\n=== Menu Load Test Results ===")
+    print(f"Actions completed: {total} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f} actions/sec)")
+    print(f"{'Action':<18} {'Count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        print(f"{name:<18} {len(values):>6} {percentile(values, 0.50) * 1000:>8.1f} "
+              f"{percentile(values, 0.95) * 1000:>8.1f} {percentile(values, 0.99) * 1000:>8.1f}")
+
+    pms.reset_caches()
+    problems = errors + check_integrity(pms, expected)
+    print(f"\nIntegrity: {len(expected)} writes checked, {len(problems)} problem(s)")
+    for problem in problems[:50]:
+        print(f"- {problem}")
+    if len(problems) > 50:
+        print(f"... and {len(problems) - 50} more")
+
+    if args.keep or args.data_dir:
+        print(f"Data directory: {data_dir}")
+    else:
+        shutil.rmtree(data_dir)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
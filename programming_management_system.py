@@ -1,6 +1,30 @@
+import bisect
+import contextlib
+import csv
+import functools
+import gzip
+import heapq
+import io
+import itertools
+import json
+import lzma
+import math
+import mmap
 import os
+import re
+import shutil
+import struct
 import sys
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process locking, so run one process per data directory
+    fcntl = None
 
 # SYMBOLIC CONSTANTS
 ADMIN_ROLE = "a"
@@ -8,67 +32,4590 @@ TRAINER_ROLE = "b"
 LECTURER_ROLE = "c"
 STUDENT_ROLE = "d"
 
-# Get the directory where this Python script is located
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Get the directory where this Python script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Data files live next to the script unless CAFE_DATA_DIR points elsewhere
+# (e.g. a scratch copy for load tests)
+DATA_DIR = os.environ.get("CAFE_DATA_DIR", SCRIPT_DIR)
+
+# Create file paths relative to the data directory
+USER_FILE = os.path.join(DATA_DIR, "apu_list.txt")
+TRAINERS_FILE = os.path.join(DATA_DIR, "trainerslist.txt")
+TRAINER_MODULES_FILE = os.path.join(DATA_DIR, "trainermodules.txt")
+STUDENTS_FILE = os.path.join(DATA_DIR, "zstudents.txt")
+REQUESTS_FILE = os.path.join(DATA_DIR, "zrequests.txt")
+FEEDBACK_FILE = os.path.join(DATA_DIR, "feedback.txt")
+
+# Optional month-partitioned enrollment storage (enabled once the manifest exists)
+PARTITIONS_DIR = os.path.join(DATA_DIR, "zstudents_partitions")
+PARTITION_MANIFEST_FILE = os.path.join(PARTITIONS_DIR, "manifest.txt")
+
+# Materialized income/enrollment aggregates keyed by (trainer, module, level, month)
+AGGREGATES_FILE = os.path.join(DATA_DIR, "zaggregates.txt")
+
+# Students waiting for a seat in a full class (append-only, with tombstones)
+WAITLIST_FILE = os.path.join(DATA_DIR, "zwaitlist.txt")
+
+# Precomputed module recommendation model (rebuilt by a batch job)
+RECOMMENDATIONS_FILE = os.path.join(DATA_DIR, "zrecommendations.json")
+
+# Last allocated student ID number (see allocate_student_ids)
+STUDENT_ID_FILE = os.path.join(DATA_DIR, "zstudent_id.txt")
+
+# Optional student profile table keyed by TP number (see STUDENT PROFILES)
+PROFILES_FILE = os.path.join(DATA_DIR, "zprofiles.txt")
+
+# Status columns stored fixed-width for in-place updates (see FIXED-WIDTH STATUS COLUMNS)
+STATUS_LAYOUT_FILE = os.path.join(DATA_DIR, "zstatus_layout.txt")
+
+# Redo journal of the transaction being committed, and the lock that lets one
+# process at a time run a transaction (see TRANSACTIONS)
+JOURNAL_FILE = os.path.join(DATA_DIR, "zjournal.json")
+DATA_LOCK_FILE = os.path.join(DATA_DIR, "zdata.lock")
+
+# Append-only log of every data change (see EVENT LOG)
+EVENTS_FILE = os.path.join(DATA_DIR, "zevents.jsonl")
+EVENT_SNAPSHOTS_DIR = os.path.join(DATA_DIR, "zevents_snapshots")
+
+# Compressed segments of archived rows and their index (see ARCHIVE)
+ARCHIVE_DIR = os.path.join(DATA_DIR, "zarchive")
+ARCHIVE_INDEX_FILE = os.path.join(ARCHIVE_DIR, "index.txt")
+ARCHIVE_DELETED_FILE = os.path.join(ARCHIVE_DIR, "deleted.txt")
+
+# Classes students have finished, skipped by the billing cycle (see BILLING CYCLE)
+COMPLETED_FILE = os.path.join(DATA_DIR, "zcompleted.txt")
+BILLING_LEDGER_FILE = os.path.join(DATA_DIR, "zbilling.txt")
+
+# Notifications waiting for delivery, the delivery worker's state and the
+# local sinks' output (see NOTIFICATION OUTBOX)
+OUTBOX_FILE = os.path.join(DATA_DIR, "zoutbox.jsonl")
+OUTBOX_STATE_FILE = os.path.join(DATA_DIR, "zoutbox_state.json")
+OUTBOX_SENT_FILE = os.path.join(DATA_DIR, "zoutbox_sent.txt")
+OUTBOX_LOCK_FILE = os.path.join(DATA_DIR, "zoutbox.lock")
+MAIL_SPOOL_DIR = os.path.join(DATA_DIR, "zmail")
+NOTIFY_DROP_DIR = os.path.join(DATA_DIR, "znotify_drop")
+
+# One shard directory per campus, each with the whole file set (see CAMPUS SHARDS).
+# CAFE_CAMPUS selects the campus a process works on; the entry points (the
+# menu, run_command and the API server) apply it with use_environment_campus().
+DATA_ROOT = os.environ.get("CAFE_DATA_ROOT", DATA_DIR)
+CAMPUSES_DIR = os.path.join(DATA_ROOT, "campuses")
+CURRENT_CAMPUS = None
+
+MAX_LOGIN_ATTEMPTS = 3
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+ROLE_NAMES = {ADMIN_ROLE: "Administrator", TRAINER_ROLE: "Trainer",
+              LECTURER_ROLE: "Lecturer", STUDENT_ROLE: "Student"}
+# Characters that would split a record of the comma/newline-separated data files
+FIELD_SEPARATORS = ",\r\n"
+FIELD_ERROR = "Error: Values may not contain commas or line breaks."
+WAITLIST_TIERS = ["1", "2", "3"]  # 1 = highest priority
+DEFAULT_WAITLIST_TIER = "2"
+
+def create_files_if_not_exist():
+    """Create necessary files if they don't exist and create default admin"""
+    recover_transactions()
+    
+    files = [USER_FILE, TRAINERS_FILE, TRAINER_MODULES_FILE, STUDENTS_FILE, REQUESTS_FILE, FEEDBACK_FILE]
+    for file in files:
+        if not os.path.exists(file):
+            with open(file, 'w') as f:
+                pass
+    
+    # Create default admin account if no users exist
+    if not os.path.exists(USER_FILE) or os.path.getsize(USER_FILE) == 0:
+        with open(USER_FILE, 'w') as f:
+            f.write("admin,admin@apu.edu.my,admin123,a\n")
+        print("Default admin account created:")
+        print("Email: admin@apu.edu.my")
+        print("Password: admin123")
+    
+    ensure_event_log()
+    load_aggregates()
+
+def validate_email(email):
+    """Validate email format"""
+    return "@" in email and "." in email
+
+def validate_level(level):
+    """Validate coaching level"""
+    return level in LEVELS
+
+def validate_username(username):
+    """Validate username length"""
+    return len(username) >= 3
+
+def validate_password(password):
+    """Validate password length"""
+    return len(password) >= 6
+
+def validate_charges(charges):
+    """Validate charges amount format"""
+    return charges.replace('.', '').isdigit()
+
+def validate_capacity(capacity):
+    """Validate class capacity (blank means unlimited)"""
+    return capacity == "" or (capacity.isdigit() and int(capacity) > 0)
+
+def validate_field(value, separators=FIELD_SEPARATORS):
+    """Validate that a value fits in one field of a data file record"""
+    return not any(c in value for c in separators)
+
+def validate_fields(*values):
+    """Validate several field values at once (None = unchanged, skipped)"""
+    return all(validate_field(value) for value in values if value is not None)
+
+def validate_tp_number(tp_number):
+    """Validate TP number format"""
+    return tp_number.startswith("TP") and len(tp_number) >= 8
+
+def validate_contact(contact):
+    """Validate contact number format"""
+    return contact.isdigit() and len(contact) >= 10
+
+def get_user_input(prompt, validation_func=None, error_msg="Invalid input. Please try again."):
+    """Get validated user input"""
+    while True:
+        user_input = input(prompt).strip()
+        if validation_func is None or validation_func(user_input):
+            return user_input
+        print(error_msg)
+
+def generate_student_id():
+    """Generate unique student ID"""
+    return allocate_student_ids(1)[0]
+
+def allocate_student_ids(count):
+    """Reserve count new student IDs with one counter write"""
+    # The counter only moves forward, so deleting students never frees an ID
+    # for reuse (counting rows did, which produced duplicate IDs)
+    with transaction():
+        lines = read_lines(STUDENT_ID_FILE)
+        if lines and lines[0].strip().isdigit():
+            last = int(lines[0])
+        else:
+            last = highest_student_id()
+        write_lines(STUDENT_ID_FILE, [f"{last + count}\n"])
+        return [f"STU{number:04d}" for number in range(last + 1, last + count + 1)]
+
+def sync_student_ids():
+    """Move the ID counter past the highest ID in the enrollments (after imports or repairs)"""
+    with transaction():
+        lines = read_lines(STUDENT_ID_FILE)
+        last = int(lines[0]) if lines and lines[0].strip().isdigit() else 0
+        write_lines(STUDENT_ID_FILE, [f"{max(last, highest_student_id())}\n"])
+
+def highest_student_id():
+    """Return the highest STU number in the enrollments, or 0"""
+    highest = 0
+    for fields in iter_enrollments(min_fields=11):
+        if fields[10].startswith("STU") and fields[10][3:].isdigit():
+            highest = max(highest, int(fields[10][3:]))
+    return highest
+
+# ============= TRANSACTIONS =============
+# Writes made inside "with transaction():" are staged in memory instead of
+# touching the data files; reads through read_lines/read_records see the staged
+# state. On commit the staged changes go to a journal, which is fsynced once and
+# then applied: rewrites via a temp file and os.replace, appends by truncating
+# the file to its recorded size and appending, status patches by writing the
+# new line over the old one at its byte offset (so replaying is safe). Bulk
+# rewrites stream into a prepared file and stage_file() it, which journals a
+# move instead of the contents; remove_file() journals a deletion. The
+# journal is deleted once applied. Nested transactions join the outermost one,
+# so a bulk operation pays for a single fsync.
+#
+# If the process dies before the journal is in place nothing was applied; if it
+# dies after, recover_transactions() (run by create_files_if_not_exist) replays it.
+#
+# The outermost transaction holds an exclusive lock on zdata.lock from its
+# first read to the end of its commit, so processes sharing a data directory
+# (menus, API server, jobs) never interleave read-modify-write cycles. Caches
+# are keyed by file signatures, so they notice the other processes' writes.
+
+TRANSACTION_STATE = threading.local()
+
+def staged_writes():
+    """Return {path: staged change} for the current thread's transaction, or None"""
+    return getattr(TRANSACTION_STATE, "writes", None)
+
+def staged_change(file_path):
+    """Return the staged change of a file (creating it), or None outside a transaction"""
+    writes = staged_writes()
+    if writes is None:
+        return None
+    if file_path not in writes:
+        writes[file_path] = {"content": None, "appended": "", "size": None, "patches": [], "version": 0,
+                             "source": None, "deleted": False}
+    return writes[file_path]
+
+def stage_file(file_path, prepared_file):
+    """Replace a data file with a prepared file when the transaction commits"""
+    change = staged_change(file_path)
+    if change is None:
+        os.replace(prepared_file, file_path)
+        return
+    if change["source"] != prepared_file:
+        discard_prepared(change)
+    change.update(content=None, appended="", size=os.path.getsize(prepared_file), patches=[],
+                  version=change["version"] + 1, source=prepared_file, deleted=False)
+
+def remove_file(file_path):
+    """Delete a data file when the transaction commits"""
+    change = staged_change(file_path)
+    if change is None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return
+    discard_prepared(change)
+    change.update(content=None, appended="", size=None, patches=[], version=change["version"] + 1,
+                  source=None, deleted=True)
+
+def discard_prepared(change):
+    """Delete the prepared file of a staged change that is being replaced or rolled back"""
+    if change["source"] and os.path.exists(change["source"]):
+        os.remove(change["source"])
+    change["source"] = None
+
+def data_file_exists(file_path):
+    """Check whether a data file exists as the current transaction would leave it"""
+    change = staged_writes() and staged_writes().get(file_path)
+    if change:
+        return not change["deleted"]
+    return os.path.exists(file_path)
+
+@contextlib.contextmanager
+def data_lock():
+    """Hold the exclusive lock on the data directory"""
+    if fcntl is None:
+        yield
+        return
+    with open(DATA_LOCK_FILE, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def transaction():
+    """Apply every data file write in the block together, or none of them"""
+    if staged_writes() is not None:
+        yield
+        return
+
+    with data_lock():
+        TRANSACTION_STATE.writes = {}
+        try:
+            yield
+            writes = TRANSACTION_STATE.writes
+        except BaseException:
+            for change in TRANSACTION_STATE.writes.values():
+                discard_prepared(change)
+            TRANSACTION_STATE.writes = None
+            # In-memory caches may hold changes that were never written
+            reset_caches()
+            raise
+        TRANSACTION_STATE.writes = None
+        if writes:
+            commit_writes(writes)
+
+def commit_writes(writes):
+    """Journal the staged changes, fsync once, then apply them"""
+    base_dir = os.path.dirname(JOURNAL_FILE)
+    entries = []
+    for file_path, change in writes.items():
+        entry = {"file": os.path.relpath(file_path, base_dir)}
+        if change["deleted"]:
+            entry["delete"] = True
+        elif change["content"] is not None:
+            entry["replace"] = change["content"] + change["appended"]
+        else:
+            if change["source"]:
+                entry["move"] = os.path.relpath(change["source"], base_dir)
+            if change["patches"]:
+                entry["patch"] = change["patches"]
+            if change["appended"] or not change["patches"]:
+                entry["size"] = change["size"]
+                entry["append"] = change["appended"]
+        entries.append(entry)
+
+    temp_file = JOURNAL_FILE + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump({"writes": entries}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, JOURNAL_FILE)
+
+    apply_journal(entries)
+    os.remove(JOURNAL_FILE)
+
+def apply_journal(entries):
+    """Apply journal entries; safe to repeat after a crash"""
+    base_dir = os.path.dirname(JOURNAL_FILE)
+    for entry in entries:
+        file_path = os.path.join(base_dir, entry["file"])
+        if "replace" in entry:
+            temp_file = file_path + ".txn"
+            with open(temp_file, 'w') as f:
+                f.write(entry["replace"])
+            os.replace(temp_file, file_path)
+            continue
+        if "delete" in entry:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            continue
+        if "move" in entry:
+            # Already moved if the journal is being replayed after a crash
+            prepared_file = os.path.join(base_dir, entry["move"])
+            if os.path.exists(prepared_file):
+                os.replace(prepared_file, file_path)
+        if "patch" in entry:
+            patch_file(file_path, entry["patch"])
+        if "append" in entry:
+            with open(file_path, 'a') as f:
+                if f.tell() > entry["size"]:
+                    f.truncate(entry["size"])
+                f.write(entry["append"])
+
+def patch_file(file_path, patches):
+    """Write [offset, line] patches over a file in place, each under a lock on its record"""
+    with open(file_path, 'r+b') as f:
+        for offset, text in patches:
+            data = text.encode()
+            if fcntl is not None:
+                fcntl.lockf(f.fileno(), fcntl.LOCK_EX, len(data), offset)
+            try:
+                f.seek(offset)
+                f.write(data)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(f.fileno(), fcntl.LOCK_UN, len(data), offset)
+
+def recover_transactions():
+    """Replay a committed journal left by a crash, or drop an incomplete one"""
+    with data_lock():
+        return recover_journal()
+
+def recover_journal():
+    """Apply or drop a leftover journal; the caller holds the data lock"""
+    if os.path.exists(JOURNAL_FILE + ".tmp"):
+        # The journal never finished writing, so none of its changes were applied
+        os.remove(JOURNAL_FILE + ".tmp")
+    if not os.path.exists(JOURNAL_FILE):
+        return False
+
+    try:
+        with open(JOURNAL_FILE, 'r') as f:
+            entries = json.load(f)["writes"]
+    except (ValueError, KeyError):
+        os.remove(JOURNAL_FILE)
+        return False
+    apply_journal(entries)
+    os.remove(JOURNAL_FILE)
+    reset_caches()
+    print(f"Recovered an interrupted update of {len(entries)} data file(s).")
+    return True
+
+def reset_caches():
+    """Forget every in-memory cache so it is rebuilt from the data files"""
+    ROSTER_CACHE.update(signature=None, members=None, sorted=None)
+    CATALOG_CACHE.update(signature=None, catalog=None)
+    OCCUPANCY_CACHE.update(signature=None, counts=None)
+    WAITLIST_CACHE.update(signature=None, entries=None, heaps=None)
+    AGGREGATE_CACHE.update(signature=None, data=None)
+    RECOMMENDATION_CACHE.update(signature=None, model=None)
+    EVENT_CACHE.update(signature=None, seq=0)
+    PROFILE_CACHE.update(signature=None, profiles=None, names=None)
+    STATUS_LAYOUT_CACHE.update(signature=None, layout={})
+    RECORD_INDEX.clear()
+    WORKLOAD_CACHE.update(signature=None, data=None)
+    TRENDS_CACHE.update(requests=None, events=None, records={}, series={})
+
+def iter_data_lines(file_path):
+    """Yield the lines of a data file as the current transaction would leave it"""
+    change = staged_writes() and staged_writes().get(file_path)
+    if change and change["deleted"]:
+        raise FileNotFoundError(file_path)
+    if change and change["content"] is not None:
+        yield from io.StringIO(change["content"])
+    elif change and change["patches"]:
+        with open(file_path, 'rb') as f:
+            data = bytearray(f.read())
+        for offset, text in change["patches"]:
+            patch = text.encode()
+            data[offset:offset + len(patch)] = patch
+        yield from io.StringIO(data.decode())
+    else:
+        try:
+            with open(change["source"] if change and change["source"] else file_path, 'r') as f:
+                yield from f
+        except FileNotFoundError:
+            if not change:
+                raise
+    if change:
+        yield from io.StringIO(change["appended"])
+
+# ============= SHARED DATA OPERATIONS =============
+# Non-interactive operations used by the role menus and the API server.
+# Each returns (success, message) so callers decide how to report it.
+
+def read_records(file_path, min_fields=1):
+    """Yield the fields of every non-blank line in a data file"""
+    try:
+        for line in iter_data_lines(file_path):
+            if not line.strip():
+                continue
+            fields = line.strip().split(',')
+            if len(fields) >= min_fields:
+                yield fields
+    except FileNotFoundError:
+        return
+
+def read_lines(file_path):
+    """Read all lines of a data file, or an empty list if it is missing"""
+    try:
+        return list(iter_data_lines(file_path))
+    except FileNotFoundError:
+        return []
+
+def write_lines(file_path, lines):
+    """Rewrite a data file with the given lines"""
+    change = staged_change(file_path)
+    if change is not None:
+        discard_prepared(change)
+        change.update(content="".join(lines), appended="", patches=[], version=change["version"] + 1,
+                      deleted=False)
+        return
+
+    # Write a temp file and swap it in, so a crash never leaves a truncated file
+    temp_file = file_path + ".tmp"
+    with open(temp_file, 'w') as f:
+        f.writelines(lines)
+    os.replace(temp_file, file_path)
+
+def file_ends_with_newline(file_path):
+    """Check whether a data file is empty or ends with a newline"""
+    change = staged_writes() and staged_writes().get(file_path)
+    if change and change["deleted"]:
+        return True
+    if change and (change["appended"] or change["content"] is not None):
+        text = change["content"] + change["appended"] if change["content"] is not None else change["appended"]
+        return not text or text.endswith("\n")
+    try:
+        with open(change["source"] if change and change["source"] else file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) == b"\n"
+    except FileNotFoundError:
+        pass
+    return True
+
+def append_line(file_path, line):
+    """Append one line to a data file"""
+    # Start on a new line if the file does not end with one
+    if not file_ends_with_newline(file_path):
+        line = "\n" + line
+
+    change = staged_change(file_path)
+    if change is not None:
+        if change["deleted"]:
+            change.update(content="", deleted=False)
+        if change["content"] is None and change["size"] is None:
+            change["size"] = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        change["appended"] += line
+        change["version"] += 1
+        return
+
+    with open(file_path, 'a') as f:
+        f.write(line)
+
+def read_trainers():
+    """Return the list of registered trainer names"""
+    return list(load_trainer_roster())
+
+def authenticate(email, password):
+    """Return (username, role) for matching credentials, or None"""
+    with open(USER_FILE, 'r') as f:
+        for line in f:
+            user_info = line.strip().split(',')
+            # A blank password (an account replayed without one) never matches
+            if len(user_info) >= 4 and user_info[2] and user_info[1] == email and user_info[2] == password:
+                return user_info[0], user_info[3]
+    return None
+
+def add_user(username, email, password, role):
+    """Add a user account after checking for duplicate username/email"""
+    if not validate_fields(username, email, password, role):
+        return False, FIELD_ERROR
+
+    with transaction():
+        for user_info in read_records(USER_FILE, 2):
+            if user_info[0] == username or user_info[1] == email:
+                return False, "Error: Username or email already exists."
+
+        append_line(USER_FILE, f"{username},{email},{password},{role}\n")
+        emit_event("user_added", username=username, email=email, role=role)
+        return True, f"{ROLE_NAMES[role]} '{username}' registered successfully."
+
+def bulk_add_users(file_path, reject_file=None):
+    """Register users from a CSV file (username,email,password,role) in one write.
+    Rejected rows are written with a reason to reject_file when given."""
+    try:
+        f = open(file_path, 'r', encoding="utf-8", newline="")
+    except FileNotFoundError:
+        return False, f"File not found: {file_path}"
+
+    # Check and append under one lock, so concurrent registrations cannot slip in between
+    with transaction():
+        # Build the duplicate checks once instead of scanning the user file per row
+        usernames = set()
+        emails = set()
+        for user_info in read_records(USER_FILE, 2):
+            usernames.add(user_info[0])
+            emails.add(user_info[1].lower())
+
+        role_codes = {name.lower(): code for code, name in ROLE_NAMES.items()}
+        accepted = []
+        rejected = []
+        with f:
+            reader = csv.reader(f)
+            for line_number, row in enumerate(reader, 1):
+                if not any(value.strip() for value in row):
+                    continue
+                values = [value.strip() for value in row]
+                if line_number == 1 and [v.lower() for v in values[:4]] == TABLE_SCHEMAS["users"]:
+                    continue
+
+                reason = None
+                if len(values) != 4:
+                    reason = "expected username,email,password,role"
+                else:
+                    username, email, password, role = values
+                    role = role_codes.get(role.lower(), role.lower())
+                    if not validate_fields(*values):
+                        reason = "values may not contain commas or line breaks"
+                    elif not validate_username(username):
+                        reason = "username must be at least 3 characters long"
+                    elif not validate_email(email):
+                        reason = "invalid email address"
+                    elif not validate_password(password):
+                        reason = "password must be at least 6 characters long"
+                    elif role not in ROLE_NAMES:
+                        reason = "role must be a, b, c or d"
+                    elif username in usernames:
+                        reason = "username already exists"
+                    elif email.lower() in emails:
+                        reason = "email already exists"
+
+                if reason:
+                    rejected.append((line_number, values, reason))
+                    continue
+                usernames.add(username)
+                emails.add(email.lower())
+                accepted.append((username, email, password, role))
+
+        if accepted:
+            append_line(USER_FILE, "".join(f"{','.join(user)}\n" for user in accepted))
+            for username, email, password, role in accepted:
+                emit_event("user_added", username=username, email=email, role=role)
+
+    if reject_file and rejected:
+        with open(reject_file, 'w', encoding="utf-8", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["line", "username", "email", "password", "role", "reason"])
+            for line_number, values, reason in rejected:
+                writer.writerow([line_number] + (values + [""] * 4)[:4] + [reason])
+
+    message = f"Registered {len(accepted)} users, rejected {len(rejected)}."
+    if rejected:
+        if reject_file:
+            message += f" Reject report written to {reject_file}."
+        else:
+            message += "".join(f"\n  Line {n}: {reason}" for n, _, reason in rejected[:20])
+            if len(rejected) > 20:
+                message += f"\n  ... and {len(rejected) - 20} more"
+    return True, message
+
+def remove_user(username):
+    """Remove a user account by username"""
+    with transaction():
+        users = read_lines(USER_FILE)
+        filtered_users = []
+        for line in users:
+            user_info = line.strip().split(',')
+            if len(user_info) >= 4 and user_info[0] != username:
+                filtered_users.append(line)
+
+        if len(filtered_users) < len(users):
+            write_lines(USER_FILE, filtered_users)
+            emit_event("user_removed", username=username)
+            return True, f"User '{username}' deleted successfully."
+        return False, "User not found."
+
+def update_user_profile(username, new_email=None, new_password=None):
+    """Update the email and/or password of a user"""
+    if not validate_fields(new_email, new_password):
+        return False, FIELD_ERROR
+
+    with transaction():
+        users = read_lines(USER_FILE)
+        for i, line in enumerate(users):
+            user_data = line.strip().split(',')
+            if len(user_data) >= 4 and user_data[0] == username:
+                if new_email:
+                    user_data[1] = new_email
+                if new_password:
+                    user_data[2] = new_password
+                users[i] = ",".join(user_data) + "\n"
+                write_lines(USER_FILE, users)
+                emit_event("user_updated", username=username, email=new_email or None,
+                           password_changed=bool(new_password))
+                return True, "Profile updated successfully."
+        return False, "User profile not found."
+
+def add_trainer(trainer_name):
+    """Add a trainer to the trainer list"""
+    if trainer_name.startswith(TRAINER_TOMBSTONE) or not validate_field(trainer_name):
+        return False, f"Error: Trainer name cannot start with '{TRAINER_TOMBSTONE}' or contain commas or line breaks."
+
+    with transaction():
+        roster = load_trainer_roster()
+        if trainer_name in roster:
+            return False, "Error: Trainer already exists in trainer list."
+
+        append_line(TRAINERS_FILE, f"{trainer_name}\n")
+        roster[trainer_name] = None
+        roster_written()
+        emit_event("trainer_added", trainer=trainer_name)
+        return True, "Trainer added to trainer list successfully."
+
+def remove_trainer(trainer_name):
+    """Remove a trainer from the trainer list"""
+    with transaction():
+        roster = load_trainer_roster()
+        if trainer_name not in roster:
+            return False, "Trainer not found."
+
+        append_line(TRAINERS_FILE, f"{TRAINER_TOMBSTONE}{trainer_name}\n")
+        del roster[trainer_name]
+        ROSTER_CACHE["tombstones"] += 1
+        roster_written()
+        if ROSTER_CACHE["tombstones"] >= max(ROSTER_COMPACT_MIN, len(roster)):
+            compact_trainer_roster()
+        emit_event("trainer_removed", trainer=trainer_name)
+        return True, "Trainer deleted from trainer list successfully."
+
+def assign_trainer_module(module, trainer, level, charges, capacity=""):
+    """Assign a registered trainer to a module and level (blank capacity = unlimited)"""
+    if not validate_fields(module, trainer, level, charges, capacity):
+        return False, FIELD_ERROR
+
+    with transaction():
+        if trainer not in load_trainer_roster():
+            return False, "Trainer not found."
+
+        append_line(TRAINER_MODULES_FILE, f"{module},{trainer},{level},{charges},TBD" + (f",{capacity}" if capacity else "") + "\n")
+        reprice_aggregates(trainer, module, level, charges)
+        emit_event("class_assigned", module=module, trainer=trainer, level=level, charges=charges, capacity=capacity)
+        return True, "Trainer assigned to module successfully."
+
+def is_trainer_class(trainer_name, module, level):
+    """Check whether a trainer teaches a module at a level"""
+    return find_class(trainer_name, module, level) is not None
+
+def set_class_details(trainer_name, module, level, charges=None, schedule=None, capacity=None):
+    """Set the charges, schedule and/or capacity of one of a trainer's classes"""
+    if not validate_fields(charges, schedule, capacity):
+        return False, FIELD_ERROR
+
+    with transaction():
+        data = read_lines(TRAINER_MODULES_FILE)
+        for i, line in enumerate(data):
+            fields = line.strip().split(",")
+            if len(fields) >= 3 and fields[1] == trainer_name and fields[2] == level and normalize_module(fields[0]) == normalize_module(module):
+                module = fields[0]
+                # Ensure we have at least 5 fields
+                while len(fields) < 5:
+                    fields.append("TBD")
+
+                if charges is not None:
+                    fields[3] = charges
+                if schedule is not None:
+                    fields[4] = schedule
+                if capacity is not None:
+                    # The capacity column is optional; leave it off for unlimited classes
+                    fields = fields[:5] + ([capacity] if capacity else [])
+                data[i] = ",".join(fields) + "\n"
+                write_lines(TRAINER_MODULES_FILE, data)
+                emit_event("class_updated", trainer=trainer_name, module=module, level=level,
+                           charges=charges, schedule=schedule, capacity=capacity)
+                if charges is not None:
+                    reprice_aggregates(trainer_name, module, level, charges)
+                if capacity is not None:
+                    promote_waitlist(trainer_name, module, level)
+                return True, "Coaching class updated successfully."
+        return False, "Module assignment not found for you."
+
+def remove_class(trainer_name, module, level):
+    """Remove one of a trainer's coaching classes"""
+    with transaction():
+        data = read_lines(TRAINER_MODULES_FILE)
+        filtered_data = []
+        for line in data:
+            fields = line.strip().split(",")
+            if not (len(fields) >= 3 and fields[1] == trainer_name and fields[2] == level
+                    and normalize_module(fields[0]) == normalize_module(module)):
+                filtered_data.append(line)
+
+        if len(filtered_data) < len(data):
+            write_lines(TRAINER_MODULES_FILE, filtered_data)
+            emit_event("class_removed", trainer=trainer_name, module=module, level=level)
+            return True, "Coaching class deleted successfully."
+        return False, "Coaching class not found for you."
+
+def add_feedback(sender_name, feedback):
+    """Record timestamped feedback for the administrator"""
+    # Feedback lines may hold commas, but not line breaks
+    if not validate_field(feedback, "\r\n"):
+        return False, "Error: Feedback may not contain line breaks."
+
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with transaction():
+        append_line(FEEDBACK_FILE, f"[{timestamp}] {sender_name}: {feedback}\n")
+        seq = emit_event("feedback_added", timestamp=timestamp, sender=sender_name, message=feedback)
+        notify(f"feedback:{seq}", "@" + ADMIN_ROLE, f"New feedback from {sender_name}", feedback)
+    return True, "Feedback sent successfully."
+
+def enroll_student(student_name, tp_number, module_name, level, trainer_name,
+                   email, contact, month_of_enrollment, charges, address, tier=DEFAULT_WAITLIST_TIER):
+    """Enroll a student in a class; on success the message is the new student ID.
+    If the class is full the student is put on its waitlist instead."""
+    if not validate_fields(student_name, tp_number, module_name, level, trainer_name,
+                           email, contact, month_of_enrollment, charges, address, tier):
+        return False, FIELD_ERROR
+
+    with transaction():
+        module_name = resolve_module(module_name) or module_name
+        if is_student_already_enrolled(tp_number, module_name, level):
+            return False, "Student is already enrolled in this module and level."
+        if not class_has_seat(trainer_name, module_name, level):
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            success, message = add_to_waitlist("lecturer", tier, timestamp, trainer_name, module_name, level,
+                                               student_name, tp_number, email, contact, month_of_enrollment, address)
+            return False, message
+
+        student_id = generate_student_id()
+        status = "unpaid"
+        row = [student_name, tp_number, module_name, level, trainer_name, email, contact,
+               month_of_enrollment, charges, status, student_id, address]
+        append_enrollment(row)
+        emit_event("student_enrolled", row=row)
+        return True, student_id
+
+def change_enrollment(tp_number, current_module, current_level, new_module, new_level):
+    """Move a student's enrollment to another module/level"""
+    with transaction():
+        current_module = resolve_module(current_module) or current_module
+        new_module = resolve_module(new_module) or new_module
+        new_trainer = get_trainer_for_module(new_module, new_level)
+        if not new_trainer:
+            return False, "No trainer found for this module/level combination."
+
+        moving_class = (new_module, new_level) != (current_module, current_level)
+        if moving_class and not class_has_seat(new_trainer, new_module, new_level):
+            return False, "The new class is full."
+
+        new_charges = get_charges_for_module(new_module, new_level, new_trainer)
+        found = []
+
+        def move_enrollment(fields):
+            if not found and len(fields) >= 5 and fields[1] == tp_number and fields[2] == current_module and fields[3] == current_level:
+                old_trainer = fields[4]
+                fields[2] = new_module
+                fields[3] = new_level
+                fields[4] = new_trainer
+
+                # Update charges if available
+                if new_charges and len(fields) >= 9:
+                    fields[8] = new_charges
+                found.append(old_trainer)
+            return fields
+
+        rewrite_enrollments(move_enrollment)
+        if found:
+            emit_event("enrollment_changed", tp_number=tp_number, module=current_module, level=current_level,
+                       new_module=new_module, new_level=new_level, trainer=new_trainer, charges=new_charges)
+            message = "Student enrollment updated successfully."
+            promoted = promote_waitlist(found[0], current_module, current_level) if found[0] else []
+            if promoted:
+                message += f" Promoted from waitlist: {', '.join(promoted)}."
+            return True, message
+        return False, "Student enrollment record not found."
+
+def remove_student(tp_number):
+    """Remove every enrollment of a student by TP number and fill the freed seats"""
+    with transaction():
+        freed = set()
+        dropped = []
+
+        def drop_student(fields):
+            if len(fields) >= 2 and fields[1] == tp_number:
+                if len(fields) >= 5:
+                    freed.add((fields[4], fields[2], fields[3]))
+                dropped.append(fields)
+                return None
+            return fields
+
+        removed = rewrite_enrollments(drop_student)
+        if removed:
+            # Deleted enrollments are kept in the archive for the reports
+            stage_deleted_enrollments(dropped)
+            emit_event("student_removed", tp_number=tp_number)
+        if tp_number != "TBD":
+            cancel_waitlist_entries(lambda fields: fields[8] == tp_number)
+        if removed:
+            message = "Student deleted successfully."
+            promoted = []
+            for trainer_name, module, level in sorted(freed):
+                promoted.extend(promote_waitlist(trainer_name, module, level))
+            if promoted:
+                message += f" Promoted from waitlist: {', '.join(promoted)}."
+            return True, message
+        return False, "Student not found."
+
+def add_enrollment_request(student_name, module, level):
+    """Record a pending enrollment request for a student"""
+    if not validate_fields(student_name, module, level):
+        return False, FIELD_ERROR
+
+    with transaction():
+        module = resolve_module(module) or module
+        if is_request_already_sent(student_name, module, level):
+            return False, "You have already sent a request for this module and level."
+
+        status = "pending"
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        append_line(REQUESTS_FILE, format_record("requests", [student_name, module, level, status, timestamp]))
+        emit_event("request_added", student=student_name, module=module, level=level, timestamp=timestamp)
+        return True, "Enrollment request sent successfully."
+
+def process_request(request_num, approve):
+    """Approve or reject a request by its 1-based position in the requests file"""
+    with transaction():
+        # A fixed-width requests file is read and updated at the request's offset only
+        offset = request_offset(request_num)
+        if offset is not None:
+            line = read_line_at(REQUESTS_FILE, offset)
+        else:
+            requests = read_lines(REQUESTS_FILE)
+            if not 1 <= request_num <= len(requests):
+                return False, "Invalid request number."
+            line = requests[request_num - 1]
+
+        fields = line.strip().split(",")
+        if len(fields) < 4:
+            return False, "Invalid request number."
+        old_status = fields[3]
+
+        if approve:
+            # The class may have been removed since the request was sent
+            if get_trainer_for_module(fields[1], fields[2]) is None:
+                return False, "Class no longer exists."
+            # Add student to enrollment if approved, or to the waitlist if the class is full
+            timestamp = fields[4] if len(fields) > 4 else ""
+            if add_approved_student_to_enrollment(fields[0], fields[1], fields[2], timestamp):
+                fields[3] = "approved"
+                message = "Request approved and student enrolled."
+            else:
+                fields[3] = "waitlisted"
+                message = "Request approved but the class is full; student added to the waitlist."
+        else:
+            fields[3] = "rejected"
+            message = "Request rejected."
+
+        # The first decision on a request is stamped after its request timestamp
+        decided_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if len(fields) == 5 else None
+        if decided_at:
+            fields.append(decided_at)
+        if offset is None or patch_status(REQUESTS_FILE, offset, "requests", old_status, fields[3],
+                                          append=fields[5:6] if decided_at else ()) is None:
+            requests = read_lines(REQUESTS_FILE)
+            requests[request_num - 1] = format_record("requests", fields)
+            write_lines(REQUESTS_FILE, requests)
+        seq = emit_event("request_status_changed", student=fields[0], module=fields[1], level=fields[2],
+                         timestamp=fields[4] if len(fields) > 4 else "", old_status=old_status,
+                         new_status=fields[3], decided_at=decided_at)
+        notify(f"request:{seq}", fields[0], f"Enrollment request {fields[3]}",
+               f"Your request for {fields[1]} ({fields[2]}) was {fields[3]}."
+               + (" The class is full; you will be enrolled when a seat frees up." if fields[3] == "waitlisted" else ""))
+        return True, message
+
+def remove_pending_request(student_name, request_num):
+    """Remove the n-th (1-based) pending request of a student"""
+    with transaction():
+        requests = read_lines(REQUESTS_FILE)
+        pending = []
+        for i, line in enumerate(requests):
+            fields = line.strip().split(",")
+            if len(fields) >= 4 and fields[0] == student_name and fields[3] == "pending":
+                pending.append(i)
+
+        if not 1 <= request_num <= len(pending):
+            return False, "Invalid request number."
+
+        fields = requests.pop(pending[request_num - 1]).strip().split(",")
+        write_lines(REQUESTS_FILE, requests)
+        emit_event("request_removed", student=fields[0], module=fields[1], level=fields[2],
+                   timestamp=fields[4] if len(fields) > 4 else "")
+        return True, "Request deleted successfully."
+
+def get_student_invoice(student_name, month=None):
+    """Return (rows, total outstanding) for a student's enrollments, optionally for one month"""
+    rows = []
+    total_charges = 0.0
+    for fields in find_enrollments(0, student_name, months=[month] if month else None, min_fields=10):
+        if fields[0] == student_name:
+            charges = float(fields[8]) if validate_charges(fields[8]) else 0.0
+            rows.append({"tp_number": fields[1], "module": fields[2], "level": fields[3], "trainer": fields[4],
+                         "month": fields[7], "charges": charges, "status": fields[9]})
+            if fields[9] == "unpaid":
+                total_charges += charges
+    return rows, total_charges
+
+def pay_outstanding(student_name, month=None):
+    """Mark every unpaid enrollment of a student as paid, optionally for one month"""
+    paid = []
+
+    def mark_paid(fields):
+        if len(fields) >= 10 and fields[0] == student_name and fields[9] == "unpaid":
+            paid.append(float(fields[8]) if validate_charges(fields[8]) else 0.0)
+            fields[9] = "paid"
+        return fields
+
+    with transaction():
+        months = [month] if month else None
+        unpatched = "enrollments" not in status_layout()
+        if not unpatched:
+            # Padded rows are flipped in place; any others are rewritten below
+            for fields in list(find_enrollments(0, student_name, months, min_fields=11)):
+                if fields[0] == student_name and fields[9] == "unpaid":
+                    if patch_enrollment_status(fields, "paid"):
+                        paid.append(float(fields[8]) if validate_charges(fields[8]) else 0.0)
+                    else:
+                        unpatched = True
+        if unpatched:
+            rewrite_enrollments(mark_paid, months=months)
+        total_paid = sum(paid)
+        if paid:
+            seq = emit_event("payment_made", student=student_name, month=month, amount=round(total_paid, 2))
+            notify(f"payment:{seq}", student_name, "Payment received",
+                   f"We received your payment of RM{total_paid:.2f} for {month or 'all outstanding months'}.")
+    if total_paid == 0:
+        return False, "No outstanding payments."
+    return True, f"Payment of RM{total_paid:.2f} successful."
+
+# ============= TRAINER ROSTER =============
+# trainerslist.txt is append-only: a registration appends the name and a
+# deletion appends a tombstone line ("-name"). The live roster is replayed into
+# a dict (a hash set that keeps registration order) and cached until the file
+# changes. Once tombstones outnumber live trainers the file is compacted.
+
+TRAINER_TOMBSTONE = "-"
+ROSTER_COMPACT_MIN = 20
+ROSTER_CACHE = {"signature": None, "members": None, "tombstones": 0, "sorted": None}
+
+def load_trainer_roster():
+    """Return the live roster as a dict of trainer name -> None, replaying tombstones"""
+    signature = file_signature(TRAINERS_FILE)
+    if ROSTER_CACHE["members"] is None or signature != ROSTER_CACHE["signature"]:
+        members = {}
+        tombstones = 0
+        for line in read_lines(TRAINERS_FILE):
+            name = line.strip().split(',')[0]
+            if not name.strip():
+                continue
+            if name.startswith(TRAINER_TOMBSTONE):
+                members.pop(name[len(TRAINER_TOMBSTONE):], None)
+                tombstones += 1
+            else:
+                members[name] = None
+        ROSTER_CACHE.update(signature=signature, members=members, tombstones=tombstones, sorted=None)
+    return ROSTER_CACHE["members"]
+
+def roster_written():
+    """Record that the cached roster matches the file after our own write"""
+    ROSTER_CACHE["signature"] = file_signature(TRAINERS_FILE)
+    ROSTER_CACHE["sorted"] = None
+
+def compact_trainer_roster():
+    """Rewrite trainerslist.txt with only the live trainers"""
+    roster = load_trainer_roster()
+    write_lines(TRAINERS_FILE, [f"{trainer}\n" for trainer in roster])
+    ROSTER_CACHE["tombstones"] = 0
+    roster_written()
+    return True, f"Trainer list compacted to {len(roster)} trainers."
+
+def search_trainers(prefix, limit=20):
+    """Return up to limit trainer names starting with prefix (case-insensitive)"""
+    load_trainer_roster()
+    if ROSTER_CACHE["sorted"] is None:
+        ROSTER_CACHE["sorted"] = sorted((name.lower(), name) for name in ROSTER_CACHE["members"])
+    sorted_names = ROSTER_CACHE["sorted"]
+    prefix = prefix.lower()
+    matches = []
+    for key, name in sorted_names[bisect.bisect_left(sorted_names, (prefix, "")):]:
+        if not key.startswith(prefix) or len(matches) == limit:
+            break
+        matches.append(name)
+    return matches
+
+def trainer_class_index():
+    """Return trainer name -> list of (module, level) from trainermodules.txt"""
+    return load_catalog()["by_trainer"]
+
+def modules_for_trainer(trainer_name):
+    """Return the (module, level) classes a trainer teaches"""
+    return trainer_class_index().get(trainer_name, [])
+
+def trainers_without_modules():
+    """Return registered trainers that are not assigned to any class"""
+    by_trainer = trainer_class_index()
+    return [trainer for trainer in load_trainer_roster() if trainer not in by_trainer]
+
+# ============= MODULE CATALOG =============
+# One precomputed view of trainermodules.txt, rebuilt only when the file's
+# signature changes. Lookups use case- and whitespace-normalized module names
+# and return the canonical spelling. A trigram index over module names backs the
+# "did you mean" suggestions for typos.
+
+CATALOG_CACHE = {"signature": None, "catalog": None}
+SUGGESTION_MIN_SIMILARITY = 0.4
+
+def normalize_module(module_name):
+    """Case- and whitespace-insensitive key for a module name"""
+    return " ".join(module_name.split()).lower()
+
+def trigrams(text):
+    """Return the set of 3-character substrings of a padded, normalized name"""
+    text = f"  {normalize_module(text)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def load_catalog():
+    """Return the catalog of classes, rebuilding it if trainermodules.txt changed"""
+    signature = file_signature(TRAINER_MODULES_FILE)
+    if CATALOG_CACHE["catalog"] is not None and signature == CATALOG_CACHE["signature"]:
+        return CATALOG_CACHE["catalog"]
+
+    catalog = {"modules": {}, "by_key": {}, "by_class": {}, "by_trainer": {}, "trigrams": {}}
+    for fields in read_records(TRAINER_MODULES_FILE, 3):
+        module, trainer, level = fields[0], fields[1], fields[2]
+        entry = {"module": module, "trainer": trainer, "level": level,
+                 "charges": fields[3] if len(fields) > 3 else None,
+                 "schedule": fields[4] if len(fields) > 4 else None,
+                 "capacity": int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else None}
+        key = normalize_module(module)
+        catalog["modules"].setdefault(key, module)
+        catalog["by_key"].setdefault((key, level), []).append(entry)
+        catalog["by_class"].setdefault((trainer, key, level), entry)
+        catalog["by_trainer"].setdefault(trainer, []).append((module, level))
+
+    for key, module in catalog["modules"].items():
+        for gram in trigrams(module):
+            catalog["trigrams"].setdefault(gram, set()).add(key)
+
+    # Sorted by module, then level, then trainer
+    level_order = {level: i for i, level in enumerate(LEVELS)}
+    listing = sorted({(entry["module"], level_order.get(entry["level"], len(LEVELS)), entry["level"], entry["trainer"])
+                      for entries in catalog["by_key"].values() for entry in entries})
+    catalog["listing"] = [f"{module} ({level}) - Trainer: {trainer}" for module, _, level, trainer in listing]
+
+    CATALOG_CACHE.update(signature=signature, catalog=catalog)
+    return catalog
+
+def resolve_module(module_name):
+    """Return the catalog spelling of a module name, or None if it is not offered"""
+    return load_catalog()["modules"].get(normalize_module(module_name))
+
+def suggest_modules(module_name, limit=3):
+    """Return up to limit offered module names that look like module_name"""
+    catalog = load_catalog()
+    query = trigrams(module_name)
+    overlaps = {}
+    for gram in query:
+        for key in catalog["trigrams"].get(gram, ()):
+            overlaps[key] = overlaps.get(key, 0) + 1
+
+    scored = []
+    for key, overlap in overlaps.items():
+        # Average of Jaccard similarity and how much of the query is matched,
+        # so short queries like "java" still find "Java Programming"
+        jaccard = overlap / (len(query) + len(trigrams(key)) - overlap)
+        similarity = (jaccard + overlap / len(query)) / 2
+        if similarity >= SUGGESTION_MIN_SIMILARITY:
+            scored.append((-similarity, catalog["modules"][key]))
+    return [module for _, module in sorted(scored)[:limit]]
+
+def find_classes(module_name, level):
+    """Return the catalog entries for a module and level, in file order"""
+    return load_catalog()["by_key"].get((normalize_module(module_name), level), [])
+
+def find_class(trainer_name, module_name, level):
+    """Return the catalog entry of one trainer's class, or None"""
+    return load_catalog()["by_class"].get((trainer_name, normalize_module(module_name), level))
+
+# ============= CLASS CAPACITY AND WAITLIST =============
+# A class's capacity is the optional 6th field of trainermodules.txt (absent
+# means unlimited). Occupancy comes from the income aggregates, which are kept
+# up to date on every enrollment write, so capacity checks never scan the
+# enrollments. It is the class's busiest month: the billing cycle gives a
+# continuing student a row in every month, which a sum would count repeatedly.
+#
+# zwaitlist.txt is append-only: one line per waiting student
+#   id,tier,timestamp,source,trainer,module,level,name,tp,email,contact,month,address
+# and a "-id" tombstone once the entry is promoted or cancelled. It is replayed
+# into one heap per class ordered by (tier, timestamp, id), so promoting the
+# next student is a heappop.
+
+OCCUPANCY_CACHE = {"signature": None, "counts": None}
+WAITLIST_CACHE = {"signature": None, "entries": None, "heaps": None, "tombstones": 0, "next_id": 1}
+WAITLIST_COMPACT_MIN = 20
+
+def class_capacity(trainer_name, module, level):
+    """Return a class's capacity, or None if it is unlimited"""
+    entry = find_class(trainer_name, module, level)
+    return entry["capacity"] if entry else None
+
+def class_occupancy(trainer_name, module, level):
+    """Return the number of students enrolled in a class in its busiest month"""
+    data = load_aggregates()
+    if OCCUPANCY_CACHE["counts"] is None or OCCUPANCY_CACHE["signature"] != AGGREGATE_CACHE["signature"]:
+        counts = {}
+        for (trainer, class_module, class_level, month), entry in data.items():
+            if month == ALL_MONTHS:
+                continue
+            key = (trainer, class_module, class_level)
+            counts[key] = max(counts.get(key, 0), entry[0] + entry[1])
+        OCCUPANCY_CACHE.update(signature=AGGREGATE_CACHE["signature"], counts=counts)
+    return OCCUPANCY_CACHE["counts"].get((trainer_name, module, level), 0)
+
+def class_has_seat(trainer_name, module, level):
+    """Check whether a class has room for another student"""
+    capacity = class_capacity(trainer_name, module, level)
+    return capacity is None or class_occupancy(trainer_name, module, level) < capacity
+
+def load_waitlist():
+    """Replay the waitlist file into live entries and per-class heaps"""
+    signature = file_signature(WAITLIST_FILE)
+    if WAITLIST_CACHE["entries"] is None or signature != WAITLIST_CACHE["signature"]:
+        entries = {}
+        tombstones = 0
+        next_id = 1
+        for fields in read_records(WAITLIST_FILE):
+            if fields[0].startswith("-"):
+                entries.pop(fields[0][1:], None)
+                tombstones += 1
+            elif len(fields) >= 13 and fields[0][1:].isdigit():
+                entries[fields[0]] = fields[:12] + [",".join(fields[12:])]
+                next_id = max(next_id, int(fields[0][1:]) + 1)
+
+        heaps = {}
+        for entry_id, fields in entries.items():
+            heaps.setdefault((fields[4], fields[5], fields[6]), []).append(waitlist_key(fields))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        WAITLIST_CACHE.update(signature=signature, entries=entries, heaps=heaps,
+                              tombstones=tombstones, next_id=next_id)
+    return WAITLIST_CACHE
+
+def waitlist_key(fields):
+    """Heap ordering for a waitlist entry: (tier, timestamp, id number, id)"""
+    return (int(fields[1]) if fields[1].isdigit() else int(DEFAULT_WAITLIST_TIER), fields[2],
+            int(fields[0][1:]), fields[0])
+
+def waitlist_written():
+    """Record that the cached waitlist matches the file after our own write"""
+    WAITLIST_CACHE["signature"] = file_signature(WAITLIST_FILE)
+
+def add_to_waitlist(source, tier, timestamp, trainer_name, module, level,
+                    student_name, tp_number, email, contact, month_of_enrollment, address):
+    """Put a student on a class's waitlist"""
+    waitlist = load_waitlist()
+    for fields in waitlist["entries"].values():
+        if fields[4:8] == [trainer_name, module, level, student_name] and fields[8] == tp_number:
+            return False, "Class is full and the student is already on its waitlist."
+
+    entry_id = f"W{waitlist['next_id']:04d}"
+    fields = [entry_id, tier, timestamp, source, trainer_name, module, level,
+              student_name, tp_number, email, contact, month_of_enrollment, address]
+    append_line(WAITLIST_FILE, ",".join(fields) + "\n")
+    emit_event("waitlist_added", entry=fields)
+    waitlist["next_id"] += 1
+    waitlist["entries"][entry_id] = fields
+    heap = waitlist["heaps"].setdefault((trainer_name, module, level), [])
+    heapq.heappush(heap, waitlist_key(fields))
+    waitlist_written()
+
+    position = sum(1 for key in heap if key <= waitlist_key(fields))
+    return True, f"Class is full. {student_name} added to the waitlist at position {position}."
+
+def remove_waitlist_entry(entry_id):
+    """Tombstone a waitlist entry; its heap slot is skipped when popped"""
+    waitlist = load_waitlist()
+    waitlist["entries"].pop(entry_id, None)
+    append_line(WAITLIST_FILE, f"-{entry_id}\n")
+    emit_event("waitlist_removed", entry_id=entry_id)
+    waitlist["tombstones"] += 1
+    waitlist_written()
+
+def compact_waitlist():
+    """Rewrite the waitlist file with only the live entries"""
+    waitlist = load_waitlist()
+    write_lines(WAITLIST_FILE, [",".join(fields) + "\n" for fields in waitlist["entries"].values()])
+    for key, heap in waitlist["heaps"].items():
+        heap[:] = [item for item in heap if item[3] in waitlist["entries"]]
+        heapq.heapify(heap)
+    waitlist["tombstones"] = 0
+    waitlist_written()
+
+def cancel_waitlist_entries(match):
+    """Remove every waitlist entry whose fields satisfy match(fields)"""
+    waitlist = load_waitlist()
+    cancelled = [entry_id for entry_id, fields in waitlist["entries"].items() if match(fields)]
+    for entry_id in cancelled:
+        remove_waitlist_entry(entry_id)
+    if waitlist["tombstones"] >= max(WAITLIST_COMPACT_MIN, len(waitlist["entries"])):
+        compact_waitlist()
+    return len(cancelled)
+
+def promote_waitlist(trainer_name, module, level):
+    """Enroll waiting students into a class while it has free seats; returns their names"""
+    with transaction():
+        waitlist = load_waitlist()
+        heap = waitlist["heaps"].get((trainer_name, module, level))
+        promoted = []
+        while heap and class_has_seat(trainer_name, module, level):
+            entry_id = heapq.heappop(heap)[3]
+            fields = waitlist["entries"].get(entry_id)
+            if fields is None:
+                continue
+            remove_waitlist_entry(entry_id)
+
+            source, student_name, tp_number, email, contact, month_of_enrollment, address = [fields[3]] + fields[7:]
+            charges = get_charges_for_module(module, level, trainer_name) or "0"
+            row = [student_name, tp_number, module, level, trainer_name, email, contact,
+                   month_of_enrollment, charges, "unpaid", generate_student_id(), address]
+            append_enrollment(row)
+            emit_event("student_enrolled", row=row)
+            if source == "request":
+                set_request_status(student_name, module, level, "waitlisted", "approved")
+            promoted.append(student_name)
+
+        if waitlist["tombstones"] >= max(WAITLIST_COMPACT_MIN, len(waitlist["entries"])):
+            compact_waitlist()
+        return promoted
+
+def get_waitlist(trainer_name, module, level):
+    """Return a class's waitlist entries in promotion order"""
+    waitlist = load_waitlist()
+    heap = waitlist["heaps"].get((trainer_name, module, level), [])
+    return [waitlist["entries"][item[3]] for item in sorted(heap) if item[3] in waitlist["entries"]]
+
+def set_request_status(student_name, module, level, old_status, new_status):
+    """Change the status of a student's first request for a class that has old_status"""
+    requests = read_lines(REQUESTS_FILE)
+    for i, line in enumerate(requests):
+        fields = line.strip().split(",")
+        if len(fields) >= 4 and fields[:3] == [student_name, module, level] and fields[3] == old_status:
+            fields[3] = new_status
+            requests[i] = format_record("requests", fields)
+            with transaction():
+                offset = request_offset(i + 1)
+                if offset is None or patch_status(REQUESTS_FILE, offset, "requests", old_status, new_status) is None:
+                    write_lines(REQUESTS_FILE, requests)
+                emit_event("request_status_changed", student=student_name, module=module, level=level,
+                           timestamp=fields[4] if len(fields) > 4 else "", old_status=old_status, new_status=new_status)
+            return True
+    return False
+
+# ============= ENROLLMENT STORAGE =============
+# Enrollments live in zstudents.txt, or - after migrate_to_partitions() - in one
+# file per month_of_enrollment under zstudents_partitions/ with a manifest of
+# "month,file,rows" lines. Month-scoped queries then open only their partitions.
+
+def partition_key(month):
+    """Normalize a month of enrollment to its partition key (e.g. 'jan' -> 'January')"""
+    value = month.strip()
+    if len(value) >= 3:
+        for name in MONTHS:
+            if name.lower().startswith(value.lower()):
+                return name
+    cleaned = "".join(c for c in value if c.isalnum())
+    return cleaned or "Unknown"
+
+def partitions_enabled():
+    """Check whether enrollments are stored as monthly partitions"""
+    return data_file_exists(PARTITION_MANIFEST_FILE)
+
+def read_partition_manifest():
+    """Return {month key: {"file": path, "rows": count}} from the manifest"""
+    manifest = {}
+    for fields in read_records(PARTITION_MANIFEST_FILE, 3):
+        rows = int(fields[2]) if fields[2].isdigit() else 0
+        manifest[fields[0]] = {"file": os.path.join(PARTITIONS_DIR, fields[1]), "rows": rows}
+    return manifest
+
+def write_partition_manifest(manifest):
+    """Write the partition manifest, months in calendar order"""
+    def month_order(key):
+        return (MONTHS.index(key), key) if key in MONTHS else (len(MONTHS), key)
+
+    write_lines(PARTITION_MANIFEST_FILE,
+                [f"{key},{os.path.basename(manifest[key]['file'])},{manifest[key]['rows']}\n"
+                 for key in sorted(manifest, key=month_order)])
+
+def enrollment_files(months=None):
+    """Return (month key, path) pairs to scan; the key is None for the unpartitioned file"""
+    if not partitions_enabled():
+        return [(None, STUDENTS_FILE)]
+
+    manifest = read_partition_manifest()
+    if months is None:
+        keys = list(manifest)
+    else:
+        keys = [key for key in dict.fromkeys(partition_key(m) for m in months) if key in manifest]
+    return [(key, manifest[key]["file"]) for key in keys]
+
+def iter_enrollments(months=None, min_fields=1):
+    """Yield enrollment rows, opening only the partitions of the given months"""
+    month_keys = {partition_key(m) for m in months} if months is not None else None
+    profiles = enrollment_profiles()
+    for key, file_path in enrollment_files(months):
+        for fields in read_records(file_path, min_fields):
+            # The unpartitioned file has to be filtered row by row
+            if key is None and month_keys is not None:
+                if len(fields) < 8 or partition_key(fields[7]) not in month_keys:
+                    continue
+            yield expand_enrollment(fields, profiles) if profiles else fields
+
+def append_enrollment(fields):
+    """Append one enrollment row to zstudents.txt or its month partition"""
+    with transaction():
+        row = fields
+        if profiles_enabled() and len(fields) >= 12 and fields[1] != "TBD":
+            # A new student's details become their profile; the row then refers to it
+            if fields[1] not in load_profiles():
+                save_profile(fields[1], *row_profile(fields))
+            row = slim_enrollment(fields, load_profiles())
+        line = format_record("enrollments", row)
+        if not partitions_enabled():
+            append_line(STUDENTS_FILE, line)
+        else:
+            key = partition_key(fields[7] if len(fields) > 7 else "")
+            manifest = read_partition_manifest()
+            if key not in manifest:
+                manifest[key] = {"file": os.path.join(PARTITIONS_DIR, f"zstudents_{key}.txt"), "rows": 0}
+            append_line(manifest[key]["file"], line)
+            manifest[key]["rows"] += 1
+            write_partition_manifest(manifest)
+        update_aggregates(added=[fields])
+
+def append_enrollments(rows):
+    """Append many enrollment rows with one write per file; returns the number appended"""
+    with transaction():
+        profiles = enrollment_profiles()
+        layout = status_layout()
+        aggregates = load_aggregates() if file_signature(AGGREGATES_FILE) is not None else None
+        prices = read_class_prices()
+        lines = {}
+        count = 0
+        for fields in rows:
+            row = fields
+            if profiles is not None and len(fields) >= 12 and fields[1] != "TBD":
+                if fields[1] not in profiles:
+                    save_profile(fields[1], *row_profile(fields))
+                    profiles = load_profiles()
+                row = slim_enrollment(fields, profiles)
+            lines.setdefault(partition_key(fields[7]) if len(fields) > 7 else "", []).append(
+                format_record("enrollments", row, layout))
+            if aggregates is not None:
+                add_row_to_aggregates(aggregates, fields, 1, prices)
+            count += 1
+        if not count:
+            return 0
+
+        if not partitions_enabled():
+            append_line(STUDENTS_FILE, "".join(line for batch in lines.values() for line in batch))
+        else:
+            manifest = read_partition_manifest()
+            for key, batch in lines.items():
+                if key not in manifest:
+                    manifest[key] = {"file": os.path.join(PARTITIONS_DIR, f"zstudents_{key}.txt"), "rows": 0}
+                append_line(manifest[key]["file"], "".join(batch))
+                manifest[key]["rows"] += len(batch)
+            write_partition_manifest(manifest)
+        if aggregates is not None:
+            save_aggregates(aggregates)
+        return count
+
+def rewrite_enrollments(update_func, months=None):
+    """Apply update_func to enrollment rows and rewrite only the files that changed.
+    update_func gets a row's fields and returns them (possibly modified) or None to drop the row.
+    Returns the number of rows changed or dropped."""
+    with transaction():
+        month_keys = {partition_key(m) for m in months} if months is not None else None
+        manifest = read_partition_manifest() if partitions_enabled() else None
+        profiles = enrollment_profiles()
+        layout = status_layout()
+        changed = 0
+        moved = []
+        removed_rows = []
+        added_rows = []
+
+        for key, file_path in enrollment_files(months):
+            data = read_lines(file_path)
+            new_data = []
+            file_changed = False
+            for line in data:
+                fields = line.strip().split(",")
+                if not line.strip() or (key is None and month_keys is not None and
+                                        (len(fields) < 8 or partition_key(fields[7]) not in month_keys)):
+                    new_data.append(line)
+                    continue
+
+                if profiles:
+                    fields = expand_enrollment(fields, profiles)
+                result = update_func(list(fields))
+                if result == fields:
+                    new_data.append(line)
+                    continue
+
+                changed += 1
+                file_changed = True
+                removed_rows.append(fields)
+                if result is None:
+                    continue
+                # A row whose month changed belongs to another partition
+                if key is not None and len(result) > 7 and partition_key(result[7]) != key:
+                    moved.append(result)
+                else:
+                    new_data.append(format_record("enrollments", slim_enrollment(result, profiles) if profiles else result,
+                                                  layout))
+                    added_rows.append(result)
+
+            if file_changed:
+                write_lines(file_path, new_data)
+                if manifest is not None:
+                    manifest[key]["rows"] = len(new_data)
+
+        if manifest is not None and changed:
+            write_partition_manifest(manifest)
+        if changed:
+            update_aggregates(removed=removed_rows, added=added_rows)
+        for fields in moved:
+            append_enrollment(fields)
+        return changed
+
+def write_partition_files(rows):
+    """Stream enrollment rows into fresh partition files, staged in the current transaction,
+    and return their manifest"""
+    os.makedirs(PARTITIONS_DIR, exist_ok=True)
+    manifest = {}
+    handles = {}
+    layout = status_layout()
+    try:
+        for fields in rows:
+            key = partition_key(fields[7] if len(fields) > 7 else "")
+            if key not in handles:
+                file_path = os.path.join(PARTITIONS_DIR, f"zstudents_{key}.txt")
+                handles[key] = open(file_path + ".tmp", 'w')
+                manifest[key] = {"file": file_path, "rows": 0}
+            handles[key].write(format_record("enrollments", fields, layout))
+            manifest[key]["rows"] += 1
+    finally:
+        for handle in handles.values():
+            handle.close()
+    for entry in manifest.values():
+        stage_file(entry["file"], entry["file"] + ".tmp")
+    return manifest
+
+def migrate_to_partitions():
+    """Split zstudents.txt into per-month partition files"""
+    with transaction():
+        if partitions_enabled():
+            return False, "Enrollments are already partitioned by month."
+
+        manifest = write_partition_files(read_records(STUDENTS_FILE))
+
+        # Keep the original file as a backup; the partitions, the manifest and the
+        # emptied zstudents.txt are committed together
+        backup_file = STUDENTS_FILE + ".premigration"
+        shutil.copyfile(STUDENTS_FILE, backup_file + ".tmp")
+        stage_file(backup_file, backup_file + ".tmp")
+        write_partition_manifest(manifest)
+        write_lines(STUDENTS_FILE, [])
+
+    total_rows = sum(entry["rows"] for entry in manifest.values())
+    return True, f"Split {total_rows} enrollments into {len(manifest)} monthly partitions (backup: {os.path.basename(backup_file)})."
+
+def merge_partitions():
+    """Merge the monthly partitions back into zstudents.txt"""
+    with transaction():
+        if not partitions_enabled():
+            return False, "Enrollments are not partitioned."
+
+        manifest = read_partition_manifest()
+        existing = [line.rstrip("\n") + "\n" for line in read_lines(STUDENTS_FILE) if line.strip()]
+        layout = status_layout()
+        temp_file = STUDENTS_FILE + ".tmp"
+        with open(temp_file, 'w') as out:
+            out.writelines(existing)
+            for key, file_path in enrollment_files():
+                for fields in read_records(file_path):
+                    out.write(format_record("enrollments", fields, layout))
+        stage_file(STUDENTS_FILE, temp_file)
+
+        remove_file(PARTITION_MANIFEST_FILE)
+        for entry in manifest.values():
+            remove_file(entry["file"])
+
+    total_rows = sum(entry["rows"] for entry in manifest.values())
+    return True, f"Merged {len(manifest)} monthly partitions ({total_rows} enrollments) into zstudents.txt."
+
+# ============= STUDENT PROFILES =============
+# After migrate_to_profiles() a student's name, email, contact and address are
+# kept once per TP number in zprofiles.txt ("tp,name,email,contact,address",
+# appended on change; the last line of a TP wins) instead of on every
+# enrollment row. A row whose details match its TP's profile is stored slim,
+# with those four columns left empty; rows without a TP yet ("TBD") or with
+# different details keep them inline. Readers join slim rows back through the
+# in-memory profile index, so the rest of the program still sees 12 fields.
+
+PROFILE_COLUMNS = (0, 5, 6, 11)
+PROFILE_CACHE = {"signature": None, "profiles": None, "names": None}
+
+def profiles_enabled():
+    """Check whether student details are stored in the profile table"""
+    return data_file_exists(PROFILES_FILE)
+
+def load_profiles():
+    """Return the profile index {tp: [name, email, contact, address]}"""
+    signature = file_signature(PROFILES_FILE)
+    if PROFILE_CACHE["profiles"] is None or signature != PROFILE_CACHE["signature"]:
+        profiles = {}
+        for fields in read_records(PROFILES_FILE, 5):
+            profiles[fields[0]] = fields[1:4] + [",".join(fields[4:])]
+        names = {}
+        for tp_number, profile in profiles.items():
+            names.setdefault(profile[0], []).append(tp_number)
+        PROFILE_CACHE.update(signature=signature, profiles=profiles, names=names)
+    return PROFILE_CACHE["profiles"]
+
+def enrollment_profiles():
+    """Return the profile index, or None while student details are stored inline"""
+    return load_profiles() if profiles_enabled() else None
+
+def profile_tp_numbers(student_name):
+    """Return the TP numbers whose profile has this student name"""
+    load_profiles()
+    return PROFILE_CACHE["names"].get(student_name, [])
+
+def row_profile(fields):
+    """Return the [name, email, contact, address] stored on a full enrollment row"""
+    return [fields[0], fields[5], fields[6], ",".join(fields[11:])]
+
+def expand_enrollment(fields, profiles):
+    """Fill a slim row's student details in from its profile"""
+    if fields[0] or len(fields) < 12 or fields[1] not in profiles:
+        return fields
+    row = fields[:12]
+    row[0], row[5], row[6], row[11] = profiles[fields[1]]
+    return row
+
+def slim_enrollment(fields, profiles):
+    """Leave out a row's student details if they are the same as its profile"""
+    if len(fields) < 12 or profiles.get(fields[1]) != row_profile(fields):
+        return fields
+    return [""] + fields[1:5] + ["", ""] + fields[7:11] + [""]
+
+def student_profile(tp_number):
+    """Return [name, email, contact, address] of a TP number, or None if it is unknown"""
+    profiles = enrollment_profiles()
+    if profiles is not None and tp_number in profiles:
+        return profiles[tp_number]
+    rows = list(find_enrollments(1, tp_number, min_fields=12))
+    return row_profile(rows[-1]) if rows else None
+
+def save_profile(tp_number, name, email, contact, address):
+    """Record a student's details in the profile table if they changed"""
+    with transaction():
+        if load_profiles().get(tp_number) != [name, email, contact, address]:
+            append_line(PROFILES_FILE, f"{tp_number},{name},{email},{contact},{address}\n")
+
+def update_student_profile(tp_number, email=None, contact=None, address=None):
+    """Change a student's contact details (None = unchanged) for all their enrollments"""
+    if not validate_fields(email, contact, address):
+        return False, FIELD_ERROR
+
+    with transaction():
+        rows = list(find_enrollments(1, tp_number, min_fields=12))
+        if not rows:
+            return False, "Student not found."
+
+        profiles = enrollment_profiles()
+        current = profiles.get(tp_number) if profiles else None
+        name, old_email, old_contact, old_address = current or row_profile(rows[-1])
+        details = [name, email or old_email, contact or old_contact,
+                   old_address if address is None else address]
+        if profiles is not None:
+            save_profile(tp_number, *details)
+
+        # Slim rows now read the new profile; only rows holding their own copy are rewritten
+        if any(row_profile(fields) != details for fields in find_enrollments(1, tp_number, min_fields=12)):
+            def set_details(fields):
+                if len(fields) >= 12 and fields[1] == tp_number:
+                    return [details[0]] + fields[1:5] + details[1:3] + fields[7:11] + [details[3]]
+                return fields
+
+            rewrite_enrollments(set_details)
+        emit_event("profile_updated", tp_number=tp_number, email=details[1], contact=details[2],
+                   address=details[3])
+        return True, "Student details updated successfully."
+
+def restream_enrollments(transform, layout=None):
+    """Stream every enrollment file through transform(fields) into a fresh copy,
+    staged in the current transaction. Returns (rows, rows changed, bytes before, bytes after)."""
+    layout = status_layout() if layout is None else layout
+    rows, changed, before, after = 0, 0, 0, 0
+    for key, file_path in enrollment_files():
+        if not data_file_exists(file_path):
+            continue
+        temp_file = file_path + ".tmp"
+        with open(temp_file, 'w') as out:
+            for line in iter_data_lines(file_path):
+                before += len(line.encode())
+                if not line.strip():
+                    continue
+                fields = line.strip().split(",")
+                result = transform(fields)
+                rows += 1
+                changed += result != fields
+                out.write(format_record("enrollments", result, layout))
+        after += os.path.getsize(temp_file)
+        stage_file(file_path, temp_file)
+    return rows, changed, before, after
+
+def migrate_to_profiles():
+    """Move student details out of the enrollment rows into zprofiles.txt"""
+    with transaction():
+        # Existing profiles stay as they are; a new TP takes the details of its latest row
+        profiles = dict(load_profiles()) if profiles_enabled() else {}
+        found = {}
+        for fields in iter_enrollments(min_fields=12):
+            if fields[1] != "TBD" and fields[1] not in profiles:
+                found[fields[1]] = row_profile(fields)
+        profiles.update(found)
+
+        # The profiles and the slimmed rows are committed together
+        profile_lines = [f"{tp_number},{','.join(profile)}\n" for tp_number, profile in profiles.items()]
+        write_lines(PROFILES_FILE, profile_lines)
+        profiles_size = sum(len(line.encode()) for line in profile_lines)
+        rows, slimmed, before, after = restream_enrollments(
+            lambda fields: slim_enrollment(expand_enrollment(fields, profiles), profiles))
+    reset_caches()
+    return True, (f"Stored {len(profiles)} student profiles ({len(found)} new) and slimmed {slimmed} enrollment rows: "
+                  f"{before / 1024:.1f} KB of enrollments is now {after / 1024:.1f} KB "
+                  f"+ {profiles_size / 1024:.1f} KB of profiles.")
+
+def inline_profiles():
+    """Copy the student details back onto every enrollment row and drop zprofiles.txt"""
+    with transaction():
+        if not profiles_enabled():
+            return False, "Student details are already stored on the enrollment rows."
+
+        profiles = load_profiles()
+        rows, expanded, before, after = restream_enrollments(lambda fields: expand_enrollment(fields, profiles))
+        remove_file(PROFILES_FILE)
+    reset_caches()
+    return True, f"Copied student details back onto {expanded} enrollment rows ({before / 1024:.1f} KB -> {after / 1024:.1f} KB)."
+
+# ============= FIXED-WIDTH STATUS COLUMNS =============
+# The most common writes only flip a status: unpaid -> paid in the enrollments,
+# pending -> approved/rejected in zrequests.txt. After pad_status_columns()
+# (which writes zstatus_layout.txt: "table,status column,width" lines) every
+# enrollment and request line ends in enough spaces for its status to grow to
+# the widest value, so a flip rewrites just that line in place: the status and
+# the fields after it shift within the line and the padding takes up the
+# difference. Readers strip lines, so the files stay plain CSV to them, and
+# unpad_status_columns() converts back.
+#
+# Line offsets come from an in-memory record index that reads only the bytes
+# appended since it was last used and starts over when a file is replaced. A
+# flip is staged in the transaction as an [offset, new line] patch and written
+# at commit with one seek and write under a lock on that record. Lines with no
+# room (not padded yet) are rewritten the old way. Undecided requests also keep
+# room for the decision timestamp that process_request appends.
+
+STATUS_COLUMNS = {"enrollments": (9, 6), "requests": (3, 10)}
+DECISION_ROOM = len(",2024-01-15 10:30:00")
+STATUS_LAYOUT_CACHE = {"signature": None, "layout": {}}
+RECORD_INDEX = {}
+
+def status_layout():
+    """Return {table: (status column, width)} for the tables stored fixed-width"""
+    signature = file_signature(STATUS_LAYOUT_FILE)
+    if signature != STATUS_LAYOUT_CACHE["signature"]:
+        layout = {}
+        for fields in read_records(STATUS_LAYOUT_FILE, 3):
+            if fields[1].isdigit() and fields[2].isdigit():
+                layout[fields[0]] = (int(fields[1]), int(fields[2]))
+        STATUS_LAYOUT_CACHE.update(signature=signature, layout=layout)
+    return STATUS_LAYOUT_CACHE["layout"]
+
+def format_record(table, fields, layout=None):
+    """Join a row into a data file line, padded for in-place status changes if the table is fixed-width"""
+    line = ",".join(fields)
+    column, width = (status_layout() if layout is None else layout).get(table, (None, 0))
+    if column is not None and len(fields) > column and len(fields[column]) < width:
+        line += " " * (width - len(fields[column]))
+    if column is not None and table == "requests" and len(fields) == 5:
+        line += " " * DECISION_ROOM
+    return line + "\n"
+
+def record_index(file_path, key_column=None):
+    """Return {"offsets": [start of each line], "keys": {key column value: line start}} for a file.
+    Only the bytes appended since the last call are read; a replaced or shrunk file is indexed again."""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    index = RECORD_INDEX.get(file_path)
+    if (index is None or index["inode"] != stat.st_ino or stat.st_size < index["size"]
+            or index["key_column"] != key_column):
+        index = {"inode": stat.st_ino, "size": 0, "partial": False, "key_column": key_column,
+                 "offsets": [], "keys": {}}
+        RECORD_INDEX[file_path] = index
+    if stat.st_size > index["size"]:
+        with open(file_path, 'rb') as f:
+            f.seek(index["size"])
+            offset = index["size"]
+            for line in f:
+                if index["partial"]:
+                    # The rest of a last line that had no newline yet
+                    index["partial"] = False
+                else:
+                    index["offsets"].append(offset)
+                    if key_column is not None:
+                        fields = line.split(b",")
+                        if len(fields) > key_column:
+                            index["keys"].setdefault(fields[key_column].strip().decode(), offset)
+                index["partial"] = not line.endswith(b"\n")
+                offset += len(line)
+            index["size"] = offset
+    return index
+
+def status_patch_ready(file_path, table):
+    """Check that a fixed-width file can take in-place patches in this transaction"""
+    if table not in status_layout():
+        return False
+    # Offsets are those of the file on disk, so it must have no staged rewrite or append
+    change = staged_writes() and staged_writes().get(file_path)
+    return not change or (change["content"] is None and not change["appended"] and not change["source"]
+                          and not change["deleted"])
+
+def read_line_at(file_path, offset):
+    """Return the line starting at a byte offset as the current transaction would leave it"""
+    change = staged_writes() and staged_writes().get(file_path)
+    for patch_offset, text in reversed(change["patches"] if change else []):
+        if patch_offset == offset:
+            return text
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.readline().rstrip(b"\n").decode()
+
+def patch_status(file_path, offset, table, old_status, new_status, match=(), append=()):
+    """Stage an in-place status change of the line at offset if it still holds old_status
+    and the (column, value) pairs in match, adding the append fields to the end of the line.
+    Returns the new fields, or None to rewrite instead."""
+    if not status_patch_ready(file_path, table):
+        return None
+    column = status_layout()[table][0]
+    text = read_line_at(file_path, offset)
+    fields = text.strip().split(",")
+    if len(fields) <= column or fields[column] != old_status:
+        return None
+    if any(len(fields) <= i or fields[i] != value for i, value in match):
+        return None
+
+    fields[column] = new_status
+    fields.extend(append)
+    line = ",".join(fields)
+    room = len(text.encode()) - len(line.encode())
+    if room < 0:
+        return None
+    change = staged_change(file_path)
+    change["patches"].append([offset, line + " " * room])
+    change["version"] += 1
+    return fields
+
+def request_offset(request_num):
+    """Return the byte offset of the n-th (1-based) line of zrequests.txt, or None to read the file instead"""
+    if not status_patch_ready(REQUESTS_FILE, "requests"):
+        return None
+    index = record_index(REQUESTS_FILE)
+    if index is None or not 1 <= request_num <= len(index["offsets"]):
+        return None
+    return index["offsets"][request_num - 1]
+
+def patch_enrollment_status(fields, new_status):
+    """Flip one enrollment row's status in place; returns False if it has to be rewritten instead"""
+    if len(fields) < 11 or "enrollments" not in status_layout():
+        return False
+    if partitions_enabled():
+        entry = read_partition_manifest().get(partition_key(fields[7]))
+        file_path = entry["file"] if entry else None
+    else:
+        file_path = STUDENTS_FILE
+    if file_path is None or not status_patch_ready(file_path, "enrollments"):
+        return False
+
+    index = record_index(file_path, 10)
+    offset = index["keys"].get(fields[10]) if index else None
+    if offset is None:
+        return False
+    new_fields = patch_status(file_path, offset, "enrollments", fields[9], new_status,
+                              match=[(1, fields[1]), (2, fields[2]), (3, fields[3]), (10, fields[10])])
+    if new_fields is None:
+        return False
+    update_aggregates(removed=[fields], added=[new_fields])
+    return True
+
+def convert_status_layout(layout):
+    """Rewrite the enrollment and request files with or without status padding"""
+    rows, changed, before, after = restream_enrollments(lambda fields: fields, layout)
+    requests = read_lines(REQUESTS_FILE)
+    write_lines(REQUESTS_FILE, [format_record("requests", line.strip().split(","), layout) if line.strip() else line
+                                for line in requests])
+    return rows, sum(1 for line in requests if line.strip()), before, after
+
+def pad_status_columns():
+    """Switch the enrollments and requests to the fixed-width status layout"""
+    with transaction():
+        if status_layout():
+            return False, "Status columns are already fixed-width."
+
+        # The layout file and the padded files are committed together
+        write_lines(STATUS_LAYOUT_FILE, [f"{table},{column},{width}\n" for table, (column, width) in STATUS_COLUMNS.items()])
+        rows, requests, before, after = convert_status_layout(status_layout())
+    reset_caches()
+    return True, (f"Padded the status column of {rows} enrollments and {requests} requests "
+                  f"({before / 1024:.1f} KB -> {after / 1024:.1f} KB of enrollments); status changes are now written in place.")
+
+def unpad_status_columns():
+    """Convert the fixed-width status layout back to plain comma separated lines"""
+    with transaction():
+        if not status_layout():
+            return False, "Status columns are not fixed-width."
+
+        remove_file(STATUS_LAYOUT_FILE)
+        rows, requests, before, after = convert_status_layout({})
+    reset_caches()
+    return True, f"Removed the status padding from {rows} enrollments and {requests} requests."
+
+# ============= MMAP SCANNING =============
+# Read-only lookups by one column (trainer, TP number, student name) search the
+# memory-mapped bytes of the data files for the delimited value and decode only
+# the lines around each hit. Rows that cannot match are never turned into str.
+
+def scan_records(file_path, column, value, min_fields=1):
+    """Yield the fields of every line in a data file whose column equals value"""
+    if (staged_writes() and file_path in staged_writes()) or not value or "," in value or "\n" in value:
+        # A file with staged writes is only visible line by line
+        for fields in read_records(file_path, min_fields):
+            if len(fields) > column and fields[column] == value:
+                yield fields
+        return
+
+    try:
+        f = open(file_path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Column 0 starts a line; any other column sits between commas
+            needle = value.encode() + b"," if column == 0 else b"," + value.encode() + b","
+            position = data.find(needle)
+            while position != -1:
+                start = data.rfind(b"\n", 0, position + (1 if column == 0 else 0)) + 1
+                end = data.find(b"\n", position)
+                if end == -1:
+                    end = len(data)
+                fields = data[start:end].decode().strip().split(",")
+                if len(fields) >= min_fields and len(fields) > column and fields[column] == value:
+                    yield fields
+                position = data.find(needle, end)
+
+def find_enrollments(column, value, months=None, min_fields=1):
+    """Yield enrollment rows whose column equals value, optionally for some months"""
+    profiles = enrollment_profiles()
+    if not profiles:
+        yield from scan_enrollments(column, value, months, min_fields)
+    elif column == 0:
+        # Slim rows have no name, so find them by the TP numbers whose profile has it
+        for tp_number in profile_tp_numbers(value):
+            for fields in scan_enrollments(1, tp_number, months, min_fields):
+                if not fields[0]:
+                    yield expand_enrollment(fields, profiles)
+        yield from scan_enrollments(0, value, months, min_fields)
+    elif column in PROFILE_COLUMNS:
+        for fields in iter_enrollments(months, min_fields):
+            if len(fields) > column and fields[column] == value:
+                yield fields
+    else:
+        for fields in scan_enrollments(column, value, months, min_fields):
+            yield expand_enrollment(fields, profiles)
+
+def scan_enrollments(column, value, months=None, min_fields=1):
+    """Yield the stored (possibly slim) enrollment rows whose column equals value"""
+    month_keys = {partition_key(m) for m in months} if months is not None else None
+    for key, file_path in enrollment_files(months):
+        for fields in scan_records(file_path, column, value, min_fields):
+            if key is None and month_keys is not None:
+                if len(fields) < 8 or partition_key(fields[7]) not in month_keys:
+                    continue
+            yield fields
+
+# ============= PARALLEL SCANNING =============
+# Full-file reports split each enrollment file into byte ranges that end on a
+# newline and run a task over every range in a ProcessPoolExecutor. A task is a
+# top-level function (so it can be pickled) that takes an iterable of row
+# fields and returns a partial result; merge combines the partial results.
+# Small files are a single range and run in-process.
+
+SCAN_CHUNK_BYTES = 32 * 1024 * 1024
+
+def chunk_ranges(file_path, chunk_bytes=SCAN_CHUNK_BYTES):
+    """Split a file into (start, end) byte ranges that each end after a newline"""
+    try:
+        size = os.path.getsize(file_path)
+    except FileNotFoundError:
+        return []
+
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as f:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def scan_chunk(file_path, start, end, task, month_keys=None):
+    """Run a task over the rows in one byte range of a file (or all of an archive segment)"""
+    if is_segment(file_path):
+        # Compressed segments cannot be split, so one worker streams a whole segment
+        with open_segment(file_path) as f:
+            f.readline()  # header
+            rows = (line.strip().split(',') for line in f if line.strip())
+            if month_keys is not None:
+                rows = (fields for fields in rows if len(fields) >= 8 and partition_key(fields[7]) in month_keys)
+            return task(rows)
+
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start).decode()
+
+    rows = (line.strip().split(',') for line in data.splitlines() if line.strip())
+    if month_keys is not None:
+        rows = (fields for fields in rows if len(fields) >= 8 and partition_key(fields[7]) in month_keys)
+    return task(rows)
+
+def parallel_scan(task, merge, months=None, workers=None, archived=False):
+    """Run task over every enrollment row on all cores and merge the partial results.
+    archived also scans the enrollments of deleted students kept in the archive."""
+    month_keys = {partition_key(m) for m in months} if months is not None else None
+    if staged_writes() is not None:
+        # Staged rows only exist in memory, so scan them in this process
+        rows = iter_enrollments(months)
+        if archived:
+            rows = itertools.chain(rows, (fields for fields in iter_archive("enrollments")
+                                          if month_keys is None or partition_key(fields[7]) in month_keys))
+        return merge([task(rows)])
+
+    jobs = []
+    for key, file_path in enrollment_files(months):
+        for start, end in chunk_ranges(file_path):
+            # Partition files hold one month already; only the single file needs filtering
+            jobs.append((file_path, start, end, task, month_keys if key is None else None))
+    partials = []
+    if archived:
+        jobs += [(entry["file"], 0, 0, task, month_keys) for entry in archive_segments("enrollments")]
+        # Deletions not yet folded into a segment are few, so they are scanned here
+        partials.append(task(fields for fields in iter_deleted_enrollments()
+                             if month_keys is None or partition_key(fields[7]) in month_keys))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return merge(partials + [scan_chunk(*job) for job in jobs])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge(partials + list(pool.map(scan_chunk, *zip(*jobs))))
+
+def merge_totals(results):
+    """Merge {key: [numbers]} partial results by adding the numbers"""
+    merged = {}
+    for partial in results:
+        for key, values in partial.items():
+            if key in merged:
+                merged[key] = [a + b for a, b in zip(merged[key], values)]
+            else:
+                merged[key] = list(values)
+    return merged
+
+def aggregate_chunk(prices, rows):
+    """Task: income aggregates for a chunk of enrollment rows"""
+    data = {}
+    for fields in rows:
+        add_row_to_aggregates(data, fields, 1, prices)
+    return data
+
+def outstanding_chunk(rows):
+    """Task: unpaid enrollment count and amount per student (name, TP number)"""
+    totals = {}
+    for fields in rows:
+        if len(fields) >= 10 and fields[9] == "unpaid":
+            entry = totals.setdefault((fields[0], fields[1]), [0, 0.0])
+            entry[0] += 1
+            entry[1] += float(fields[8]) if validate_charges(fields[8]) else 0.0
+    return totals
+
+def enrollment_count_chunk(rows):
+    """Task: enrollment and paid counts per (module, level, month)"""
+    counts = {}
+    for fields in rows:
+        if len(fields) >= 10:
+            entry = counts.setdefault((fields[2], fields[3], partition_key(fields[7])), [0, 0])
+            entry[0] += 1
+            if fields[9] == "paid":
+                entry[1] += 1
+    return counts
+
+def income_report(months=None, workers=None, archived=False):
+    """Return {(trainer, module, level): [paid, unpaid, revenue, outstanding]} from a full scan"""
+    by_month = parallel_scan(functools.partial(aggregate_chunk, read_class_prices()), merge_totals,
+                             months, workers, archived)
+    return merge_totals([{key[:3]: values} for key, values in by_month.items() if key[3] != ALL_MONTHS])
+
+def outstanding_report(months=None, workers=None, archived=False):
+    """Return [(name, tp, unpaid count, amount)] sorted by amount owed, largest first"""
+    totals = parallel_scan(outstanding_chunk, merge_totals, months, workers, archived)
+    profiles = enrollment_profiles() or {}
+    # Slim rows carry no name; take it from the student's profile
+    totals = merge_totals([{(name or profiles.get(tp, [""])[0], tp): values}
+                           for (name, tp), values in totals.items()])
+    return sorted(((name, tp, count, amount) for (name, tp), (count, amount) in totals.items()),
+                  key=lambda row: (-row[3], row[0]))
+
+def enrollment_count_report(months=None, workers=None, archived=False):
+    """Return {(module, level, month): [enrolled, paid]} from a full scan"""
+    return parallel_scan(enrollment_count_chunk, merge_totals, months, workers, archived)
+
+# Receivables aging: every unpaid enrollment is aged by the months between its
+# month_of_enrollment and the report month (months carry no year, so ages wrap
+# at 12) and its charges are added to one bucket per trainer, per module and
+# per student in the same pass. Rows whose month is not a calendar month
+# (e.g. "TBD") go to an "Unknown" bucket. The top debtors are then picked from
+# the merged student totals with a bounded heap.
+
+AGING_BUCKETS = [(0, "Current"), (1, "1 month"), (2, "2 months"), (3, "3-5 months"), (6, "6+ months")]
+AGING_TOP_DEBTORS = 10
+
+def aging_slot(month, as_of_index):
+    """Return the bucket index of an enrollment month's age; len(AGING_BUCKETS) means unknown"""
+    key = partition_key(month)
+    if key not in MONTHS:
+        return len(AGING_BUCKETS)
+    age = (as_of_index - MONTHS.index(key)) % len(MONTHS)
+    return bisect.bisect_right([low for low, label in AGING_BUCKETS], age) - 1
+
+def aging_chunk(as_of_index, rows):
+    """Task: unpaid amount per aging bucket (plus a count) by trainer, module and student"""
+    totals = {}
+    # Months and charges repeat across rows, so parse each distinct value once
+    slots = {}
+    amounts = {}
+    count_slot = len(AGING_BUCKETS) + 1
+    for fields in rows:
+        if len(fields) < 10 or fields[9] != "unpaid":
+            continue
+        slot = slots.get(fields[7])
+        if slot is None:
+            slot = slots[fields[7]] = aging_slot(fields[7], as_of_index)
+        amount = amounts.get(fields[8])
+        if amount is None:
+            amount = amounts[fields[8]] = float(fields[8]) if validate_charges(fields[8]) else 0.0
+        for key in (("trainer", fields[4]), ("module", fields[2]), ("student", fields[0], fields[1])):
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = [0.0] * (count_slot + 1)
+            entry[slot] += amount
+            entry[count_slot] += 1
+    return totals
+
+def aging_report(months=None, workers=None, as_of=None, top=AGING_TOP_DEBTORS, archived=False):
+    """Return receivables aging as {"as_of", "buckets", "trainers", "modules", "debtors", "students", "total"}.
+    Each value row is [amount per bucket..., unpaid enrollments]; debtors are [name, tp, row], largest first."""
+    as_of_index = MONTHS.index(partition_key(as_of)) if as_of else datetime.now().month - 1
+    totals = parallel_scan(functools.partial(aging_chunk, as_of_index), merge_totals, months, workers, archived)
+
+    profiles = enrollment_profiles() or {}
+    groups = {"trainer": {}, "module": {}}
+    students = {}
+    for key, values in totals.items():
+        if key[0] != "student":
+            groups[key[0]][key[1]] = values
+        elif key[1]:
+            students[key[1:]] = values
+        else:
+            # Slim rows carry no name; take it from the student's profile
+            key = (profiles.get(key[2], [""])[0], key[2])
+            students[key] = [a + b for a, b in zip(students[key], values)] if key in students else values
+
+    debtors = heapq.nlargest(top, students.items(), key=lambda item: sum(item[1][:-1]))
+    total = merge_totals([{"total": values} for values in groups["trainer"].values()]).get("total")
+    return {"as_of": MONTHS[as_of_index], "buckets": [label for low, label in AGING_BUCKETS] + ["Unknown"],
+            "trainers": groups["trainer"], "modules": groups["module"], "students": len(students),
+            "debtors": [[name, tp_number, values] for (name, tp_number), values in debtors],
+            "total": total or [0.0] * (len(AGING_BUCKETS) + 2)}
+
+def write_aging_csv(report, file_path):
+    """Write an aging report as CSV: one row per trainer, module and top debtor, then the total"""
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["group", "name", "tp_number"] + report["buckets"] + ["total", "unpaid_enrollments"])
+
+        def amounts(values):
+            return [f"{amount:.2f}" for amount in values[:-1]] + [f"{sum(values[:-1]):.2f}", int(values[-1])]
+
+        for group in ("trainers", "modules"):
+            for name, values in sorted(report[group].items()):
+                writer.writerow([group[:-1], name, ""] + amounts(values))
+        for name, tp_number, values in report["debtors"]:
+            writer.writerow(["debtor", name, tp_number] + amounts(values))
+        writer.writerow(["total", f"as of {report['as_of']}", ""] + amounts(report["total"]))
+
+# ============= INCOME AGGREGATES =============
+# zaggregates.txt holds "trainer,module,level,month,paid,unpaid,revenue,outstanding"
+# rows. They are updated by the enrollment storage layer and set_class_details,
+# so income reports read them instead of rescanning the enrollments.
+# Revenue/outstanding are student counts times the class price, matching the
+# original income report. Each class also has a running all-months row (month
+# "*"), so an all-months summary is one lookup.
+
+AGGREGATE_CACHE = {"signature": None, "data": None}
+ALL_MONTHS = "*"
+
+def file_signature(file_path):
+    """Return (size, mtime, inode) of a file, or None if it is missing"""
+    change = staged_writes() and staged_writes().get(file_path)
+    if change:
+        # Staged but uncommitted: a signature that changes with every staged write
+        return ("staged", id(change), change["version"])
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+def read_class_prices():
+    """Return {(trainer, module, level): price} for classes with numeric charges"""
+    prices = {}
+    for fields in read_records(TRAINER_MODULES_FILE, 4):
+        if validate_charges(fields[3]):
+            prices[(fields[1], fields[0], fields[2])] = float(fields[3])
+    return prices
+
+def row_price(fields, prices):
+    """Price an enrollment row at its class price, falling back to the row's own charges"""
+    price = prices.get((fields[4], fields[2], fields[3]))
+    if price is None:
+        price = float(fields[8]) if validate_charges(fields[8]) else 0.0
+    return price
+
+def add_row_to_aggregates(data, fields, sign, prices):
+    """Add (sign=1) or remove (sign=-1) one enrollment row's contribution"""
+    if len(fields) < 10 or fields[9] not in ("paid", "unpaid"):
+        return
+    price = row_price(fields, prices)
+    for month in (partition_key(fields[7]), ALL_MONTHS):
+        key = (fields[4], fields[2], fields[3], month)
+        entry = data.setdefault(key, [0, 0, 0.0, 0.0])
+        if fields[9] == "paid":
+            entry[0] += sign
+            entry[2] += sign * price
+        else:
+            entry[1] += sign
+            entry[3] += sign * price
+        if entry[0] == 0 and entry[1] == 0:
+            del data[key]
+
+def compute_aggregates():
+    """Recompute every aggregate from scratch with one parallel pass over the enrollments"""
+    data = parallel_scan(functools.partial(aggregate_chunk, read_class_prices()), merge_totals)
+    return {key: entry for key, entry in data.items() if entry[0] or entry[1]}
+
+def save_aggregates(data):
+    """Write the aggregates file and refresh the cache"""
+    write_lines(AGGREGATES_FILE,
+                [f"{trainer},{module},{level},{month},{e[0]},{e[1]},{e[2]:.2f},{e[3]:.2f}\n"
+                 for (trainer, module, level, month), e in sorted(data.items())])
+    AGGREGATE_CACHE["signature"] = file_signature(AGGREGATES_FILE)
+    AGGREGATE_CACHE["data"] = data
+
+def load_aggregates():
+    """Return the maintained aggregates, building them on first use"""
+    signature = file_signature(AGGREGATES_FILE)
+    if signature is None:
+        # Build under the data lock so no other process adds rows mid-scan
+        with transaction():
+            if file_signature(AGGREGATES_FILE) is None:
+                save_aggregates(compute_aggregates())
+                return AGGREGATE_CACHE["data"]
+            signature = file_signature(AGGREGATES_FILE)
+    if signature != AGGREGATE_CACHE["signature"]:
+        data = {}
+        for fields in read_records(AGGREGATES_FILE, 8):
+            data[tuple(fields[:4])] = [int(fields[4]), int(fields[5]), float(fields[6]), float(fields[7])]
+        if data and not any(key[3] == ALL_MONTHS for key in data):
+            # Written before the all-months rows existed
+            for (trainer, module, level, month), entry in list(data.items()):
+                totals = data.setdefault((trainer, module, level, ALL_MONTHS), [0, 0, 0.0, 0.0])
+                for i in range(4):
+                    totals[i] += entry[i]
+        AGGREGATE_CACHE["signature"] = signature
+        AGGREGATE_CACHE["data"] = data
+    return AGGREGATE_CACHE["data"]
+
+def update_aggregates(removed=(), added=()):
+    """Apply enrollment rows removed from / added to storage to the aggregates"""
+    if not removed and not added:
+        return
+    if file_signature(AGGREGATES_FILE) is None:
+        # First use: the rows are already in storage (or about to be), so build from scratch after the write
+        return
+    data = load_aggregates()
+    prices = read_class_prices()
+    for fields in removed:
+        add_row_to_aggregates(data, fields, -1, prices)
+    for fields in added:
+        add_row_to_aggregates(data, fields, 1, prices)
+    save_aggregates(data)
+
+def reprice_aggregates(trainer_name, module, level, charges):
+    """Re-price all months of a class after its charges change"""
+    if file_signature(AGGREGATES_FILE) is None or not validate_charges(charges):
+        return
+    data = load_aggregates()
+    price = float(charges)
+    for key, entry in data.items():
+        if key[:3] == (trainer_name, module, level):
+            entry[2] = entry[0] * price
+            entry[3] = entry[1] * price
+    save_aggregates(data)
+
+def get_income_summary(trainer_name, module, level, month=None):
+    """Read paid/unpaid counts, revenue and outstanding for a class (all months if month is None)"""
+    data = load_aggregates()
+    entry = data.get((trainer_name, module, level, partition_key(month) if month else ALL_MONTHS), [0, 0, 0.0, 0.0])
+    return {"paid_count": entry[0], "unpaid_count": entry[1], "revenue": entry[2], "outstanding": entry[3]}
+
+def verify_aggregates():
+    """Recompute the aggregates from scratch and return the differences from the maintained values"""
+    maintained = load_aggregates()
+    expected = compute_aggregates()
+    differences = []
+    for key in sorted(set(maintained) | set(expected)):
+        have = maintained.get(key, [0, 0, 0.0, 0.0])
+        want = expected.get(key, [0, 0, 0.0, 0.0])
+        if have[0] != want[0] or have[1] != want[1] or abs(have[2] - want[2]) > 0.005 or abs(have[3] - want[3]) > 0.005:
+            differences.append((key, have, want))
+    return differences
+
+def rebuild_aggregates():
+    """Replace the maintained aggregates with a fresh computation"""
+    data = compute_aggregates()
+    save_aggregates(data)
+    return True, f"Rebuilt {len(data)} aggregate rows."
+
+def run_aggregate_verification(rebuild=False):
+    """Print the aggregate verification result, optionally rebuilding on mismatch"""
+    differences = verify_aggregates()
+    if not differences:
+        print("Aggregates verified: maintained values match a full recomputation.")
+        return True
+    
+    print(f"{len(differences)} aggregate rows differ (maintained -> recomputed):")
+    for (trainer, module, level, month), have, want in differences:
+        print(f"- {trainer}/{module}/{level}/{month}: paid {have[0]}->{want[0]}, unpaid {have[1]}->{want[1]}, "
+              f"revenue RM{have[2]:.2f}->RM{want[2]:.2f}, outstanding RM{have[3]:.2f}->RM{want[3]:.2f}")
+    if rebuild:
+        success, message = rebuild_aggregates()
+        print(message)
+    return False
+
+# ============= BILLING CYCLE =============
+# Charges are per enrollment row and month. The monthly billing cycle rolls the
+# students enrolled in one month into the next: one pass over both months'
+# enrollments finds the source rows and the rows the target month already has,
+# then every source (student, class) not yet billed for the target month gets
+# a new unpaid row at the class's current trainermodules.txt price. Classes in
+# zcompleted.txt ("tp,module,level,date", appended by mark_completed) and
+# classes that no longer exist are skipped. New rows take student IDs from one
+# allocate_student_ids call, in the order of their source rows' IDs, and are
+# written with one append per file in a single transaction, logged as one
+# billing_cycle_run event that replay re-derives the same way.
+#
+# Rows carry a month but no year, so each run is recorded in the billing
+# ledger zbilling.txt ("period,source_month,highest_id,rows,run_at", period =
+# the billed year and month, e.g. 2027-04; highest_id = the ID counter after
+# the run). Student IDs only grow, so a target-month row counts as already
+# billed only if its ID is above the counter left by the run that closed the
+# same month a year earlier (the run into the following month, period minus
+# 11 months). Last year's rows are then billed again, while a rerun, or a
+# student registered for the month by hand, adds nothing.
+
+def completed_classes():
+    """Return {(tp_number, module, level)} of the classes marked completed"""
+    return {tuple(fields[:3]) for fields in read_records(COMPLETED_FILE, 3)}
+
+def mark_completed(tp_number, module=None, level=None):
+    """Mark one of a student's classes (or all of them) completed so billing skips it"""
+    with transaction():
+        if module:
+            module = resolve_module(module) or module
+        done = completed_classes()
+        classes = []
+        for fields in find_enrollments(1, tp_number, min_fields=4):
+            key = (fields[1], fields[2], fields[3])
+            if (fields[1] == tp_number and (not module or fields[2] == module) and (not level or fields[3] == level)
+                    and key not in done and key not in classes):
+                classes.append(key)
+        if not classes:
+            return False, "No enrollment to mark completed (or it already is)."
+
+        date = datetime.now().strftime("%Y-%m-%d")
+        for tp, class_module, class_level in classes:
+            append_line(COMPLETED_FILE, f"{tp},{class_module},{class_level},{date}\n")
+            emit_event("class_completed", tp_number=tp, module=class_module, level=class_level, date=date)
+        return True, f"Marked {len(classes)} class(es) completed."
+
+def class_price_strings(rows):
+    """Return {(trainer, module, level): charges} from trainermodules rows with numeric charges"""
+    return {(fields[1], fields[0], fields[2]): fields[3] for fields in rows
+            if len(fields) >= 4 and validate_charges(fields[3])}
+
+def billing_rows(rows, source_month, month, prices, completed, cutoff=0):
+    """Return (row head, address) pairs of the next-month rows for the source month's enrollments.
+    The head holds the first ten fields, leaving the student ID to the caller. Target-month
+    rows with an ID number at or below cutoff are last year's and do not count as billed."""
+    month_keys = {}
+    billed = set()
+    candidates = []
+    for fields in rows:
+        if len(fields) < 12:
+            continue
+        key = month_keys.get(fields[7])
+        if key is None:
+            key = month_keys[fields[7]] = partition_key(fields[7])
+        if key == month:
+            if student_id_number(fields[10]) > cutoff:
+                billed.add((fields[1], fields[2], fields[3]))
+        elif key == source_month and (fields[1], fields[2], fields[3]) not in completed:
+            price = prices.get((fields[4], fields[2], fields[3]))
+            if price is not None:
+                candidates.append((student_id_number(fields[10]), fields[10],
+                                   ",".join(fields[:7] + [month, price, "unpaid"]), ",".join(fields[11:])))
+
+    # Sorted by source ID so the live run and a replay hand out the same IDs
+    candidates.sort()
+    pending = []
+    for _, _, head, address in candidates:
+        key = tuple(head.split(",", 4)[1:4])
+        if key not in billed:
+            billed.add(key)
+            pending.append((head, address))
+    return pending
+
+def student_id_number(student_id):
+    """Return the number of an ID like STU0042, or 0"""
+    number = student_id[3:]
+    return int(number) if number.isdigit() else 0
+
+def billing_period(source_month, month, today=None):
+    """Return the billed year and month ("2027-04"): the source month is its latest occurrence up to today"""
+    today = today or datetime.now()
+    year = today.year if MONTHS.index(source_month) < today.month else today.year - 1
+    if MONTHS.index(month) <= MONTHS.index(source_month):
+        year += 1
+    return f"{year}-{MONTHS.index(month) + 1:02d}"
+
+def billing_cutoff(period):
+    """Return the highest student ID left by the runs up to a year before period, which closed its month"""
+    year, month = (int(part) for part in period.split("-"))
+    closed = year * 12 + month - 1 - 11
+    closing = f"{closed // 12}-{closed % 12 + 1:02d}"
+    return max((int(fields[2]) for fields in read_records(BILLING_LEDGER_FILE, 3)
+                if fields[0] <= closing and fields[2].isdigit()), default=0)
+
+def billing_closings():
+    """Return {month: sorted ID counters left by the runs that closed that month (ran into the next)}"""
+    closings = {}
+    for fields in read_records(BILLING_LEDGER_FILE, 3):
+        if fields[0][5:].isdigit() and fields[2].isdigit():
+            closings.setdefault(MONTHS[int(fields[0][5:]) - 2], []).append(int(fields[2]))
+    return {month: sorted(counters) for month, counters in closings.items()}
+
+def billing_generation(month, student_id, closings):
+    """Return how many times a row's month had been closed before the row was added (0 = oldest)"""
+    return bisect.bisect_left(closings.get(month, []), student_id_number(student_id))
+
+def billing_cycle_months(source_month=None, month=None):
+    """Return (source month, target month) as partition keys; the target defaults to the next month"""
+    source_month = partition_key(source_month or datetime.now().strftime("%B"))
+    if month:
+        return source_month, partition_key(month)
+    if source_month not in MONTHS:
+        return source_month, None
+    return source_month, MONTHS[(MONTHS.index(source_month) + 1) % len(MONTHS)]
+
+def run_billing_cycle(source_month=None, month=None):
+    """Bill the students of the source month (default: this month) for the next month"""
+    source_month, month = billing_cycle_months(source_month, month)
+    if source_month not in MONTHS or month not in MONTHS or source_month == month:
+        return False, "Please give two different months, e.g. March and April."
+
+    period = billing_period(source_month, month)
+    with transaction():
+        cutoff = billing_cutoff(period)
+        pending = billing_rows(iter_enrollments(months=[source_month, month], min_fields=12),
+                               source_month, month, class_price_strings(read_records(TRAINER_MODULES_FILE, 4)),
+                               completed_classes(), cutoff)
+        student_ids = allocate_student_ids(len(pending)) if pending else []
+        append_enrollments(head.split(",") + [student_id, address]
+                           for (head, address), student_id in zip(pending, student_ids))
+        counter = read_lines(STUDENT_ID_FILE)
+        highest = int(counter[0]) if counter and counter[0].strip().isdigit() else highest_student_id()
+        run = [period, source_month, str(highest), str(len(pending)), datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+        append_line(BILLING_LEDGER_FILE, ",".join(run) + "\n")
+        emit_event("billing_cycle_run", source_month=source_month, month=month,
+                   first_id=student_ids[0] if student_ids else None, rows=len(pending), cutoff=cutoff, ledger=run)
+    if not pending:
+        return True, f"Nothing to bill: every {source_month} student is already billed for {period} or completed."
+    return True, (f"Billed {len(pending)} {source_month} enrollments for {month} "
+                  f"(IDs {student_ids[0]}-{student_ids[-1]}).")
+
+# ============= TRAINER WORKLOAD =============
+# Per-trainer analytics built from the class catalog (charges and schedules of
+# trainermodules.txt) and the income aggregates (paid/unpaid students and
+# revenue per class and month), so nothing rescans the enrollments. The result
+# is cached on the signatures of both and shown on every trainer login.
+#
+# Schedules are free text; parse_schedule understands "Monday 2-4 PM",
+# "Wednesday 10-12 PM" (10 AM to noon), "Mon/Wed 9:30-11 AM" and the like.
+# Unreadable schedules (or "TBD") count as unscheduled. Contact hours for the
+# revenue figure are weekly hours times WEEKS_PER_MONTH for every month the
+# class has students. Idle slots are free blocks of at least IDLE_MIN_HOURS in
+# the working week.
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WORK_DAYS = 5  # Monday to Friday
+WORK_HOURS = (9, 17)
+IDLE_MIN_HOURS = 1
+WEEKS_PER_MONTH = 52 / 12
+SCHEDULE_TIME = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*([ap]m)?\s*(?:-|to)\s*(\d{1,2})(?::(\d{2}))?\s*([ap]m)?", re.I)
+WORKLOAD_CACHE = {"signature": None, "data": None}
+
+def parse_schedule(schedule):
+    """Return [(weekday index, start hour, end hour)] for a class schedule, or [] if it cannot be read"""
+    match = SCHEDULE_TIME.search(schedule or "")
+    if not match:
+        return []
+    days = [i for i, day in enumerate(WEEKDAYS) if re.search(rf"\b{day[:3]}", schedule[:match.start()], re.I)]
+
+    def to_24h(hour, minutes, meridian):
+        hour = int(hour) % 12 if meridian else int(hour)
+        return hour + (12 if meridian.lower() == "pm" else 0) + int(minutes or 0) / 60
+
+    end = to_24h(match[4], match[5], match[6] or "")
+    start = to_24h(match[1], match[2], match[3] or match[6] or "")
+    if match[3] is None and start >= end and start >= 12:
+        start -= 12  # "10-12 PM": the PM belongs to the end only
+    if not match[3] and not match[6] and start < WORK_HOURS[0] - 1:
+        start, end = start + 12, end + 12  # "2-4" without AM/PM is an afternoon class
+    if not match[6] and end <= start:
+        end += 12  # "11-1"
+    if not days or end <= start or end > 24:
+        return []
+    return [(day, start, end) for day in days]
+
+def format_hour(hour):
+    """Format an hour of the day (e.g. 14.5) as 2:30 PM"""
+    minutes = round(hour * 60)
+    hours, minutes = divmod(minutes, 60)
+    text = str(hours % 12 or 12) + (f":{minutes:02d}" if minutes else "")
+    return f"{text} {'AM' if hours < 12 else 'PM'}"
+
+def idle_slots(slots):
+    """Return the free (weekday, start, end) blocks of the working week around the busy slots"""
+    idle = []
+    for day in range(WORK_DAYS):
+        free_from = WORK_HOURS[0]
+        for _, start, end in sorted(slot for slot in slots if slot[0] == day):
+            if start - free_from >= IDLE_MIN_HOURS:
+                idle.append((day, free_from, min(start, WORK_HOURS[1])))
+            free_from = max(free_from, end)
+        if WORK_HOURS[1] - free_from >= IDLE_MIN_HOURS:
+            idle.append((day, free_from, WORK_HOURS[1]))
+    return [slot for slot in idle if slot[2] - slot[1] >= IDLE_MIN_HOURS]
+
+def trainer_workload(month=None):
+    """Return {trainer: workload} for all trainers, optionally for one month of enrollment.
+    A workload has "classes" (one dict per class), "students", "weekly_hours",
+    "revenue", "outstanding", "revenue_per_hour" (None without contact hours),
+    "unscheduled" and "idle" (free weekday blocks)."""
+    catalog = load_catalog()
+    data = load_aggregates()
+    month_key = partition_key(month) if month else None
+    signature = (CATALOG_CACHE["signature"], AGGREGATE_CACHE["signature"], month_key)
+    if WORKLOAD_CACHE["signature"] == signature:
+        return WORKLOAD_CACHE["data"]
+
+    counts = {}
+    for (trainer, module, level, month_of), entry in data.items():
+        if month_of != ALL_MONTHS and (month_key is None or month_of == month_key):
+            totals = counts.setdefault((trainer, normalize_module(module), level), [0, 0, 0.0, 0.0, 0])
+            for i in range(4):
+                totals[i] += entry[i]
+            totals[4] += 1
+
+    classes = [(trainer, module, level) for trainer, pairs in catalog["by_trainer"].items() for module, level in pairs]
+    listed = {(trainer, normalize_module(module), level) for trainer, module, level in classes}
+    for trainer, key, level in counts:
+        if (trainer, key, level) not in listed:
+            # Deleted classes can still have students
+            classes.append((trainer, catalog["modules"].get(key, key), level))
+
+    workload = {}
+    for trainer, module, level in classes:
+        entry = find_class(trainer, module, level) or {}
+        paid, unpaid, revenue, outstanding, months = counts.get((trainer, normalize_module(module), level),
+                                                                 [0, 0, 0.0, 0.0, 0])
+        slots = parse_schedule(entry.get("schedule"))
+        weekly_hours = sum(end - start for _, start, end in slots)
+        summary = workload.setdefault(trainer, {"classes": [], "students": 0, "weekly_hours": 0.0, "revenue": 0.0,
+                                                "outstanding": 0.0, "contact_hours": 0.0, "unscheduled": 0,
+                                                "slots": []})
+        summary["classes"].append({"module": module, "level": level, "charges": entry.get("charges"),
+                                   "schedule": entry.get("schedule"), "weekly_hours": weekly_hours,
+                                   "students": paid + unpaid, "paid": paid, "unpaid": unpaid,
+                                   "revenue": revenue, "outstanding": outstanding})
+        summary["students"] += paid + unpaid
+        summary["weekly_hours"] += weekly_hours
+        summary["revenue"] += revenue
+        summary["outstanding"] += outstanding
+        summary["contact_hours"] += weekly_hours * WEEKS_PER_MONTH * (1 if month_key else months)
+        summary["unscheduled"] += 0 if slots or not entry else 1
+        summary["slots"] += slots
+
+    for summary in workload.values():
+        summary["revenue_per_hour"] = summary["revenue"] / summary["contact_hours"] if summary["contact_hours"] else None
+        summary["idle"] = idle_slots(summary.pop("slots"))
+
+    WORKLOAD_CACHE.update(signature=signature, data=workload)
+    return workload
+
+def print_trainer_workload(trainer_name, month=None):
+    """Print one trainer's workload summary (shown on login)"""
+    summary = trainer_workload(month).get(trainer_name)
+    if not summary:
+        return
+    classes = summary["classes"]
+    print(f"\nYour workload{' in ' + partition_key(month) if month else ''}: {len(classes)} classes, "
+          f"{summary['students']} students, {summary['weekly_hours']:g} contact hours/week")
+    rate = summary["revenue_per_hour"]
+    print(f"Revenue RM{summary['revenue']:.2f}" + (f" (RM{rate:.2f} per contact hour)" if rate is not None else "") +
+          f", outstanding RM{summary['outstanding']:.2f}")
+    if summary["unscheduled"]:
+        print(f"{summary['unscheduled']} class(es) have no schedule yet.")
+    if summary["idle"]:
+        free = [f"{WEEKDAYS[day][:3]} {format_hour(start)}-{format_hour(end)}" for day, start, end in summary["idle"]]
+        print(f"Idle slots: {', '.join(free[:6])}" + (f" and {len(free) - 6} more" if len(free) > 6 else ""))
+
+def print_workload_report(months=None, workers=None):
+    """Print classes, students per class, contact hours and revenue per contact hour for every trainer"""
+    month = months[0] if months and len(months) == 1 else None
+    workload = trainer_workload(month)
+    print(f"\n{'Trainer':<15} {'Classes':>7} {'Students':>8} {'Hours/wk':>8} {'Revenue':>12} {'RM/hour':>9} {'Idle h/wk':>9}")
+    print("-" * 75)
+    for trainer, summary in sorted(workload.items()):
+        rate = summary["revenue_per_hour"]
+        idle = sum(end - start for _, start, end in summary["idle"])
+        print(f"{trainer:<15} {len(summary['classes']):>7} {summary['students']:>8} {summary['weekly_hours']:>8g} "
+              f"{'RM' + format(summary['revenue'], '.2f'):>12} {format(rate, '.2f') if rate is not None else '-':>9} "
+              f"{idle:>9g}")
+        for entry in summary["classes"]:
+            print(f"  {entry['module']} ({entry['level']}): {entry['students']} students "
+                  f"({entry['paid']} paid), {entry['weekly_hours']:g} h/wk, schedule {entry['schedule'] or 'TBD'}")
+    print("-" * 75)
+
+# ============= REQUEST TRENDS =============
+# Requests, approvals and rejections per day, ISO week and month for every
+# module and level, built from zrequests.txt rows
+#   student,module,level,status,timestamp[,decided_at]
+# Approvals (approved or waitlisted) and rejections are counted in the bucket
+# of their decision, and approval latency is decided_at - timestamp for rows
+# that have one (decisions made before it was recorded have no latency).
+#
+# The series are cached in memory and kept up to date incrementally: only the
+# request lines appended since the last call are parsed, and in-place status
+# changes (fixed-width layout) are applied from the request_status_changed
+# events appended to the log since then. A rewritten requests file is parsed
+# again from the start, together with the archived requests.
+
+TREND_GRANULARITIES = ["day", "week", "month"]
+TREND_WINDOW = 7
+APPROVED_STATUSES = ("approved", "waitlisted")
+TRENDS_CACHE = {"requests": None, "events": None, "records": {}, "series": {}}
+
+def trend_buckets(moment):
+    """Return the (day, week, month) bucket labels of a datetime"""
+    year, week, _ = moment.isocalendar()
+    return moment.strftime("%Y-%m-%d"), f"{year}-W{week:02d}", moment.strftime("%Y-%m")
+
+def parse_request_record(fields):
+    """Return a request row as [module, level, status, requested, decided], or None without a valid timestamp"""
+    try:
+        requested = datetime.fromisoformat(fields[4])
+        decided = datetime.fromisoformat(fields[5]) if len(fields) > 5 and fields[5] else None
+    except (IndexError, ValueError):
+        return None
+    return [fields[1], fields[2], fields[3], requested, decided]
+
+def add_record_to_trends(series, record, sign):
+    """Add (sign=1) or remove (sign=-1) one request's contribution to the series.
+    Each value is [requested, approved, rejected, latency seconds, decisions with latency]."""
+    module, level, status, requested, decided = record
+    for granularity, bucket in zip(TREND_GRANULARITIES, trend_buckets(requested)):
+        series.setdefault((granularity, bucket, module, level), [0, 0, 0, 0.0, 0])[0] += sign
+    if status not in APPROVED_STATUSES and status != "rejected":
+        return
+    for granularity, bucket in zip(TREND_GRANULARITIES, trend_buckets(decided or requested)):
+        entry = series.setdefault((granularity, bucket, module, level), [0, 0, 0, 0.0, 0])
+        entry[1 if status in APPROVED_STATUSES else 2] += sign
+        if decided:
+            entry[3] += sign * (decided - requested).total_seconds()
+            entry[4] += sign
+
+def load_request_trends():
+    """Return the trend series {(granularity, bucket, module, level): values}, parsing only what changed"""
+    cache = TRENDS_CACHE
+    if cache["requests"] is None or cache["requests"]["path"] != REQUESTS_FILE:
+        cache.update(requests=follow_file(REQUESTS_FILE), events=follow_file(EVENTS_FILE))
+        # Status changes already in the requests file need no replay
+        cache["events"].update(inode=os.stat(EVENTS_FILE).st_ino if os.path.exists(EVENTS_FILE) else None,
+                               offset=os.path.getsize(EVENTS_FILE) if os.path.exists(EVENTS_FILE) else 0, totals={})
+
+    lines, reloaded = read_new_lines(cache["requests"])
+    if reloaded:
+        cache.update(records={}, series={})
+        cache["requests"]["totals"] = cache["series"]
+        # Archived requests are decided for good, so they are read once per reload
+        lines = itertools.chain((",".join(fields) for fields in iter_archive("requests")), lines)
+    records, series = cache["records"], cache["series"]
+    for line in lines:
+        fields = line.strip().split(",")
+        record = parse_request_record(fields) if len(fields) >= 5 else None
+        if record:
+            key = tuple(fields[:3]) + (fields[4],)
+            if key in records:
+                add_record_to_trends(series, records[key], -1)
+            records[key] = record
+            add_record_to_trends(series, record, 1)
+
+    event_lines, _ = read_new_lines(cache["events"])
+    cache["events"]["totals"] = {}
+    for line in event_lines:
+        if '"request_status_changed"' not in line:
+            continue
+        try:
+            data = json.loads(line)["data"]
+        except (ValueError, KeyError):
+            continue
+        record = records.get((data["student"], data["module"], data["level"], data["timestamp"]))
+        # A record that already has the new status was read after the change
+        if record and record[2] == data["old_status"]:
+            add_record_to_trends(series, record, -1)
+            record[2] = data["new_status"]
+            if data.get("decided_at") and record[4] is None:
+                record[4] = datetime.fromisoformat(data["decided_at"])
+            add_record_to_trends(series, record, 1)
+    return series
+
+def next_bucket(granularity, bucket):
+    """Return the label of the bucket after bucket"""
+    if granularity == "day":
+        return (datetime.fromisoformat(bucket) + timedelta(days=1)).strftime("%Y-%m-%d")
+    if granularity == "week":
+        monday = datetime.fromisocalendar(int(bucket[:4]), int(bucket[6:]), 1)
+        return trend_buckets(monday + timedelta(days=7))[1]
+    year, month = int(bucket[:4]), int(bucket[5:])
+    return f"{year + month // 12}-{month % 12 + 1:02d}"
+
+def request_trends(granularity="day", module=None, level=None, window=TREND_WINDOW):
+    """Return one row per bucket (gaps filled with zeros) for a module/level (None = all):
+    {"bucket", "requested", "approved", "rejected", "latency_hours", "rolling_requested", "rolling_approved"}"""
+    module = resolve_module(module) or module if module else None
+    totals = {}
+    for (row_granularity, bucket, row_module, row_level), values in load_request_trends().items():
+        if row_granularity == granularity and module in (None, row_module) and level in (None, row_level):
+            totals[bucket] = [a + b for a, b in zip(totals.get(bucket, [0, 0, 0, 0.0, 0]), values)]
+    if not totals:
+        return []
+
+    rows = []
+    recent = []
+    bucket, last = min(totals), max(totals)
+    while True:
+        requested, approved, rejected, latency, decided = totals.get(bucket, [0, 0, 0, 0.0, 0])
+        recent = (recent + [(requested, approved)])[-window:]
+        rows.append({"bucket": bucket, "requested": requested, "approved": approved, "rejected": rejected,
+                     "latency_hours": latency / decided / 3600 if decided else None,
+                     "rolling_requested": sum(r for r, a in recent) / len(recent),
+                     "rolling_approved": sum(a for r, a in recent) / len(recent)})
+        if bucket == last:
+            return rows
+        bucket = next_bucket(granularity, bucket)
+
+def request_trends_by_class():
+    """Return {(module, level): [requested, approved, rejected, latency seconds, decisions with latency]}"""
+    totals = {}
+    for (granularity, bucket, module, level), values in load_request_trends().items():
+        if granularity == "month":
+            totals[(module, level)] = [a + b for a, b in zip(totals.get((module, level), [0, 0, 0, 0.0, 0]), values)]
+    return totals
+
+def print_request_trends(granularity="day", module=None, level=None, window=TREND_WINDOW, limit=30):
+    """Print a request trend series with rolling averages, then the totals per module and level"""
+    start = time.perf_counter()
+    module = resolve_module(module) or module if module else None
+    rows = request_trends(granularity, module, level, window)
+    title = f"{module or 'All modules'}{' (' + level + ')' if level else ''}"
+    print(f"\nRequests per {granularity} - {title} (rolling average over {window} {granularity}s)")
+    print(f"{'Period':<12} {'Requested':>9} {'Approved':>8} {'Rejected':>8} {'Latency h':>9} {'Avg req':>8} {'Avg appr':>8}")
+    print("-" * 70)
+    if len(rows) > limit:
+        print(f"... {len(rows) - limit} earlier {granularity}s not shown")
+    for row in rows[-limit:]:
+        latency = f"{row['latency_hours']:.1f}" if row["latency_hours"] is not None else "-"
+        print(f"{row['bucket']:<12} {row['requested']:>9} {row['approved']:>8} {row['rejected']:>8} {latency:>9} "
+              f"{row['rolling_requested']:>8.2f} {row['rolling_approved']:>8.2f}")
+
+    print(f"\n{'Module':<20} {'Level':<12} {'Requested':>9} {'Approved':>8} {'Rejected':>8} {'Latency h':>9}")
+    print("-" * 70)
+    for (row_module, row_level), (requested, approved, rejected, latency, decided) in sorted(request_trends_by_class().items()):
+        average = f"{latency / decided / 3600:.1f}" if decided else "-"
+        print(f"{row_module:<20} {row_level:<12} {requested:>9} {approved:>8} {rejected:>8} {average:>9}")
+    print(f"(computed in {time.perf_counter() - start:.2f}s)")
+
+def request_trends_menu():
+    """Ask for the trend granularity and class, then print the series"""
+    granularity = get_user_input("Bucket by day, week or month: ",
+                                 lambda x: x.lower() in TREND_GRANULARITIES,
+                                 "Please enter day, week or month.").lower()
+    module = input("Module (leave blank for all modules): ").strip()
+    level = get_user_input("Level (leave blank for all levels): ",
+                           lambda x: x == "" or validate_level(x),
+                           f"Level must be one of: {', '.join(LEVELS)}")
+    print_request_trends(granularity, module or None, level or None)
+
+# ============= MODULE RECOMMENDATIONS =============
+# Item-item collaborative filtering over the sparse student x (module, level)
+# enrollment matrix. The batch job counts co-enrollments pair by pair (only the
+# non-zero cells are ever touched) and scores them with cosine similarity:
+#   sim(a, b) = students in both / sqrt(students in a * students in b)
+# Each class keeps its top neighbours. The model is saved with the signature of
+# the enrollment files it was built from, so menus only do dictionary lookups.
+
+RECOMMENDATION_NEIGHBORS = 20
+RECOMMENDATION_COUNT = 5
+RECOMMENDATION_CACHE = {"signature": None, "model": None}
+
+def enrollment_source_signature():
+    """Return a signature of every enrollment file, to tell when the model is stale"""
+    files = [path for key, path in enrollment_files()]
+    if partitions_enabled():
+        files = [PARTITION_MANIFEST_FILE] + files
+    return [[os.path.basename(f)] + list(file_signature(f) or ()) for f in files]
+
+def build_recommendation_model():
+    """Compute item-item cosine similarities from the enrollments"""
+    # Keyed by TP number: two students can share a name
+    student_classes = {}
+    for fields in iter_enrollments(min_fields=4):
+        student_classes.setdefault(fields[1], set()).add((fields[2], fields[3]))
+
+    class_counts = {}
+    co_counts = {}
+    for classes in student_classes.values():
+        for item in classes:
+            class_counts[item] = class_counts.get(item, 0) + 1
+            row = co_counts.setdefault(item, {})
+            for other in classes:
+                if other != item:
+                    row[other] = row.get(other, 0) + 1
+
+    neighbors = {}
+    for item, row in co_counts.items():
+        scored = [(count / math.sqrt(class_counts[item] * class_counts[other]), other)
+                  for other, count in row.items()]
+        top = heapq.nlargest(RECOMMENDATION_NEIGHBORS, scored)
+        if top:
+            neighbors["|".join(item)] = [[module, level, round(score, 6)] for score, (module, level) in top]
+
+    popular = sorted(class_counts.items(), key=lambda entry: (-entry[1], entry[0]))
+    return {"students": len(student_classes), "neighbors": neighbors,
+            "popular": [[module, level, count] for (module, level), count in popular]}
+
+def rebuild_recommendations(force=False):
+    """Batch job: rebuild the recommendation model if the enrollments changed"""
+    signature = enrollment_source_signature()
+    if not force and os.path.exists(RECOMMENDATIONS_FILE):
+        try:
+            with open(RECOMMENDATIONS_FILE, 'r') as f:
+                if json.load(f).get("signature") == signature:
+                    return True, "Recommendations are already up to date."
+        except ValueError:
+            pass
+
+    start = time.perf_counter()
+    model = build_recommendation_model()
+    model["signature"] = signature
+    temp_file = RECOMMENDATIONS_FILE + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(model, f)
+    os.replace(temp_file, RECOMMENDATIONS_FILE)
+    RECOMMENDATION_CACHE.update(signature=file_signature(RECOMMENDATIONS_FILE), model=model)
+    return True, (f"Recommendations rebuilt from {model['students']} students and "
+                  f"{len(model['popular'])} classes in {time.perf_counter() - start:.2f}s.")
+
+def load_recommendation_model():
+    """Return the cached model, building it once if it has never been built"""
+    signature = file_signature(RECOMMENDATIONS_FILE)
+    if signature is None:
+        rebuild_recommendations(force=True)
+    elif signature != RECOMMENDATION_CACHE["signature"]:
+        try:
+            with open(RECOMMENDATIONS_FILE, 'r') as f:
+                RECOMMENDATION_CACHE.update(signature=signature, model=json.load(f))
+        except ValueError:
+            rebuild_recommendations(force=True)
+    return RECOMMENDATION_CACHE["model"]
+
+def student_classes(student_name):
+    """Return the (module, level) classes a student is enrolled in or has asked for"""
+    classes = {(fields[2], fields[3]) for fields in find_enrollments(0, student_name, min_fields=4)}
+    for fields in read_records(REQUESTS_FILE, 4):
+        if fields[0] == student_name and fields[3] != "rejected":
+            classes.add((fields[1], fields[2]))
+    return classes
+
+def recommend_modules(student_name, limit=RECOMMENDATION_COUNT, taken=None):
+    """Return up to limit (module, level, score) suggestions the student has not taken or requested"""
+    model = load_recommendation_model()
+    if taken is None:
+        taken = student_classes(student_name)
+    offered = {(module, level) for classes in trainer_class_index().values() for module, level in classes}
+
+    scores = {}
+    for module, level in taken:
+        for other_module, other_level, score in model["neighbors"].get(f"{module}|{level}", []):
+            item = (other_module, other_level)
+            if item not in taken and item in offered:
+                scores[item] = scores.get(item, 0.0) + score
+    ranked = sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]
+
+    # Top up with the most popular classes when there is little history to go on
+    for module, level, count in model["popular"]:
+        if len(ranked) >= limit:
+            break
+        item = (module, level)
+        if item not in taken and item in offered and item not in scores:
+            ranked.append((item, 0.0))
+    return [(module, level, score) for (module, level), score in ranked]
+
+# ============= EXPORT / IMPORT =============
+# Every table is streamed through generators, so memory stays flat whatever the
+# file size. Formats: CSV with a header row, JSONL (one object per line, like
+# requests.jsonl) and a chunked columnar binary format. A ".gz" suffix on the
+# file name means gzip compression.
+#
+# Columnar layout: b"CAFECOL1", a little-endian uint32 header length and a JSON
+# header {"table", "columns"}; then chunks of: uint32 row count, and for each
+# column uint32 value lengths followed by the UTF-8 values. A zero row count
+# ends the file.
+
+TABLE_SCHEMAS = {
+    "users": ["username", "email", "password", "role"],
+    "trainers": ["trainer"],
+    "trainer_modules": ["module", "trainer", "level", "charges", "schedule", "capacity"],
+    "enrollments": ["name", "tp_number", "module", "level", "trainer", "email", "contact",
+                    "month_of_enrollment", "charges", "status", "student_id", "address"],
+    "requests": ["student", "module", "level", "status", "timestamp", "decided_at"],
+    "feedback": ["timestamp", "sender", "message"],
+}
+EXPORT_FORMATS = {"csv": ".csv", "jsonl": ".jsonl", "columnar": ".col"}
+COLUMNAR_MAGIC = b"CAFECOL1"
+EXPORT_CHUNK_ROWS = 10000
+
+def table_file(table):
+    """Return the data file behind a table"""
+    return {"users": USER_FILE, "trainers": TRAINERS_FILE, "trainer_modules": TRAINER_MODULES_FILE,
+            "enrollments": STUDENTS_FILE, "requests": REQUESTS_FILE, "feedback": FEEDBACK_FILE}[table]
+
+def parse_feedback_line(line):
+    """Split '[timestamp] sender: message' into its three parts"""
+    line = line.strip()
+    if line.startswith("[") and "] " in line:
+        timestamp, rest = line[1:].split("] ", 1)
+        sender, separator, message = rest.partition(": ")
+        if separator:
+            return [timestamp, sender, message]
+    return ["", "", line]
+
+def iter_table_rows(table):
+    """Yield every row of a table with exactly one value per schema column"""
+    columns = len(TABLE_SCHEMAS[table])
+    if table == "feedback":
+        for line in read_lines(FEEDBACK_FILE):
+            if line.strip():
+                yield parse_feedback_line(line)
+        return
+
+    if table == "trainers":
+        rows = ([trainer] for trainer in read_trainers())
+    elif table == "enrollments":
+        rows = iter_enrollments()
+    else:
+        rows = read_records(table_file(table))
+    for fields in rows:
+        if len(fields) > columns:
+            # Extra commas belong to the last column (e.g. an address with commas)
+            fields = fields[:columns - 1] + [",".join(fields[columns - 1:])]
+        yield fields + [""] * (columns - len(fields))
+
+def format_table_line(table, row, layout=None):
+    """Format a row the way the table's data file stores it"""
+    if table == "feedback":
+        return f"[{row[0]}] {row[1]}: {row[2]}\n"
+    if table == "trainer_modules" and not row[5]:
+        # Unlimited classes have no capacity column
+        row = row[:5]
+    if table == "requests" and len(row) > 5 and not row[5]:
+        # Undecided requests have no decision timestamp
+        row = row[:5]
+    return format_record(table, row, layout)
+
+def open_stream(file_path, mode):
+    """Open a file for streaming, using gzip when the name ends in .gz"""
+    if file_path.endswith(".gz"):
+        if "b" in mode:
+            return gzip.open(file_path, mode)
+        return gzip.open(file_path, mode + "t", encoding="utf-8", newline="")
+    if "b" in mode:
+        return open(file_path, mode)
+    return open(file_path, mode, encoding="utf-8", newline="")
+
+def write_columnar(f, table, rows):
+    """Write rows in the chunked columnar format; returns the row count"""
+    columns = TABLE_SCHEMAS[table]
+    header = json.dumps({"table": table, "columns": columns}).encode("utf-8")
+    f.write(COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header)
+
+    def flush(chunk):
+        f.write(struct.pack("<I", len(chunk)))
+        for c in range(len(columns)):
+            values = [row[c].encode("utf-8") for row in chunk]
+            f.write(struct.pack(f"<{len(values)}I", *[len(v) for v in values]))
+            f.write(b"".join(values))
+
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        count += 1
+        if len(chunk) == EXPORT_CHUNK_ROWS:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    f.write(struct.pack("<I", 0))
+    return count
+
+def read_columnar(f):
+    """Yield (columns, row) pairs from a columnar file one chunk at a time"""
+    if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar export file.")
+    header_length = struct.unpack("<I", f.read(4))[0]
+    columns = json.loads(f.read(header_length).decode("utf-8"))["columns"]
+
+    while True:
+        row_count = struct.unpack("<I", f.read(4))[0]
+        if row_count == 0:
+            return
+        column_values = []
+        for _ in columns:
+            lengths = struct.unpack(f"<{row_count}I", f.read(4 * row_count))
+            data = f.read(sum(lengths))
+            values = []
+            offset = 0
+            for length in lengths:
+                values.append(data[offset:offset + length].decode("utf-8"))
+                offset += length
+            column_values.append(values)
+        for row in zip(*column_values):
+            yield columns, list(row)
+
+def export_table(table, export_format, output_dir, compress=False):
+    """Stream one table to a file; returns (row count, file path)"""
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, table + EXPORT_FORMATS[export_format] + (".gz" if compress else ""))
+    columns = TABLE_SCHEMAS[table]
+    count = 0
+
+    if export_format == "columnar":
+        with open_stream(file_path, "wb") as f:
+            count = write_columnar(f, table, iter_table_rows(table))
+    elif export_format == "csv":
+        with open_stream(file_path, "w") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in iter_table_rows(table):
+                writer.writerow(row)
+                count += 1
+    else:
+        with open_stream(file_path, "w") as f:
+            for row in iter_table_rows(table):
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+                count += 1
+    return count, file_path
+
+def detect_format(file_path):
+    """Guess an export format from a file name"""
+    name = file_path[:-3] if file_path.endswith(".gz") else file_path
+    for export_format, extension in EXPORT_FORMATS.items():
+        if name.endswith(extension):
+            return export_format
+    return None
+
+def iter_import_rows(table, file_path, export_format):
+    """Yield rows from an export file, mapped onto the table's schema"""
+    columns = TABLE_SCHEMAS[table]
+    if export_format == "columnar":
+        with open_stream(file_path, "rb") as f:
+            for file_columns, row in read_columnar(f):
+                values = dict(zip(file_columns, row))
+                yield [values.get(c, "") for c in columns]
+    elif export_format == "csv":
+        with open_stream(file_path, "r") as f:
+            reader = csv.reader(f)
+            file_columns = next(reader, columns)
+            for row in reader:
+                values = dict(zip(file_columns, row))
+                yield [values.get(c, "") for c in columns]
+    else:
+        with open_stream(file_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    values = json.loads(line)
+                    yield [str(values.get(c, "")) for c in columns]
+
+def import_table(table, file_path, export_format=None, append=False, counts=None):
+    """Stream an export file into a table, replacing it unless append is True.
+    counts, if given, receives the imported and skipped row counts."""
+    export_format = export_format or detect_format(file_path)
+    if export_format not in EXPORT_FORMATS:
+        return False, "Unknown import format. Use csv, jsonl or columnar."
+    if not os.path.exists(file_path):
+        return False, f"File not found: {file_path}"
+
+    if counts is None:
+        counts = {}
+    counts.update(imported=0, skipped=0)
+
+    def valid_rows():
+        for row in iter_import_rows(table, file_path, export_format):
+            # Data files are comma separated, so only feedback messages may hold commas
+            checked = row[:-1] if table == "feedback" else row
+            if any("," in value for value in checked) or any("\n" in value for value in row):
+                counts["skipped"] += 1
+                continue
+            counts["imported"] += 1
+            yield row
+
+    target = table_file(table)
+    with transaction():
+        if not append:
+            replace_table(table, valid_rows())
+        elif table == "enrollments":
+            # Appended rows are partitioned and slimmed like any other new enrollment
+            append_enrollments(valid_rows())
+        else:
+            # Stream the table and the new rows into a copy that is swapped in on commit
+            temp_file = target + ".importing"
+            layout = status_layout()
+            with open(temp_file, 'w') as f:
+                for line in read_lines(target):
+                    f.write(line if line.endswith("\n") else line + "\n")
+                for row in valid_rows():
+                    f.write(format_table_line(table, row, layout))
+            stage_file(target, temp_file)
+
+        if table in ("enrollments", "trainer_modules"):
+            rebuild_aggregates()
+        if table == "enrollments":
+            sync_student_ids()
+        ensure_event_log()
+        emit_event("table_replaced", table=table, snapshot=write_snapshot([table], staged=True))
+    return True, f"Imported {counts['imported']} {table} rows ({counts['skipped']} skipped)."
+
+def replace_table(table, rows):
+    """Stream rows into a table's data file(s), replacing the old contents"""
+    with transaction():
+        if table == "enrollments" and profiles_enabled():
+            profiles = load_profiles()
+            rows = (slim_enrollment(row, profiles) for row in rows)
+        if table == "enrollments" and partitions_enabled():
+            old_manifest = read_partition_manifest()
+            manifest = write_partition_files(rows)
+            write_partition_manifest(manifest)
+            for key, entry in old_manifest.items():
+                if key not in manifest:
+                    remove_file(entry["file"])
+            return
+
+        target = table_file(table)
+        temp_file = target + ".importing"
+        layout = status_layout()
+        with open(temp_file, 'w') as f:
+            for row in rows:
+                f.write(format_table_line(table, row, layout))
+        stage_file(target, temp_file)
+
+def run_export(tables, export_format, output_dir, compress=False):
+    """Export tables and report throughput"""
+    start = time.perf_counter()
+    total_rows = 0
+    for table in tables:
+        count, file_path = export_table(table, export_format, output_dir, compress)
+        total_rows += count
+        print(f"Exported {count} {table} rows to {file_path}")
+    elapsed = time.perf_counter() - start
+    print(f"Total: {total_rows} rows in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} rows/sec)")
+
+def run_import(table, file_path, export_format=None, append=False):
+    """Import a table and report throughput"""
+    start = time.perf_counter()
+    counts = {}
+    success, message = import_table(table, file_path, export_format, append, counts)
+    elapsed = time.perf_counter() - start
+    print(message)
+    if success:
+        rows = counts["imported"] + counts["skipped"]
+        print(f"Elapsed: {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/sec)")
+    return success
+
+# ============= ARCHIVE =============
+# Historical rows move out of the hot files into compressed segment files
+# under zarchive/, so everyday scans stop paying for them:
+#   - decided requests and feedback older than a cutoff (archive_history)
+#   - the enrollments of a deleted student (remove_student)
+# remove_student appends the deleted rows to zarchive/deleted.txt
+# ("deleted at,<the 12 enrollment fields>") in its own transaction; the next
+# archive_history run folds them into one segment, so deletions never leave a
+# trail of tiny segments. Readers treat those rows as archived already.
+# A segment is a gzip or lzma (.xz) text stream: a JSON header line
+#   {"table", "rows", "first", "last", "reason"}
+# then the rows in their data-file format. zarchive/index.txt repeats every
+# header as "table,file,codec,rows,first,last,reason", so readers pick the
+# segments of a table and date range without opening the others, and stream
+# them without unpacking to disk. Segments are written before the transaction
+# that removes their rows commits; a segment missing from the index (the
+# transaction failed) is ignored by readers and reported by fsck.
+#
+# Dates are "YYYY-MM-DD HH:MM:SS": the decision (or request) time of a
+# request, the feedback time, and the deletion time of enrollments.
+
+ARCHIVE_CODECS = {"gzip": ".gz", "lzma": ".xz"}
+ARCHIVE_CODEC = "gzip"
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVABLE_TABLES = ("requests", "feedback")
+
+def open_segment(file_path, mode="rt", codec=None):
+    """Open an archive segment as a (de)compressing text stream (codec defaults to the file's suffix)"""
+    codec = codec or ("lzma" if file_path.endswith(ARCHIVE_CODECS["lzma"]) else "gzip")
+    opener = lzma.open if codec == "lzma" else gzip.open
+    return opener(file_path, mode, encoding="utf-8")
+
+def is_segment(file_path):
+    """Check whether a path names an archive segment"""
+    return file_path.startswith(ARCHIVE_DIR + os.sep) and file_path.endswith(tuple(ARCHIVE_CODECS.values()))
+
+def read_archive_index():
+    """Return the index entries of all archive segments, oldest first"""
+    entries = []
+    for fields in read_records(ARCHIVE_INDEX_FILE, 7):
+        entries.append({"table": fields[0], "file": os.path.join(ARCHIVE_DIR, fields[1]), "codec": fields[2],
+                        "rows": int(fields[3]) if fields[3].isdigit() else 0, "first": fields[4],
+                        "last": fields[5], "reason": fields[6]})
+    return entries
+
+def archive_segments(table=None, since=None, until=None):
+    """Return the index entries of a table's segments whose dates overlap [since, until]"""
+    return [entry for entry in read_archive_index()
+            if table in (None, entry["table"]) and (since is None or entry["last"] >= since)
+            and (until is None or entry["first"] <= until)]
+
+def iter_archive(table, since=None, until=None):
+    """Yield the archived rows of a table (feedback as [timestamp, sender, message]), streaming each segment"""
+    for entry in archive_segments(table, since, until):
+        with open_segment(entry["file"]) as f:
+            f.readline()  # header
+            for line in f:
+                if line.strip():
+                    yield parse_feedback_line(line) if table == "feedback" else line.strip().split(",")
+    if table == "enrollments":
+        yield from iter_deleted_enrollments(since, until)
+
+def stage_deleted_enrollments(rows):
+    """Queue deleted enrollment rows for the next archive segment, in the current transaction"""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    append_line(ARCHIVE_DELETED_FILE, "".join(f"{now},{format_table_line('enrollments', fields + [''] * (12 - len(fields)), {})}"
+                                              for fields in rows))
+
+def iter_deleted_enrollments(since=None, until=None):
+    """Yield the deleted enrollment rows not yet folded into a segment"""
+    for fields in read_records(ARCHIVE_DELETED_FILE, 2):
+        if (since is None or fields[0] >= since) and (until is None or fields[0] <= until):
+            yield fields[1:]
+
+def write_segment(table, rows, first, last, reason, codec=ARCHIVE_CODEC):
+    """Compress rows (schema-form lists) into a new segment and index it; returns the segment path.
+    Must run inside a transaction, which stages the index line."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    number = len(read_archive_index()) + 1
+    while any(os.path.exists(os.path.join(ARCHIVE_DIR, f"{table}-{number:06d}{ext}")) for ext in ARCHIVE_CODECS.values()):
+        number += 1
+    name = f"{table}-{number:06d}{ARCHIVE_CODECS[codec]}"
+    file_path = os.path.join(ARCHIVE_DIR, name)
+
+    header = {"table": table, "rows": len(rows), "first": first, "last": last, "reason": reason}
+    with open_segment(file_path + ".tmp", "wt", codec) as f:
+        f.write(json.dumps(header) + "\n")
+        f.writelines(format_table_line(table, row, {}) for row in rows)
+    os.replace(file_path + ".tmp", file_path)
+    append_line(ARCHIVE_INDEX_FILE, f"{table},{name},{codec},{len(rows)},{first},{last},{reason}\n")
+    return file_path
+
+def archive_date(table, row):
+    """Return the date a historical row is archived by, or None if it is still live"""
+    if table == "requests":
+        if len(row) < 5 or row[3] in ("pending", "waitlisted"):
+            return None
+        return row[5] if len(row) > 5 and row[5] else row[4]
+    return row[0] or None
+
+def is_archivable(table, row, cutoff):
+    """Check whether a row of an archivable table is history older than the cutoff"""
+    date = archive_date(table, row)
+    return date is not None and date < cutoff
+
+def archive_history(days=ARCHIVE_AFTER_DAYS, codec=ARCHIVE_CODEC):
+    """Move decided requests and feedback older than days, and the queued deleted enrollments,
+    into compressed segments"""
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    moved = []
+    folded = 0
+    with transaction():
+        for table in ARCHIVABLE_TABLES:
+            file_path = table_file(table)
+            kept, archived = [], []
+            for line in read_lines(file_path):
+                if not line.strip():
+                    continue
+                row = parse_feedback_line(line) if table == "feedback" else line.strip().split(",")
+                if is_archivable(table, row, cutoff):
+                    archived.append(row)
+                else:
+                    kept.append(line)
+            if not archived:
+                continue
+            dates = [archive_date(table, row) for row in archived]
+            write_segment(table, archived, min(dates), max(dates), "history", codec)
+            write_lines(file_path, kept)
+            emit_event("history_archived", table=table, cutoff=cutoff)
+            moved.append(f"{len(archived)} {table}")
+
+        # Enrollments deleted since the last run go into one segment, whatever their age
+        deleted = list(read_records(ARCHIVE_DELETED_FILE, 2))
+        if deleted:
+            dates = [fields[0] for fields in deleted]
+            write_segment("enrollments", [fields[1:] for fields in deleted], min(dates), max(dates), "deleted", codec)
+            write_lines(ARCHIVE_DELETED_FILE, [])
+            folded = len(deleted)
+    if not moved and not folded:
+        return False, f"Nothing older than {cutoff} to archive."
+    message = f"Archived {' and '.join(moved)} older than {cutoff} ({codec})." if moved else "Nothing older than the cutoff."
+    return True, message + (f" Folded {folded} deleted enrollments into a segment." if folded else "")
+
+def print_archive_summary():
+    """Print the archive segments per table with their date ranges and sizes"""
+    entries = read_archive_index()
+    deleted = sum(1 for _ in iter_deleted_enrollments())
+    if deleted:
+        print(f"{deleted} deleted enrollments are waiting for the next archive run.")
+    if not entries:
+        print("The archive is empty.")
+        return
+    print(f"\n{'Segment':<26} {'Rows':>8} {'Size':>10}  {'Dates':<41} Reason")
+    for entry in entries:
+        size = os.path.getsize(entry["file"]) if os.path.exists(entry["file"]) else 0
+        print(f"{os.path.basename(entry['file']):<26} {entry['rows']:>8} {size / 1024:>8.1f}KB  "
+              f"{entry['first'] + ' - ' + entry['last']:<41} {entry['reason']}")
+
+# ============= EVENT LOG =============
+# Every mutation made through the shared data operations also appends a typed
+# event to zevents.jsonl, inside the same transaction as the data write:
+#   {"seq": 42, "time": "2026-01-05 10:00:00", "type": "payment_made", "data": {...}}
+# seq increases by one per event. Consumers (caches, reports, dashboards) keep
+# a checkpoint of the last seq and byte offset they processed and read only the
+# events after it (consume_events).
+#
+# The log starts with a "snapshot" event pointing at a CSV export of every
+# table (plus the live waitlist and completed classes) under zevents_snapshots/, so the data files
+# can be rebuilt by loading the latest snapshot and replaying the events after
+# it (replay_events). Bulk table imports are logged the same way, as a
+# "table_replaced" event with their own snapshot. Derived files (aggregates,
+# recommendations) are not logged; they are rebuilt after a replay.
+#
+# Passwords are not logged either. A replay takes them from the snapshot's
+# users table, or from the live users file for accounts added or changed
+# after the snapshot.
+#
+# Event types and their data:
+#   user_added {username, email, role}              user_removed {username}
+#   user_updated {username, email, password_changed}   (email None = unchanged)
+#   trainer_added / trainer_removed {trainer}
+#   class_assigned {module, trainer, level, charges, capacity}
+#   class_updated {trainer, module, level, charges, schedule, capacity}   (None = unchanged)
+#   class_removed {trainer, module, level}
+#   feedback_added {timestamp, sender, message}
+#   student_enrolled {row}                          (the 12 enrollment fields)
+#   enrollment_changed {tp_number, module, level, new_module, new_level, trainer, charges}
+#   student_removed {tp_number}
+#   profile_updated {tp_number, email, contact, address}
+#   payment_made {student, month, amount}           (month None = all months)
+#   request_added {student, module, level, timestamp}
+#   request_status_changed {student, module, level, timestamp, old_status, new_status, decided_at}
+#   request_removed {student, module, level, timestamp}
+#   history_archived {table, cutoff}                (rows archive_history moved out)
+#   class_completed {tp_number, module, level, date}
+#   billing_cycle_run {source_month, month, first_id, rows, cutoff, ledger}   (rows run_billing_cycle added)
+#   waitlist_added {entry}                          (the 13 waitlist fields)
+#   waitlist_removed {entry_id}
+#   snapshot {snapshot}   table_replaced {table, snapshot}
+
+EVENT_CACHE = {"signature": None, "seq": 0}
+
+@contextlib.contextmanager
+def committed_view():
+    """Read the data files as last committed, ignoring the current transaction"""
+    writes = staged_writes()
+    TRANSACTION_STATE.writes = None
+    try:
+        yield
+    finally:
+        TRANSACTION_STATE.writes = writes
+
+def read_last_event_seq():
+    """Return the seq of the last event in the log (staged events included), or 0"""
+    change = staged_writes() and staged_writes().get(EVENTS_FILE)
+    if change and change["appended"].strip():
+        return json.loads(change["appended"].strip().rsplit("\n", 1)[-1])["seq"]
+    try:
+        with open(EVENTS_FILE, 'rb') as f:
+            # Read backwards from the end until the last line is complete
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            tail = b""
+            while position > 0:
+                step = min(65536, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+                if b"\n" in tail.rstrip(b"\n") or position == 0:
+                    break
+    except FileNotFoundError:
+        return 0
+    last_line = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+    if not last_line.strip():
+        return 0
+    try:
+        return json.loads(last_line)["seq"]
+    except (ValueError, KeyError):
+        # A torn last line: fall back to the highest complete event
+        seq = 0
+        for event, _ in read_events():
+            seq = event["seq"]
+        return seq
+
+def last_event_seq():
+    """Return the seq of the last logged event, cached until the log changes"""
+    signature = file_signature(EVENTS_FILE)
+    if signature != EVENT_CACHE["signature"]:
+        EVENT_CACHE.update(signature=signature, seq=read_last_event_seq())
+    return EVENT_CACHE["seq"]
+
+def emit_event(event_type, **data):
+    """Append a typed event to the log and return its seq"""
+    with transaction():
+        seq = last_event_seq()
+        if seq == 0 and event_type != "snapshot":
+            # An empty log has to start from the current state
+            seq = write_snapshot_event()
+        event = {"seq": seq + 1, "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                 "type": event_type, "data": data}
+        append_line(EVENTS_FILE, json.dumps(event, ensure_ascii=False) + "\n")
+        EVENT_CACHE.update(signature=file_signature(EVENTS_FILE), seq=seq + 1)
+        return seq + 1
+
+def write_snapshot(tables, staged=False):
+    """Export tables (and the waitlist when tables is None) for the next event; returns its directory name.
+    staged exports the tables as the current transaction leaves them instead of as last committed."""
+    name = f"{last_event_seq() + 1:08d}"
+    snapshot_dir = os.path.join(EVENT_SNAPSHOTS_DIR, name)
+    with contextlib.nullcontext() if staged else committed_view():
+        for table in tables or TABLE_SCHEMAS:
+            export_table(table, "csv", snapshot_dir)
+        if tables is None:
+            waitlist = load_waitlist()
+            with open(os.path.join(snapshot_dir, "waitlist.txt"), 'w') as f:
+                f.writelines(",".join(fields) + "\n" for fields in waitlist["entries"].values())
+            with open(os.path.join(snapshot_dir, "completed.txt"), 'w') as f:
+                f.writelines(",".join(fields) + "\n" for fields in read_records(COMPLETED_FILE, 4))
+            with open(os.path.join(snapshot_dir, "billing.txt"), 'w') as f:
+                f.writelines(",".join(fields) + "\n" for fields in read_records(BILLING_LEDGER_FILE, 5))
+    return name
+
+def write_snapshot_event():
+    """Log a snapshot of every table; returns its seq"""
+    return emit_event("snapshot", snapshot=write_snapshot(None))
+
+def ensure_event_log():
+    """Start the event log with a snapshot if it is empty"""
+    with transaction():
+        if last_event_seq() == 0:
+            write_snapshot_event()
+
+def read_events(after_seq=0, offset=0):
+    """Yield (event, offset after it) for complete events with seq > after_seq, starting at a byte offset"""
+    try:
+        f = open(EVENTS_FILE, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Still being written; a later read picks it up
+                return
+            offset += len(line)
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event["seq"] > after_seq:
+                yield event, offset
+
+def consume_events(checkpoint_file, handler):
+    """Pass the events logged since the checkpoint to handler(event), then advance the checkpoint.
+    Returns the number of events handled."""
+    checkpoint = {"seq": 0, "offset": 0}
+    try:
+        with open(checkpoint_file, 'r') as f:
+            checkpoint.update(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+    if not os.path.exists(EVENTS_FILE) or os.path.getsize(EVENTS_FILE) < checkpoint["offset"]:
+        # The log was replaced; rescan it, still skipping seqs already handled
+        checkpoint["offset"] = 0
+
+    handled = 0
+    for event, offset in read_events(checkpoint["seq"], checkpoint["offset"]):
+        handler(event)
+        checkpoint.update(seq=event["seq"], offset=offset)
+        handled += 1
+
+    temp_file = checkpoint_file + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_file, checkpoint_file)
+    return handled
+
+def load_snapshot(state, snapshot, tables=None):
+    """Load the tables of a snapshot directory into replay state"""
+    snapshot_dir = os.path.join(EVENT_SNAPSHOTS_DIR, snapshot)
+    for table in tables or TABLE_SCHEMAS:
+        state[table] = list(iter_import_rows(table, os.path.join(snapshot_dir, table + ".csv"), "csv"))
+    if tables is None:
+        state["waitlist"] = {}
+        for fields in read_records(os.path.join(snapshot_dir, "waitlist.txt"), 13):
+            state["waitlist"][fields[0]] = fields[:12] + [",".join(fields[12:])]
+        state["completed"] = list(read_records(os.path.join(snapshot_dir, "completed.txt"), 4))
+        state["billing"] = list(read_records(os.path.join(snapshot_dir, "billing.txt"), 5))
+
+def first_index(rows, match):
+    """Return the index of the first row satisfying match(row), or None"""
+    return next((i for i, row in enumerate(rows) if match(row)), None)
+
+def live_passwords(state):
+    """Return {username: password} from the live users file, read once per replay"""
+    if "passwords" not in state:
+        state["passwords"] = {fields[0]: fields[2] for fields in read_records(USER_FILE, 4)}
+    return state["passwords"]
+
+def apply_event(state, event):
+    """Apply one event to replay state ({table: rows, "waitlist": {id: fields}, "completed"/"billing": rows})"""
+    event_type, data = event["type"], event["data"]
+    if event_type == "snapshot":
+        load_snapshot(state, data["snapshot"])
+    elif event_type == "table_replaced":
+        load_snapshot(state, data["snapshot"], [data["table"]])
+    elif event_type == "user_added":
+        # Logs written before passwords were left out still carry them
+        password = data.get("password") or live_passwords(state).get(data["username"], "")
+        state["users"].append([data["username"], data["email"], password, data["role"]])
+    elif event_type == "user_removed":
+        state["users"] = [row for row in state["users"] if row[0] != data["username"]]
+    elif event_type == "user_updated":
+        i = first_index(state["users"], lambda row: row[0] == data["username"])
+        if i is not None:
+            state["users"][i][1] = data["email"] or state["users"][i][1]
+            if data.get("password"):
+                state["users"][i][2] = data["password"]
+            elif data.get("password_changed"):
+                state["users"][i][2] = live_passwords(state).get(data["username"], state["users"][i][2])
+    elif event_type == "trainer_added":
+        state["trainers"].append([data["trainer"]])
+    elif event_type == "trainer_removed":
+        state["trainers"] = [row for row in state["trainers"] if row[0] != data["trainer"]]
+    elif event_type == "class_assigned":
+        state["trainer_modules"].append([data["module"], data["trainer"], data["level"], data["charges"],
+                                         "TBD", data["capacity"] or ""])
+    elif event_type in ("class_updated", "class_removed"):
+        def is_class(row):
+            return (row[1] == data["trainer"] and row[2] == data["level"]
+                    and normalize_module(row[0]) == normalize_module(data["module"]))
+        if event_type == "class_removed":
+            state["trainer_modules"] = [row for row in state["trainer_modules"] if not is_class(row)]
+        else:
+            i = first_index(state["trainer_modules"], is_class)
+            if i is not None:
+                row = state["trainer_modules"][i]
+                for column, key in ((3, "charges"), (4, "schedule"), (5, "capacity")):
+                    if data[key] is not None:
+                        row[column] = data[key]
+    elif event_type == "feedback_added":
+        state["feedback"].append([data["timestamp"], data["sender"], data["message"]])
+    elif event_type == "student_enrolled":
+        state["enrollments"].append(list(data["row"]))
+    elif event_type == "enrollment_changed":
+        i = first_index(state["enrollments"], lambda row: row[1:4] == [data["tp_number"], data["module"], data["level"]])
+        if i is not None:
+            row = state["enrollments"][i]
+            row[2:5] = [data["new_module"], data["new_level"], data["trainer"]]
+            if data["charges"]:
+                row[8] = data["charges"]
+    elif event_type == "student_removed":
+        state["enrollments"] = [row for row in state["enrollments"] if row[1] != data["tp_number"]]
+    elif event_type == "profile_updated":
+        for row in state["enrollments"]:
+            if row[1] == data["tp_number"]:
+                row[5:7] = [data["email"], data["contact"]]
+                row[11:] = [data["address"]]
+    elif event_type == "payment_made":
+        month_key = partition_key(data["month"]) if data["month"] else None
+        for row in state["enrollments"]:
+            if row[0] == data["student"] and row[9] == "unpaid" and (month_key is None or partition_key(row[7]) == month_key):
+                row[9] = "paid"
+    elif event_type == "request_added":
+        state["requests"].append([data["student"], data["module"], data["level"], "pending", data["timestamp"]])
+    elif event_type in ("request_status_changed", "request_removed"):
+        old_status = data.get("old_status", "pending")
+        i = first_index(state["requests"], lambda row: row[:3] == [data["student"], data["module"], data["level"]]
+                        and row[3] == old_status and row[4] == data["timestamp"])
+        if i is not None and event_type == "request_removed":
+            state["requests"].pop(i)
+        elif i is not None:
+            state["requests"][i][3] = data["new_status"]
+            if data.get("decided_at"):
+                state["requests"][i][5:] = [data["decided_at"]]
+    elif event_type == "history_archived":
+        state[data["table"]] = [row for row in state[data["table"]]
+                                if not is_archivable(data["table"], row, data["cutoff"])]
+    elif event_type == "class_completed":
+        state["completed"].append([data["tp_number"], data["module"], data["level"], data["date"]])
+    elif event_type == "billing_cycle_run":
+        pending = billing_rows(state["enrollments"], data["source_month"], data["month"],
+                               class_price_strings(state["trainer_modules"]),
+                               {tuple(row[:3]) for row in state["completed"]}, data.get("cutoff", 0))
+        if data["first_id"]:
+            first = student_id_number(data["first_id"])
+            state["enrollments"].extend(head.split(",") + [f"STU{first + i:04d}", address]
+                                        for i, (head, address) in enumerate(pending))
+        if data.get("ledger"):
+            state["billing"].append(list(data["ledger"]))
+    elif event_type == "waitlist_added":
+        state["waitlist"][data["entry"][0]] = list(data["entry"])
+    elif event_type == "waitlist_removed":
+        state["waitlist"].pop(data["entry_id"], None)
+
+def replay_events(up_to_seq=None):
+    """Rebuild the table contents by replaying the log; returns (state, last seq applied)"""
+    state = {table: [] for table in TABLE_SCHEMAS}
+    state["waitlist"] = {}
+    state["completed"] = []
+    state["billing"] = []
+    last_seq = 0
+    for event, _ in read_events():
+        if up_to_seq is not None and event["seq"] > up_to_seq:
+            break
+        apply_event(state, event)
+        last_seq = event["seq"]
+    return state, last_seq
+
+def write_replayed_state(state, output_dir=None):
+    """Write replayed tables to output_dir, or over the live data files when it is None"""
+    waitlist_lines = [",".join(fields) + "\n" for fields in state["waitlist"].values()]
+    completed_lines = [",".join(fields) + "\n" for fields in state["completed"]]
+    billing_lines = [",".join(fields) + "\n" for fields in state["billing"]]
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        for table in TABLE_SCHEMAS:
+            with open(os.path.join(output_dir, os.path.basename(table_file(table))), 'w') as f:
+                f.writelines(format_table_line(table, row) for row in state[table])
+        with open(os.path.join(output_dir, os.path.basename(WAITLIST_FILE)), 'w') as f:
+            f.writelines(waitlist_lines)
+        with open(os.path.join(output_dir, os.path.basename(COMPLETED_FILE)), 'w') as f:
+            f.writelines(completed_lines)
+        with open(os.path.join(output_dir, os.path.basename(BILLING_LEDGER_FILE)), 'w') as f:
+            f.writelines(billing_lines)
+        return
+
+    with transaction():
+        for table in TABLE_SCHEMAS:
+            replace_table(table, state[table])
+        write_lines(WAITLIST_FILE, waitlist_lines)
+        write_lines(COMPLETED_FILE, completed_lines)
+        write_lines(BILLING_LEDGER_FILE, billing_lines)
+        rebuild_aggregates()
+        sync_student_ids()
+    reset_caches()
+
+def run_event_replay(output_dir=None, up_to_seq=None):
+    """Rebuild the data files from the event log and report what was replayed"""
+    # The lock is held from reading the log to writing the files, so no event slips in between
+    with transaction():
+        if last_event_seq() == 0:
+            return False, "The event log is empty."
+        state, last_seq = replay_events(up_to_seq)
+        write_replayed_state(state, output_dir)
+    target = output_dir or "the live data files"
+    counts = ", ".join(f"{len(state[table])} {table}" for table in TABLE_SCHEMAS)
+    return True, f"Replayed events up to seq {last_seq} into {target}: {counts}, {len(state['waitlist'])} waitlisted."
+
+# ============= NOTIFICATION OUTBOX =============
+# Request decisions, payments and feedback notify the other party through
+# zoutbox.jsonl. The operation appends a record inside its own transaction, so
+# a notification is queued exactly when the change is committed:
+#   {"key": "request:42", "time": "2026-01-05 10:00:00", "to": "alice", "subject": "...", "body": "..."}
+# "to" is a username, or "@<role>" for every user with that role. The key
+# (the kind plus the seq of the change's event) is the dedup key.
+#
+# Nothing is delivered on the menu's path. A background worker thread
+# (start_notification_worker, started by the menus and the API server, or the
+# "notify --worker" command) drains the outbox in batches, one process at a
+# time (zoutbox.lock). Each record goes to every sink in NOTIFY_SINKS
+# (CAFE_NOTIFY_SINKS, e.g. "spool,drop"; register_sink adds more):
+#   spool  appends an mbox message to zmail/<username>
+#   drop   writes one JSON file per notification to znotify_drop/
+# A sink that raises is retried with exponential backoff; after
+# NOTIFY_MAX_ATTEMPTS the record is dead-lettered in the worker state.
+#
+# zoutbox_state.json holds the byte offset read so far, the retry queue, the
+# dead letters and the most recent delivered "sink key" pairs; pairs delivered
+# since the state was last written are appended to zoutbox_sent.txt. A record
+# that was already delivered to a sink is skipped, so a batch re-read after a
+# crash is not sent twice. Once the worker is past NOTIFY_COMPACT_BYTES the
+# delivered head of the outbox is cut off. The outbox is not part of the event
+# log; replaying events does not send anything again.
+
+NOTIFY_SINKS = [name.strip() for name in os.environ.get("CAFE_NOTIFY_SINKS", "spool").split(",") if name.strip()]
+NOTIFY_INTERVAL_SECONDS = 5
+NOTIFY_BATCH = 100
+NOTIFY_MAX_ATTEMPTS = 5
+NOTIFY_RETRY_SECONDS = 30  # doubled after every failed attempt
+NOTIFY_DEDUP_KEYS = 10000
+NOTIFY_COMPACT_BYTES = 1024 * 1024
+NOTIFY_SENDER = "cafe@apu.edu.my"
+
+def notify(key, to, subject, body):
+    """Queue a notification in the outbox with the current transaction"""
+    record = {"key": key, "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "to": to,
+              "subject": subject, "body": body}
+    with transaction():
+        append_line(OUTBOX_FILE, json.dumps(record, ensure_ascii=False) + "\n")
+
+def spool_sink(record, recipients):
+    """Append the notification to each recipient's mailbox in zmail/"""
+    os.makedirs(MAIL_SPOOL_DIR, exist_ok=True)
+    body = re.sub(r"^From ", ">From ", record["body"], flags=re.M)
+    for username, email in recipients:
+        with open(os.path.join(MAIL_SPOOL_DIR, username), 'a') as f:
+            f.write(f"From {NOTIFY_SENDER} {time.asctime()}\n"
+                    f"From: {NOTIFY_SENDER}\nTo: {email}\nSubject: {record['subject']}\n"
+                    f"Date: {record['time']}\nMessage-ID: <{record['key']}@cafe>\n\n{body}\n\n")
+
+def drop_sink(record, recipients):
+    """Write the notification to znotify_drop/ as one JSON file named after its key"""
+    os.makedirs(NOTIFY_DROP_DIR, exist_ok=True)
+    file_path = os.path.join(NOTIFY_DROP_DIR, re.sub(r"[^\w.-]", "_", record["key"]) + ".json")
+    with open(file_path + ".tmp", 'w') as f:
+        json.dump(dict(record, recipients=[email for _, email in recipients]), f, ensure_ascii=False)
+    os.replace(file_path + ".tmp", file_path)
+
+NOTIFICATION_SINKS = {"spool": spool_sink, "drop": drop_sink}
+
+def register_sink(name, sink):
+    """Add a delivery sink; sink(record, [(username, email)]) raises to have the record retried"""
+    NOTIFICATION_SINKS[name] = sink
+
+@contextlib.contextmanager
+def outbox_lock():
+    """Yield True while holding the outbox worker lock, or False if another process holds it"""
+    if fcntl is None:
+        yield True
+        return
+    with open(OUTBOX_LOCK_FILE, 'a') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def load_outbox_state():
+    """Return the worker state, with delivered as an ordered dict of "sink key" pairs"""
+    state = {"offset": 0, "retries": {}, "dead": {}, "delivered": []}
+    try:
+        with open(OUTBOX_STATE_FILE, 'r') as f:
+            state.update(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+    delivered = dict.fromkeys(state["delivered"])
+    try:
+        with open(OUTBOX_SENT_FILE, 'r') as f:
+            delivered.update(dict.fromkeys(line.rstrip("\n") for line in f if line.strip()))
+    except FileNotFoundError:
+        pass
+    state["delivered"] = delivered
+    return state
+
+def save_outbox_state(state):
+    """Write the worker state and empty the sent log it now includes"""
+    delivered = list(state["delivered"])[-NOTIFY_DEDUP_KEYS:]
+    temp_file = OUTBOX_STATE_FILE + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(dict(state, delivered=delivered), f, ensure_ascii=False)
+    os.replace(temp_file, OUTBOX_STATE_FILE)
+    open(OUTBOX_SENT_FILE, 'w').close()
+
+def read_outbox(offset, limit):
+    """Return ([records], offset after them) for up to limit complete records from a byte offset"""
+    records = []
+    try:
+        f = open(OUTBOX_FILE, 'rb')
+    except FileNotFoundError:
+        return records, offset
+    with f:
+        f.seek(offset)
+        while len(records) < limit:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                # Not written completely yet; a later batch picks it up
+                break
+            offset += len(line)
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records, offset
+
+def notification_recipients(to, users):
+    """Return [(username, email)] for a username or "@<role>" """
+    if to.startswith("@"):
+        return [(fields[0], fields[1]) for fields in users if fields[3] == to[1:]]
+    return [(fields[0], fields[1]) for fields in users if fields[0] == to]
+
+def deliver_notifications(limit=NOTIFY_BATCH):
+    """Deliver the due retries and up to limit new outbox records.
+    Returns counts by outcome, or None if another process is delivering."""
+    with outbox_lock() as locked:
+        if not locked:
+            return None
+        state = load_outbox_state()
+        if not os.path.exists(OUTBOX_FILE) or os.path.getsize(OUTBOX_FILE) < state["offset"]:
+            # The outbox was replaced; reread it, the delivered pairs still apply
+            state["offset"] = 0
+        now = time.time()
+        batch = [(entry["record"], entry["sinks"], entry["attempts"])
+                 for entry in state["retries"].values() if entry["next"] <= now]
+        records, state["offset"] = read_outbox(state["offset"], limit)
+        batch += [(record, NOTIFY_SINKS, 0) for record in records]
+
+        counts = {"delivered": 0, "duplicate": 0, "retrying": 0, "failed": 0}
+        users = list(read_records(USER_FILE, 4)) if batch else []
+        with open(OUTBOX_SENT_FILE, 'a') as sent:
+            for record, sinks, attempts in batch:
+                key = record["key"]
+                recipients = notification_recipients(record["to"], users)
+                pending = [sink for sink in sinks if f"{sink} {key}" not in state["delivered"]]
+                failed = []
+                for sink in pending:
+                    try:
+                        NOTIFICATION_SINKS[sink](record, recipients)
+                    except Exception as exc:
+                        # Whatever a sink raises is retried; a broken sink must not stop the worker
+                        failed.append(sink)
+                        error = f"{sink}: {exc!r}"
+                        continue
+                    state["delivered"][f"{sink} {key}"] = None
+                    sent.write(f"{sink} {key}\n")
+                    sent.flush()
+
+                state["retries"].pop(key, None)
+                if not pending:
+                    counts["duplicate"] += 1
+                elif not failed:
+                    counts["delivered"] += 1
+                elif attempts + 1 >= NOTIFY_MAX_ATTEMPTS:
+                    state["dead"][key] = {"record": record, "sinks": failed, "error": error}
+                    counts["failed"] += 1
+                else:
+                    state["retries"][key] = {"record": record, "sinks": failed, "attempts": attempts + 1,
+                                             "next": now + NOTIFY_RETRY_SECONDS * 2 ** attempts, "error": error}
+                    counts["retrying"] += 1
+        if batch:
+            save_outbox_state(state)
+        compact = state["offset"] >= NOTIFY_COMPACT_BYTES
+    if compact:
+        compact_outbox()
+    return counts
+
+def compact_outbox():
+    """Cut the records the worker has read off the head of the outbox"""
+    with outbox_lock() as locked:
+        if not locked:
+            return
+        state = load_outbox_state()
+        # Producers append under the data lock, so nothing is added while the tail is copied
+        with data_lock():
+            with open(OUTBOX_FILE, 'rb') as f:
+                f.seek(state["offset"])
+                tail = f.read()
+            with open(OUTBOX_FILE + ".tmp", 'wb') as f:
+                f.write(tail)
+            os.replace(OUTBOX_FILE + ".tmp", OUTBOX_FILE)
+        state["offset"] = 0
+        save_outbox_state(state)
+
+def drain_outbox():
+    """Deliver batches until the outbox is empty; returns the summed counts, or None if another process is delivering"""
+    totals = None
+    while True:
+        counts = deliver_notifications()
+        if counts is None:
+            return totals
+        totals = {name: (totals or {}).get(name, 0) + count for name, count in counts.items()}
+        if sum(counts.values()) < NOTIFY_BATCH:
+            return totals
+
+def notification_worker(stop, interval):
+    """Drain the outbox every interval seconds until stop is set"""
+    while not stop.is_set():
+        try:
+            drain_outbox()
+        except OSError:
+            # E.g. the data directory is being replaced; try again next time
+            pass
+        stop.wait(interval)
+
+def start_notification_worker(interval=NOTIFY_INTERVAL_SECONDS):
+    """Start the delivery worker as a daemon thread; set the returned event to stop it"""
+    stop = threading.Event()
+    threading.Thread(target=notification_worker, args=(stop, interval), name="notification-worker",
+                     daemon=True).start()
+    return stop
+
+def outbox_status():
+    """Return counts of queued, retrying and dead-lettered notifications plus the dead letters"""
+    state = load_outbox_state()
+    queued = 0
+    try:
+        with open(OUTBOX_FILE, 'rb') as f:
+            if os.path.getsize(OUTBOX_FILE) >= state["offset"]:
+                f.seek(state["offset"])
+            queued = sum(1 for line in f if line.strip())
+    except FileNotFoundError:
+        pass
+    return {"queued": queued, "retrying": len(state["retries"]), "dead": len(state["dead"]),
+            "dead_letters": list(state["dead"].values())}
+
+def print_outbox_status(limit=10):
+    """Print the outbox counts and the latest dead letters"""
+    status = outbox_status()
+    print(f"\n=== Notification Outbox ({', '.join(NOTIFY_SINKS)}) ===")
+    print(f"Queued: {status['queued']}  Retrying: {status['retrying']}  Failed: {status['dead']}")
+    for entry in status["dead_letters"][-limit:]:
+        record = entry["record"]
+        print(f"  {record['time']} {record['key']} to {record['to']}: {entry['error']}")
+
+# ============= LIVE DASHBOARD =============
+# The admin dashboard follows zrequests.txt, the enrollment file(s),
+# feedback.txt and the event log like "tail -f": each followed file remembers
+# its inode and byte offset, and a refresh parses only the bytes appended since.
+# Rewrites go through a temp file and os.replace, so a new inode (or a file
+# smaller than the offset) means the file was rewritten and its totals are
+# reloaded from the start. Today's payments come from payment_made events.
+
+DASHBOARD_REFRESH_SECONDS = 2
+DASHBOARD_FEEDBACK_LINES = 5
+
+def follow_file(path):
+    """Start following a file from its beginning"""
+    return {"path": path, "inode": None, "offset": 0, "partial": b"", "totals": None}
+
+def read_new_lines(follower):
+    """Return (new complete lines, reloaded) since the last call; reloaded means start over"""
+    try:
+        stat = os.stat(follower["path"])
+    except FileNotFoundError:
+        reloaded = follower["offset"] > 0 or follower["totals"] is None
+        follower.update(inode=None, offset=0, partial=b"")
+        return [], reloaded
+
+    reloaded = follower["totals"] is None
+    if stat.st_ino != follower["inode"] or stat.st_size < follower["offset"]:
+        reloaded = True
+        follower.update(inode=stat.st_ino, offset=0, partial=b"")
+    if stat.st_size == follower["offset"]:
+        # An unfinished last line that stopped growing is a file without a
+        # final newline; a later append_line starts with one, so use it now
+        lines = [follower["partial"].decode("utf-8", "replace")] if follower["partial"] else []
+        follower["partial"] = b""
+        return lines, reloaded
+
+    with open(follower["path"], 'rb') as f:
+        f.seek(follower["offset"])
+        data = f.read(stat.st_size - follower["offset"])
+    follower["offset"] += len(data)
+    data = follower["partial"] + data
+    # Keep an unfinished last line until the rest of it is written
+    complete, _, follower["partial"] = data.rpartition(b"\n")
+    lines = [line.decode("utf-8", "replace") for line in complete.split(b"\n")] if complete else []
+    return lines, reloaded
+
+def new_dashboard():
+    """Return the dashboard state: one follower per source file"""
+    return {"requests": follow_file(REQUESTS_FILE), "feedback": follow_file(FEEDBACK_FILE),
+            "events": follow_file(EVENTS_FILE), "enrollments": {}, "refreshed": None, "lines_read": 0}
+
+def refresh_dashboard(dashboard):
+    """Fold the lines appended to every followed file into the dashboard totals"""
+    lines_read = 0
+
+    follower = dashboard["events"]
+    lines, reloaded = read_new_lines(follower)
+    if reloaded:
+        follower["totals"] = {"payments": {}}
+    patched = set()
+    for line in lines:
+        if '"payment_made"' in line:
+            event = json.loads(line)
+            day = event["time"][:10]
+            count, amount = follower["totals"]["payments"].get(day, (0, 0.0))
+            follower["totals"]["payments"][day] = (count + 1, amount + event["data"]["amount"])
+            patched.add("enrollments")
+        elif '"request_status_changed"' in line:
+            patched.add("requests")
+    lines_read += len(lines)
+    # In-place status changes leave a fixed-width file the same size, so read it again
+    patched &= set(status_layout())
+
+    follower = dashboard["requests"]
+    if "requests" in patched:
+        follower["inode"] = None
+    lines, reloaded = read_new_lines(follower)
+    if reloaded:
+        follower["totals"] = {"pending": []}
+    for line in lines:
+        fields = line.strip().split(",")
+        if len(fields) >= 4 and fields[3] == "pending":
+            follower["totals"]["pending"].append(fields[:3] + [fields[4] if len(fields) > 4 else ""])
+    lines_read += len(lines)
+
+    follower = dashboard["feedback"]
+    lines, reloaded = read_new_lines(follower)
+    if reloaded:
+        follower["totals"] = {"count": 0, "latest": []}
+    for line in lines:
+        if line.strip():
+            follower["totals"]["count"] += 1
+            follower["totals"]["latest"] = (follower["totals"]["latest"] + [line.strip()])[-DASHBOARD_FEEDBACK_LINES:]
+    lines_read += len(lines)
+
+    # The set of enrollment files changes when partitions are created or merged
+    paths = [path for _, path in enrollment_files()]
+    followers = dashboard["enrollments"]
+    for path in list(followers):
+        if path not in paths:
+            del followers[path]
+    for path in paths:
+        follower = followers.setdefault(path, follow_file(path))
+        if "enrollments" in patched:
+            follower["inode"] = None
+        lines, reloaded = read_new_lines(follower)
+        if reloaded:
+            follower["totals"] = {"classes": {}, "outstanding": 0.0}
+        totals = follower["totals"]
+        for line in lines:
+            fields = line.strip().split(",")
+            if len(fields) < 10:
+                continue
+            key = (fields[2], fields[3])
+            totals["classes"][key] = totals["classes"].get(key, 0) + 1
+            if fields[9] == "unpaid" and validate_charges(fields[8]):
+                totals["outstanding"] += float(fields[8])
+        lines_read += len(lines)
+
+    dashboard["refreshed"] = datetime.now()
+    dashboard["lines_read"] = lines_read
+    return dashboard
+
+def format_dashboard(dashboard):
+    """Return the dashboard as a list of text lines"""
+    today = dashboard["refreshed"].strftime("%Y-%m-%d")
+    pending = dashboard["requests"]["totals"]["pending"]
+    feedback = dashboard["feedback"]["totals"]
+    payment_count, payment_total = dashboard["events"]["totals"]["payments"].get(today, (0, 0.0))
+    classes = {}
+    outstanding = 0.0
+    for follower in dashboard["enrollments"].values():
+        outstanding += follower["totals"]["outstanding"]
+        for key, count in follower["totals"]["classes"].items():
+            classes[key] = classes.get(key, 0) + count
+
+    lines = [f"APU Programming Café - Live Dashboard   {dashboard['refreshed'].strftime('%Y-%m-%d %H:%M:%S')}",
+             f"(refreshes every {DASHBOARD_REFRESH_SECONDS}s, {dashboard['lines_read']} new lines read; press q to quit)",
+             "",
+             f"Pending requests: {len(pending)}      Today's payments: {payment_count} (RM{payment_total:.2f})      "
+             f"Outstanding: RM{outstanding:.2f}",
+             ""]
+    for student, module, level, timestamp in pending[-5:]:
+        lines.append(f"  {timestamp:<19}  {student} -> {module} ({level})")
+    if pending:
+        lines.append("")
+
+    lines.append(f"{'Module':<30} {'Level':<13} {'Students':>8}")
+    level_order = {level: i for i, level in enumerate(LEVELS)}
+    for (module, level), count in sorted(classes.items(), key=lambda item: (item[0][0], level_order.get(item[0][1], 9))):
+        lines.append(f"{module:<30} {level:<13} {count:>8}")
+
+    lines.append("")
+    lines.append(f"Latest feedback ({feedback['count']} total):")
+    for line in reversed(feedback["latest"]):
+        lines.append(f"  {line}")
+    return lines
+
+# ============= INTEGRITY CHECK (FSCK) =============
+# run_fsck() validates every data file with one pass per file, the files
+# checked in parallel worker processes. Each check returns its issues plus the
+# keys other files refer to (trainer names, classes, usernames, student IDs,
+# profile TP numbers);
+# the parent then joins those key sets to find orphans and cross-file
+# duplicates. Issues are {"file", "line", "check", "severity", "detail"} and
+# the whole report is JSON.
+#
+# --repair fixes the reported issues that can be fixed without guessing, in
+# one transaction, and touches only the rows they point at. Each check
+# function is followed by its table of fixes ({check: action}):
+#   quarantine  move the line to zfsck_quarantine.txt (never just deleted)
+#   pad         fill a short enrollment to 12 fields (quarantined if too short to keep)
+#   new_id      give the row a fresh student ID
+#   reregister  add the referenced trainer back to the roster
+#   compact     rewrite the trainer roster with its live names
+# Issues without a fix (e.g. non-numeric charges, missing profiles) need a
+# human and are only reported.
+
+FSCK_QUARANTINE_FILE = os.path.join(DATA_DIR, "zfsck_quarantine.txt")
+REQUEST_STATUSES = ["pending", "approved", "rejected", "waitlisted"]
+
+def fsck_issue(file_name, line, check, detail, severity="error"):
+    """Build one report entry"""
+    return {"file": file_name, "line": line, "check": check, "severity": severity, "detail": detail}
+
+def iter_numbered_lines(file_path):
+    """Yield (line number, stripped line) for the non-blank lines of a file (or rows of an archive segment)"""
+    if is_segment(file_path):
+        with open_segment(file_path) as f:
+            f.readline()  # header
+            for number, line in enumerate(f, 2):
+                if line.strip():
+                    yield number, line.strip()
+        return
+    try:
+        with open(file_path, 'r', encoding="utf-8", errors="replace") as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield number, line.strip()
+    except FileNotFoundError:
+        return
+
+def fsck_users(file_path):
+    """Check apu_list.txt: shape, email, role, duplicate usernames/emails"""
+    name = os.path.basename(file_path)
+    issues, usernames, emails, rows = [], {}, {}, 0
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        fields = line.split(",")
+        if len(fields) != 4:
+            issues.append(fsck_issue(name, number, "bad_row", f"expected 4 fields, found {len(fields)}"))
+            continue
+        username, email, password, role = fields
+        if role not in ROLE_NAMES:
+            issues.append(fsck_issue(name, number, "bad_role", f"role '{role}'"))
+        if not validate_email(email):
+            issues.append(fsck_issue(name, number, "bad_email", email, "warning"))
+        if username in usernames:
+            issues.append(fsck_issue(name, number, "duplicate_user", f"{username} (first on line {usernames[username]})"))
+        else:
+            usernames[username] = number
+        if email.lower() in emails:
+            issues.append(fsck_issue(name, number, "duplicate_email", f"{email} (first on line {emails[email.lower()]})"))
+        else:
+            emails[email.lower()] = number
+    return {"file": name, "rows": rows, "issues": issues, "keys": {"usernames": list(usernames)}}
 
-# Create file paths relative to script directory
-USER_FILE = os.path.join(SCRIPT_DIR, "apu_list.txt")
-TRAINERS_FILE = os.path.join(SCRIPT_DIR, "trainerslist.txt")
-TRAINER_MODULES_FILE = os.path.join(SCRIPT_DIR, "trainermodules.txt")
-STUDENTS_FILE = os.path.join(SCRIPT_DIR, "zstudents.txt")
-REQUESTS_FILE = os.path.join(SCRIPT_DIR, "zrequests.txt")
-FEEDBACK_FILE = os.path.join(SCRIPT_DIR, "feedback.txt")
+USER_REPAIRS = {"bad_row": "quarantine", "duplicate_user": "quarantine"}
 
-MAX_LOGIN_ATTEMPTS = 3
-LEVELS = ["Beginner", "Intermediate", "Advanced"]
+def fsck_trainers(file_path):
+    """Check trainerslist.txt: replay tombstones, find duplicate live names"""
+    name = os.path.basename(file_path)
+    issues, live, rows = [], {}, 0
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        trainer = line.split(",")[0]
+        if trainer.startswith(TRAINER_TOMBSTONE):
+            live.pop(trainer[len(TRAINER_TOMBSTONE):], None)
+        elif trainer in live:
+            issues.append(fsck_issue(name, number, "duplicate_trainer", f"{trainer} (first on line {live[trainer]})", "warning"))
+        else:
+            live[trainer] = number
+    return {"file": name, "rows": rows, "issues": issues, "keys": {"trainers": list(live)}}
 
-def create_files_if_not_exist():
-    """Create necessary files if they don't exist and create default admin"""
-    files = [USER_FILE, TRAINERS_FILE, TRAINER_MODULES_FILE, STUDENTS_FILE, REQUESTS_FILE, FEEDBACK_FILE]
-    for file in files:
-        if not os.path.exists(file):
-            with open(file, 'w') as f:
-                pass
-    
-    # Create default admin account if no users exist
-    if not os.path.exists(USER_FILE) or os.path.getsize(USER_FILE) == 0:
-        with open(USER_FILE, 'w') as f:
-            f.write("admin,admin@apu.edu.my,admin123,a\n")
-        print("Default admin account created:")
-        print("Email: admin@apu.edu.my")
-        print("Password: admin123")
+TRAINER_REPAIRS = {"duplicate_trainer": "compact"}
 
-def validate_email(email):
-    """Validate email format"""
-    return "@" in email and "." in email
+def fsck_trainer_modules(file_path):
+    """Check trainermodules.txt: shape, level, charges, capacity, duplicate classes"""
+    name = os.path.basename(file_path)
+    issues, classes, rows = [], {}, 0
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        fields = line.split(",")
+        if len(fields) < 4 or len(fields) > 6:
+            issues.append(fsck_issue(name, number, "bad_row", f"expected 4-6 fields, found {len(fields)}"))
+            if len(fields) < 3:
+                continue
+        module, trainer, level = fields[:3]
+        if level not in LEVELS:
+            issues.append(fsck_issue(name, number, "bad_level", f"level '{level}'"))
+        if len(fields) > 3 and not validate_charges(fields[3]):
+            issues.append(fsck_issue(name, number, "bad_charges", f"charges '{fields[3]}' for {module} ({level})"))
+        if len(fields) > 5 and not validate_capacity(fields[5]):
+            issues.append(fsck_issue(name, number, "bad_capacity", f"capacity '{fields[5]}'"))
+        key = (trainer, normalize_module(module), level)
+        if key in classes:
+            issues.append(fsck_issue(name, number, "duplicate_class",
+                                     f"{trainer}/{module}/{level} (first on line {classes[key]})"))
+        else:
+            classes[key] = number
+    return {"file": name, "rows": rows, "issues": issues,
+            "keys": {"classes": list(classes), "class_lines": [[list(key), line] for key, line in classes.items()]}}
 
-def validate_level(level):
-    """Validate coaching level"""
-    return level in LEVELS
+# orphan_trainer comes from the cross-file checks
+CLASS_REPAIRS = {"bad_row": "quarantine", "duplicate_class": "quarantine", "orphan_trainer": "reregister"}
 
-def get_user_input(prompt, validation_func=None, error_msg="Invalid input. Please try again."):
-    """Get validated user input"""
-    while True:
-        user_input = input(prompt).strip()
-        if validation_func is None or validation_func(user_input):
-            return user_input
-        print(error_msg)
+def fsck_enrollments(file_path):
+    """Check one enrollment file: shape, level, status, charges; collect IDs and class keys"""
+    name = os.path.relpath(file_path, DATA_DIR)
+    issues, rows = [], 0
+    student_ids, enrollments, classes, slim_rows = [], [], {}, []
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        fields = line.split(",")
+        if len(fields) < 12:
+            issues.append(fsck_issue(name, number, "short_row", f"expected 12 fields, found {len(fields)}"))
+            if len(fields) < 5:
+                continue
+        if fields[3] not in LEVELS:
+            issues.append(fsck_issue(name, number, "bad_level", f"level '{fields[3]}'"))
+        if len(fields) > 9 and fields[9] not in ("paid", "unpaid"):
+            issues.append(fsck_issue(name, number, "bad_status", f"status '{fields[9]}'"))
+        if len(fields) > 8 and not validate_charges(fields[8]):
+            issues.append(fsck_issue(name, number, "bad_charges", f"charges '{fields[8]}'"))
+        if len(fields) > 10:
+            student_ids.append([fields[10], number])
+        if not fields[0]:
+            slim_rows.append([fields[1], number])
+        # Approved requests have no TP number yet, so fall back to the name
+        student = fields[1] if fields[1] != "TBD" else fields[0]
+        # One row per student, class and month: the billing cycle adds the next month's
+        enrollments.append([student, fields[2], fields[3], partition_key(fields[7]) if len(fields) > 7 else "",
+                            fields[10] if len(fields) > 10 else "", number])
+        classes.setdefault((fields[4], normalize_module(fields[2]), fields[3]), number)
+    return {"file": name, "rows": rows, "issues": issues,
+            "keys": {"student_ids": student_ids, "enrollments": enrollments, "slim_rows": slim_rows,
+                     "classes": [[list(key), line] for key, line in classes.items()]}}
 
-def generate_student_id():
-    """Generate unique student ID"""
+# duplicate_enrollment, duplicate_student_id and orphan_trainer come from the cross-file checks
+ENROLLMENT_REPAIRS = {"short_row": "pad", "duplicate_enrollment": "quarantine", "duplicate_student_id": "new_id",
+                      "orphan_trainer": "reregister"}
+
+def fsck_profiles(file_path):
+    """Check zprofiles.txt: shape and TP numbers; collect the TP numbers"""
+    name = os.path.basename(file_path)
+    issues, rows, tp_numbers = [], 0, set()
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        fields = line.split(",")
+        if len(fields) < 5:
+            issues.append(fsck_issue(name, number, "short_row", f"expected 5 fields, found {len(fields)}"))
+            continue
+        if not validate_tp_number(fields[0]):
+            issues.append(fsck_issue(name, number, "bad_tp_number", f"TP number '{fields[0]}'", "warning"))
+        tp_numbers.add(fields[0])
+    return {"file": name, "rows": rows, "issues": issues, "keys": {"tp_numbers": sorted(tp_numbers)}}
+
+def fsck_requests(file_path):
+    """Check zrequests.txt: shape, level, status; collect students and classes"""
+    name = os.path.basename(file_path)
+    issues, rows, requests, pending = [], 0, [], {}
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        fields = line.split(",")
+        if len(fields) < 4 or len(fields) > 6:
+            issues.append(fsck_issue(name, number, "bad_row", f"expected 5 or 6 fields, found {len(fields)}"))
+            if len(fields) < 4:
+                continue
+        if fields[2] not in LEVELS:
+            issues.append(fsck_issue(name, number, "bad_level", f"level '{fields[2]}'"))
+        if fields[3] not in REQUEST_STATUSES:
+            issues.append(fsck_issue(name, number, "bad_status", f"status '{fields[3]}'"))
+        if fields[3] == "pending" and tuple(fields[:3]) in pending:
+            issues.append(fsck_issue(name, number, "duplicate_request",
+                                     f"{fields[0]} for {fields[1]} ({fields[2]}) "
+                                     f"(first on line {pending[tuple(fields[:3])]})", "warning"))
+        elif fields[3] == "pending":
+            pending[tuple(fields[:3])] = number
+        requests.append([fields[0], fields[1], fields[2], fields[3], number])
+    return {"file": name, "rows": rows, "issues": issues, "keys": {"requests": requests}}
+
+REQUEST_REPAIRS = {"bad_row": "quarantine", "duplicate_request": "quarantine"}
+
+def fsck_feedback(file_path):
+    """Check feedback.txt: every line is '[timestamp] sender: message'"""
+    name = os.path.basename(file_path)
+    issues, rows = [], 0
+    for number, line in iter_numbered_lines(file_path):
+        rows += 1
+        timestamp, sender, message = parse_feedback_line(line)
+        if not sender:
+            issues.append(fsck_issue(name, number, "bad_row", "not '[timestamp] sender: message'", "warning"))
+    return {"file": name, "rows": rows, "issues": issues, "keys": {}}
+
+def fsck_archive_segment(file_path):
+    """Check one archive segment: readable header, its rows as in their table's file, row count"""
+    name = os.path.relpath(file_path, DATA_DIR)
     try:
-        with open(STUDENTS_FILE, 'r') as f:
-            lines = f.readlines()
-            if lines:
-                return f"STU{len(lines) + 1:04d}"
+        with open_segment(file_path) as f:
+            header = json.loads(f.readline())
+        check = {"requests": fsck_requests, "feedback": fsck_feedback, "enrollments": fsck_enrollments}[header["table"]]
+        result = check(file_path)
+    except (OSError, EOFError, lzma.LZMAError, ValueError, KeyError, TypeError) as error:
+        return {"file": name, "rows": 0, "keys": {},
+                "issues": [fsck_issue(name, 1, "bad_segment", f"unreadable segment: {error}")]}
+    if result["rows"] != header.get("rows"):
+        result["issues"].append(fsck_issue(name, 1, "segment_row_count",
+                                           f"header says {header.get('rows')} rows, found {result['rows']}"))
+    # Archived rows are history, so they take no part in the cross-file checks
+    result.update(file=name, keys={})
+    return result
+
+def fsck_archive_index():
+    """Check that every indexed segment exists and every segment file is indexed"""
+    name = os.path.relpath(ARCHIVE_INDEX_FILE, DATA_DIR)
+    issues = []
+    entries = read_archive_index()
+    indexed = {entry["file"] for entry in entries}
+    for number, entry in enumerate(entries, 1):
+        if not os.path.exists(entry["file"]):
+            issues.append(fsck_issue(name, number, "missing_segment", f"{os.path.basename(entry['file'])} does not exist"))
+    if os.path.isdir(ARCHIVE_DIR):
+        for file_name in sorted(os.listdir(ARCHIVE_DIR)):
+            file_path = os.path.join(ARCHIVE_DIR, file_name)
+            if is_segment(file_path) and file_path not in indexed:
+                issues.append(fsck_issue(name, 0, "unindexed_segment",
+                                         f"{file_name} is not in the index (an archive that did not commit)", "warning"))
+    return {"file": name, "rows": len(entries), "issues": issues, "keys": {}}
+
+def fsck_cross_checks(results):
+    """Join the key sets of the per-file results into cross-file issues"""
+    issues = []
+    by_file = {}
+    for result in results:
+        by_file.setdefault(result["check"], []).append(result)
+    trainers = set(by_file["trainers"][0]["keys"]["trainers"])
+    usernames = set(by_file["users"][0]["keys"]["usernames"])
+    module_file = by_file["trainer_modules"][0]
+    classes = {tuple(key) for key in module_file["keys"]["classes"]}
+
+    for key, line in module_file["keys"]["class_lines"]:
+        if key[0] not in trainers:
+            issues.append(fsck_issue(module_file["file"], line, "orphan_trainer", f"trainer {key[0]} is not registered"))
+
+    seen_ids = {}
+    seen_enrollments = {}
+    closings = billing_closings()
+    profile_tps = set(by_file["profiles"][0]["keys"]["tp_numbers"]) if "profiles" in by_file else set()
+    for result in by_file["enrollments"]:
+        for tp_number, line in result["keys"]["slim_rows"]:
+            if tp_number not in profile_tps:
+                issues.append(fsck_issue(result["file"], line, "missing_profile",
+                                         f"{tp_number} has no student profile for its empty details"))
+        for student_id, line in result["keys"]["student_ids"]:
+            if student_id in seen_ids:
+                first_file, first_line = seen_ids[student_id]
+                issues.append(fsck_issue(result["file"], line, "duplicate_student_id",
+                                         f"{student_id} (first in {first_file}:{first_line})"))
             else:
-                return "STU0001"
-    except FileNotFoundError:
-        return "STU0001"
+                seen_ids[student_id] = (result["file"], line)
+        for student, module, level, month, student_id, line in result["keys"]["enrollments"]:
+            # Months carry no year: a row added after the month was last closed is a later year's
+            key = (student, normalize_module(module), level, month, billing_generation(month, student_id, closings))
+            if key in seen_enrollments:
+                first_file, first_line = seen_enrollments[key]
+                issues.append(fsck_issue(result["file"], line, "duplicate_enrollment",
+                                         f"{student} in {module} ({level}) for {month} "
+                                         f"(first in {first_file}:{first_line})"))
+            else:
+                seen_enrollments[key] = (result["file"], line)
+        for key, line in result["keys"]["classes"]:
+            if key[0] not in trainers:
+                issues.append(fsck_issue(result["file"], line, "orphan_trainer", f"trainer {key[0]} is not registered"))
+            elif tuple(key) not in classes:
+                issues.append(fsck_issue(result["file"], line, "orphan_class",
+                                         f"{key[0]}/{key[1]}/{key[2]} is not an offered class", "warning"))
+
+    request_file = by_file["requests"][0]
+    offered = {(module, level) for trainer, module, level in classes}
+    for student, module, level, status, line in request_file["keys"]["requests"]:
+        if student not in usernames:
+            issues.append(fsck_issue(request_file["file"], line, "orphan_student", f"{student} has no account", "warning"))
+        if status == "pending" and (normalize_module(module), level) not in offered:
+            issues.append(fsck_issue(request_file["file"], line, "orphan_class",
+                                     f"{module} ({level}) is not offered", "warning"))
+    return issues
+
+def run_fsck_checks(workers=None):
+    """Check every data file in parallel; returns the per-file results"""
+    jobs = [("users", fsck_users, USER_FILE), ("trainers", fsck_trainers, TRAINERS_FILE),
+            ("trainer_modules", fsck_trainer_modules, TRAINER_MODULES_FILE),
+            ("requests", fsck_requests, REQUESTS_FILE), ("feedback", fsck_feedback, FEEDBACK_FILE)]
+    jobs += [("enrollments", fsck_enrollments, file_path) for _, file_path in enrollment_files()]
+    if profiles_enabled():
+        jobs.append(("profiles", fsck_profiles, PROFILES_FILE))
+    jobs += [("archive", fsck_archive_segment, entry["file"]) for entry in read_archive_index()
+             if os.path.exists(entry["file"])]
+    with ProcessPoolExecutor(max_workers=workers or min(len(jobs), os.cpu_count() or 1)) as pool:
+        futures = [(check, pool.submit(func, file_path)) for check, func, file_path in jobs]
+        results = []
+        for check, future in futures:
+            result = future.result()
+            result["check"] = check
+            results.append(result)
+    if os.path.exists(ARCHIVE_INDEX_FILE) or os.path.isdir(ARCHIVE_DIR):
+        results.append(dict(fsck_archive_index(), check="archive_index"))
+    return results
+
+FSCK_REPAIRS = {"users": USER_REPAIRS, "trainers": TRAINER_REPAIRS, "trainer_modules": CLASS_REPAIRS,
+                "enrollments": ENROLLMENT_REPAIRS, "requests": REQUEST_REPAIRS}
+
+def repair_rows(file_path, kind, line_actions, quarantine, count):
+    """Apply the line fixes {line number: action} to one file of the given kind"""
+    lines = read_lines(file_path)
+    kept, needs_id = [], []
+    for number, line in enumerate(lines, 1):
+        action = line_actions.get(number)
+        fields = line.strip().split(",")
+        if action == "quarantine" or (action == "pad" and len(fields) < 10):
+            quarantine.append(f"{os.path.relpath(file_path, DATA_DIR)}\t{line.strip()}\n")
+            count(f"{kind}_quarantined")
+            continue
+        if action in ("pad", "new_id"):
+            fields += [""] * (12 - len(fields))
+            if action == "new_id" or not fields[10]:
+                needs_id.append(len(kept))
+            kept.append(fields)
+            continue
+        kept.append(line if line.endswith("\n") else line + "\n")
+
+    # One allocation for every row that needs a new ID
+    for index, student_id in zip(needs_id, allocate_student_ids(len(needs_id)) if needs_id else []):
+        kept[index][10] = student_id
+    count("student_ids_reassigned", len(needs_id))
+    write_lines(file_path, [line if isinstance(line, str) else format_record(kind, line) for line in kept])
+
+    if kind == "enrollments" and partitions_enabled():
+        manifest = read_partition_manifest()
+        for entry in manifest.values():
+            if entry["file"] == file_path:
+                entry["rows"] = sum(1 for line in kept if not isinstance(line, str) or line.strip())
+        write_partition_manifest(manifest)
+
+def repair_data(results, issues):
+    """Apply the fixes for the reported issues; returns (repairs, changed tables)"""
+    repairs = {}
+    quarantine = []
+
+    def count(action, n=1):
+        if n:
+            repairs[action] = repairs.get(action, 0) + n
+
+    kinds = {result["file"]: result["check"] for result in results}
+    actions, reregister, compact = {}, [], False
+    for issue in issues:
+        kind = kinds.get(issue["file"])
+        action = FSCK_REPAIRS.get(kind, {}).get(issue["check"])
+        if action == "reregister":
+            reregister.append(issue["detail"].split()[1])
+        elif action == "compact":
+            compact = True
+        elif action:
+            line_actions = actions.setdefault((kind, os.path.join(DATA_DIR, issue["file"])), {})
+            # Quarantining a row wins over mending it
+            if line_actions.get(issue["line"]) != "quarantine":
+                line_actions[issue["line"]] = action
+
+    changed = set()
+    for (kind, file_path), line_actions in actions.items():
+        repair_rows(file_path, kind, line_actions, quarantine, count)
+        changed.add(kind)
+
+    roster = list(load_trainer_roster())
+    missing = [name for name in dict.fromkeys(reregister) if name not in roster]
+    if compact or missing:
+        write_lines(TRAINERS_FILE, [f"{name}\n" for name in roster + missing])
+        ROSTER_CACHE["tombstones"] = 0
+        roster_written()
+        count("trainers_reregistered", len(missing))
+        changed.add("trainers")
+
+    if quarantine:
+        append_line(FSCK_QUARANTINE_FILE, f"# fsck repair {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n" + "".join(quarantine))
+    sync_student_ids()
+    return repairs, changed
+
+def run_fsck(repair=False, workers=None):
+    """Check (and optionally repair) all data files; returns the JSON-ready report"""
+    start = time.perf_counter()
+    with transaction():
+        # The lock keeps other processes from writing while the files are read
+        results = run_fsck_checks(workers)
+        issues = [issue for result in results for issue in result["issues"]]
+        issues += fsck_cross_checks(results)
+        repairs, changed = repair_data(results, issues) if repair else ({}, set())
+
+    if changed:
+        reset_caches()
+        rebuild_aggregates()
+        for table in sorted(changed):
+            emit_event("table_replaced", table=table, snapshot=write_snapshot([table]))
+
+    summary = {}
+    for issue in issues:
+        summary[issue["check"]] = summary.get(issue["check"], 0) + 1
+    return {"checked_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+            "files": {result["file"]: {"rows": result["rows"], "issues": len(result["issues"])} for result in results},
+            "errors": sum(1 for issue in issues if issue["severity"] == "error"),
+            "warnings": sum(1 for issue in issues if issue["severity"] == "warning"),
+            "summary": summary, "issues": issues, "repairs": repairs}
+
+def print_fsck_report(report, limit=20):
+    """Print a readable summary of an fsck report"""
+    for file_name, info in report["files"].items():
+        print(f"{file_name}: {info['rows']} rows, {info['issues']} issues")
+    print(f"{report['errors']} errors, {report['warnings']} warnings in {report['elapsed_seconds']:.2f}s")
+    for check, count in sorted(report["summary"].items()):
+        print(f"- {check}: {count}")
+    for issue in report["issues"][:limit]:
+        print(f"  {issue['file']}:{issue['line']} {issue['check']}: {issue['detail']}")
+    if len(report["issues"]) > limit:
+        print(f"  ... and {len(report['issues']) - limit} more")
+    for action, count in sorted(report["repairs"].items()):
+        print(f"Repaired: {action.replace('_', ' ')}: {count}")
 
 def main_menu():
     """Main system menu - login only (no registration)"""
+    campuses = list_campuses()
+    if campuses and CURRENT_CAMPUS is None:
+        use_campus(get_user_input(f"Campus ({', '.join(campuses)}): ",
+                                  lambda x: x in campuses,
+                                  f"Campus must be one of: {', '.join(campuses)}"))
     create_files_if_not_exist()
+    start_notification_worker()
     print("=== APU Programming Café Management System ===")
     
     while True:
@@ -95,35 +4642,306 @@ def login():
         password = input("Password: ").strip()
 
         try:
-            with open(USER_FILE, 'r') as f:
-                for line in f:
-                    user_info = line.strip().split(',')
-                    if len(user_info) >= 4 and user_info[1] == email and user_info[2] == password:
-                        print(f"Login successful! Welcome {user_info[0]}")
-                        
-                        # Route to appropriate role menu
-                        if user_info[3] == ADMIN_ROLE:
-                            admin_menu(user_info[0])
-                        elif user_info[3] == TRAINER_ROLE:
-                            trainer_menu(user_info[0])
-                        elif user_info[3] == LECTURER_ROLE:
-                            lecturer_menu(user_info[0])
-                        elif user_info[3] == STUDENT_ROLE:
-                            student_menu(user_info[0])
-                        return
-                        
-                login_attempts += 1
-                remaining = MAX_LOGIN_ATTEMPTS - login_attempts
-                if remaining > 0:
-                    print(f"Invalid credentials. You have {remaining} attempts left.")
-                else:
-                    print("Login failed. Maximum number of attempts reached.")
-                    return
-                    
+            user = authenticate(email, password)
+            if user:
+                username, role = user
+                print(f"Login successful! Welcome {username}")
+                
+                # Route to appropriate role menu
+                if role == ADMIN_ROLE:
+                    admin_menu(username)
+                elif role == TRAINER_ROLE:
+                    trainer_menu(username)
+                elif role == LECTURER_ROLE:
+                    lecturer_menu(username)
+                elif role == STUDENT_ROLE:
+                    student_menu(username)
+                return
+                
+            login_attempts += 1
+            remaining = MAX_LOGIN_ATTEMPTS - login_attempts
+            if remaining > 0:
+                print(f"Invalid credentials. You have {remaining} attempts left.")
+            else:
+                print("Login failed. Maximum number of attempts reached.")
+                return
+                
         except FileNotFoundError:
             print("Error: User database not found.")
             return
 
+# ============= CAMPUS SHARDS =============
+# Each campus keeps the complete file set in its own directory under
+# DATA_ROOT/campuses/<campus>/, so everything scoped to a campus (menus, API
+# server, jobs) touches only that shard: use_campus() re-points every data path
+# global and resets the caches. Without a campus the data directory itself is
+# used, as before. Cross-campus admin reports run the single-campus report in
+# one worker process per shard and merge the results.
+#
+# Moving a trainer or module copies its classes, enrollments (with new student
+# IDs) and the accounts involved into the target shard first and only then
+# removes them from the source, so a crash in between leaves duplicates rather
+# than losing rows. A moved student's account is removed from the source once
+# nothing of theirs (enrollment, request, waitlist entry) is left there. Both
+# shards get table_replaced events for the tables the move rewrote.
+
+# Every data path global, re-pointed by use_campus
+DATA_PATH_NAMES = ["USER_FILE", "TRAINERS_FILE", "TRAINER_MODULES_FILE", "STUDENTS_FILE", "REQUESTS_FILE",
+                   "FEEDBACK_FILE", "PARTITIONS_DIR", "PARTITION_MANIFEST_FILE", "AGGREGATES_FILE", "WAITLIST_FILE",
+                   "RECOMMENDATIONS_FILE", "STUDENT_ID_FILE", "PROFILES_FILE", "STATUS_LAYOUT_FILE", "COMPLETED_FILE",
+                   "BILLING_LEDGER_FILE", "JOURNAL_FILE", "DATA_LOCK_FILE", "EVENTS_FILE", "EVENT_SNAPSHOTS_DIR",
+                   "ARCHIVE_DIR", "ARCHIVE_INDEX_FILE", "ARCHIVE_DELETED_FILE", "OUTBOX_FILE", "OUTBOX_STATE_FILE",
+                   "OUTBOX_SENT_FILE", "OUTBOX_LOCK_FILE", "MAIL_SPOOL_DIR", "NOTIFY_DROP_DIR", "FSCK_QUARANTINE_FILE"]
+CAMPUS_TABLES = ["users", "trainers", "trainer_modules", "enrollments", "requests"]
+
+def list_campuses():
+    """Return the names of the campus shards"""
+    if not os.path.isdir(CAMPUSES_DIR):
+        return []
+    return sorted(name for name in os.listdir(CAMPUSES_DIR) if os.path.isdir(os.path.join(CAMPUSES_DIR, name)))
+
+def use_campus(campus):
+    """Point every data file path at a campus shard (None = the unsharded data directory)"""
+    global DATA_DIR, CURRENT_CAMPUS
+    if staged_writes() is not None:
+        raise RuntimeError("Cannot switch campus inside a transaction.")
+    if campus is not None and campus not in list_campuses():
+        raise ValueError(f"Unknown campus: {campus}")
+    data_dir = os.path.join(CAMPUSES_DIR, campus) if campus else DATA_ROOT
+    for name in DATA_PATH_NAMES:
+        globals()[name] = os.path.join(data_dir, os.path.relpath(globals()[name], DATA_DIR))
+    DATA_DIR = data_dir
+    CURRENT_CAMPUS = campus
+    reset_caches()
+
+def use_environment_campus():
+    """Switch to the campus named by CAFE_CAMPUS, if it is set"""
+    if os.environ.get("CAFE_CAMPUS"):
+        use_campus(os.environ["CAFE_CAMPUS"])
+
+@contextlib.contextmanager
+def on_campus(name):
+    """Work on another campus inside the block, then switch back"""
+    previous = CURRENT_CAMPUS
+    use_campus(name)
+    try:
+        yield
+    finally:
+        use_campus(previous)
+
+def add_campus(name):
+    """Create a campus shard with an empty file set and the default admin account"""
+    if not name or not name.replace("_", "").replace("-", "").isalnum():
+        return False, "Campus names may only use letters, digits, '-' and '_'."
+    if name in list_campuses():
+        return False, f"Campus '{name}' already exists."
+    os.makedirs(os.path.join(CAMPUSES_DIR, name))
+    with on_campus(name):
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_files_if_not_exist()
+    return True, f"Campus '{name}' created (default admin: admin@apu.edu.my / admin123)."
+
+def campus_call(name, func, args):
+    """Worker: run func(*args) against one campus shard"""
+    use_campus(name)
+    return func(*args)
+
+def fan_out(func, args=(), campuses=None, workers=None):
+    """Run func(*args) on every campus shard concurrently; returns {campus: result}"""
+    campuses = campuses or list_campuses()
+    if not campuses:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers or min(len(campuses), os.cpu_count() or 1)) as pool:
+        futures = {name: pool.submit(campus_call, name, func, args) for name in campuses}
+        return {name: future.result() for name, future in futures.items()}
+
+def feedback_rows():
+    """Return every feedback row as [timestamp, sender, message]"""
+    return list(iter_table_rows("feedback"))
+
+def print_campus_income_report(months=None):
+    """Print income per class on every campus, with campus and overall totals"""
+    start = time.perf_counter()
+    # One process per shard already, so each shard scans with a single worker
+    reports = fan_out(income_report, (months, 1))
+    print(f"\n{'Campus':<12} {'Trainer':<15} {'Module':<20} {'Level':<12} {'Paid':>5} {'Revenue':>12} {'Outstanding':>12}")
+    print("-" * 94)
+    totals = {}
+    for name, report in reports.items():
+        for (trainer, module, level), (paid, unpaid, revenue, outstanding) in sorted(report.items()):
+            print(f"{name:<12} {trainer:<15} {module:<20} {level:<12} {paid:>5} {'RM' + format(revenue, '.2f'):>12} "
+                  f"{'RM' + format(outstanding, '.2f'):>12}")
+        totals[name] = [sum(values[2] for values in report.values()), sum(values[3] for values in report.values())]
+    print("-" * 94)
+    for name, (revenue, outstanding) in totals.items():
+        print(f"{name:<12} revenue RM{revenue:.2f}  outstanding RM{outstanding:.2f}")
+    print(f"{'All':<12} revenue RM{sum(t[0] for t in totals.values()):.2f}  "
+          f"outstanding RM{sum(t[1] for t in totals.values()):.2f}")
+    print(f"(scanned {len(reports)} campuses in {time.perf_counter() - start:.2f}s)")
+
+def print_campus_enrollment_report(months=None):
+    """Print enrollments per module and level with a column per campus"""
+    start = time.perf_counter()
+    reports = fan_out(enrollment_count_report, (months, 1))
+    by_class = {}
+    for name, report in reports.items():
+        for (module, level, month), (enrolled, paid) in report.items():
+            by_class.setdefault((module, level), {}).setdefault(name, 0)
+            by_class[(module, level)][name] += enrolled
+    names = list(reports)
+    print(f"\n{'Module':<20} {'Level':<12}" + "".join(f" {name[:10]:>10}" for name in names) + f" {'Total':>8}")
+    print("-" * (42 + 11 * len(names)))
+    for (module, level), counts in sorted(by_class.items()):
+        print(f"{module:<20} {level:<12}" + "".join(f" {counts.get(name, 0):>10}" for name in names)
+              + f" {sum(counts.values()):>8}")
+    print(f"(scanned {len(reports)} campuses in {time.perf_counter() - start:.2f}s)")
+
+def print_campus_feedback(limit=20):
+    """Print the latest feedback across all campuses, newest first"""
+    rows = [(timestamp, name, sender, message) for name, feedback in fan_out(feedback_rows).items()
+            for timestamp, sender, message in feedback]
+    for timestamp, name, sender, message in heapq.nlargest(limit, rows):
+        print(f"[{timestamp}] ({name}) {sender}: {message}")
+    if not rows:
+        print("No feedback available.")
+
+def move_classes(source, target, trainer=None, module=None):
+    """Move a trainer's classes (and the trainer) or a module's classes between campus shards"""
+    if source == target or not {source, target} <= set(list_campuses()):
+        return False, "Please choose two different existing campuses."
+
+    def selected(trainer_name, module_name):
+        return trainer_name == trainer if trainer else normalize_module(module_name) == normalize_module(module)
+
+    with on_campus(source):
+        classes = [fields for fields in read_records(TRAINER_MODULES_FILE, 3) if selected(fields[1], fields[0])]
+        if not classes:
+            return False, f"No classes of {trainer or module} on campus {source}."
+        if any(get_waitlist(fields[1], fields[0], fields[2]) for fields in classes):
+            return False, "Some of these classes have a waitlist; clear it before moving them."
+        trainers = sorted({fields[1] for fields in classes})
+        enrollments = [fields for fields in iter_enrollments(min_fields=10) if selected(fields[4], fields[2])]
+        # Pending requests follow a module; a trainer's move leaves them with the campus
+        requests = [fields for fields in read_records(REQUESTS_FILE, 4)
+                    if module and fields[3] == "pending" and normalize_module(fields[1]) == normalize_module(module)]
+        names = set(trainers) | {fields[0] for fields in enrollments} | {fields[0] for fields in requests}
+        accounts = [fields for fields in read_records(USER_FILE, 4) if fields[0] in names]
+
+    with on_campus(target):
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_files_if_not_exist()
+        with transaction():
+            for fields in accounts:
+                add_user(*fields[:4])
+            roster = load_trainer_roster()
+            for name in trainers:
+                if name not in roster:
+                    add_trainer(name)
+            existing = {(fields[1], normalize_module(fields[0]), fields[2]) for fields in read_records(TRAINER_MODULES_FILE, 3)}
+            for fields in classes:
+                if (fields[1], normalize_module(fields[0]), fields[2]) not in existing:
+                    append_line(TRAINER_MODULES_FILE, ",".join(fields) + "\n")
+            # Student IDs are unique per campus, so moved enrollments get new ones
+            for fields, student_id in zip(enrollments, allocate_student_ids(len(enrollments))):
+                append_enrollment(fields[:10] + [student_id] + fields[11:])
+            for fields in requests:
+                append_line(REQUESTS_FILE, format_record("requests", fields))
+        finish_campus_move()
+
+    with on_campus(source):
+        with transaction():
+            kept = []
+            for line in read_lines(TRAINER_MODULES_FILE):
+                fields = line.strip().split(",")
+                if not (len(fields) >= 3 and selected(fields[1], fields[0])):
+                    kept.append(line)
+            write_lines(TRAINER_MODULES_FILE, kept)
+            rewrite_enrollments(lambda fields: None if len(fields) >= 5 and selected(fields[4], fields[2]) else fields)
+            if requests:
+                moved = {tuple(fields) for fields in requests}
+                write_lines(REQUESTS_FILE, [line for line in read_lines(REQUESTS_FILE)
+                                            if tuple(line.strip().split(",")) not in moved])
+            if trainer:
+                remove_trainer(trainer)
+                remove_user(trainer)
+            # A student account stays on the source campus while it still has enrollments,
+            # requests or waitlist entries there
+            remaining = ({fields[0] for fields in iter_enrollments(min_fields=1)}
+                         | {fields[0] for fields in read_records(REQUESTS_FILE, 1)}
+                         | {fields[7] for fields in load_waitlist()["entries"].values()})
+            removed_accounts = [fields[0] for fields in accounts
+                                if fields[3] == STUDENT_ROLE and fields[0] not in remaining]
+            for name in removed_accounts:
+                remove_user(name)
+        finish_campus_move()
+
+    return True, (f"Moved {len(classes)} classes, {len(enrollments)} enrollments and {len(requests)} pending requests "
+                  f"of {trainer or classes[0][0]} from {source} to {target}; "
+                  f"{len(removed_accounts)} student accounts left {source} with them.")
+
+def finish_campus_move():
+    """Rebuild the current shard's derived data and log the tables a move rewrote"""
+    reset_caches()
+    rebuild_aggregates()
+    sync_student_ids()
+    for table in CAMPUS_TABLES:
+        emit_event("table_replaced", table=table, snapshot=write_snapshot([table]))
+
+def move_trainer(trainer, source, target):
+    """Move a trainer, their classes and their students' enrollments to another campus"""
+    return move_classes(source, target, trainer=trainer)
+
+def move_module(module, source, target):
+    """Move every class of a module and its enrollments and pending requests to another campus"""
+    return move_classes(source, target, module=module)
+
+def campus_menu():
+    """Cross-campus reports and shard maintenance"""
+    while True:
+        campuses = list_campuses()
+        print("\n=== Campuses ===")
+        print(f"Campuses: {', '.join(campuses) if campuses else 'none (single data directory)'}")
+        print(f"Working on: {CURRENT_CAMPUS or 'the unsharded data directory'}")
+        print("1. Income across campuses")
+        print("2. Enrollments across campuses")
+        print("3. Latest feedback across campuses")
+        print("4. Add a campus")
+        print("5. Move a trainer to another campus")
+        print("6. Move a module to another campus")
+        print("7. Back")
+
+        choice = get_user_input("Enter your choice (1-7): ",
+                               lambda x: x in ['1', '2', '3', '4', '5', '6', '7'],
+                               "Invalid choice. Please enter 1-7.")
+        if choice == "7":
+            return
+        if choice in ("1", "2", "3", "5", "6") and not campuses:
+            print("No campuses yet. Add one first.")
+            continue
+
+        if choice == "1":
+            month = input("Enter month (leave blank for all months): ").strip()
+            print_campus_income_report([month] if month else None)
+        elif choice == "2":
+            month = input("Enter month (leave blank for all months): ").strip()
+            print_campus_enrollment_report([month] if month else None)
+        elif choice == "3":
+            print_campus_feedback()
+        elif choice == "4":
+            success, message = add_campus(input("Enter the new campus name: ").strip())
+            print(message)
+        else:
+            name = input("Enter trainer name: " if choice == "5" else "Enter module name: ").strip()
+            source = get_user_input("Move from campus: ", lambda x: x in campuses,
+                                    f"Campus must be one of: {', '.join(campuses)}")
+            target = get_user_input("Move to campus: ", lambda x: x in campuses and x != source,
+                                    "Please enter a different existing campus.")
+            if choice == "5":
+                success, message = move_trainer(name, source, target)
+            else:
+                success, message = move_module(name, source, target)
+            print(message)
+
 # ============= ADMINISTRATOR FUNCTIONS =============
 
 def admin_menu(admin_name):
@@ -138,12 +4956,15 @@ def admin_menu(admin_name):
         print("6. View monthly income report")
         print("7. View feedback by trainer")
         print("8. Update own profile")
-        print("9. Logout")
-        print("10. Exit")
+        print("9. Data maintenance")
+        print("10. Reports")
+        print("11. Live dashboard")
+        print("12. Logout")
+        print("13. Exit")
         
-        choice = get_user_input("Enter your choice (1-10): ",
-                               lambda x: x in ['1','2','3','4','5','6','7','8','9','10'],
-                               "Invalid choice. Please enter 1-10.")
+        choice = get_user_input("Enter your choice (1-13): ",
+                               lambda x: x in ['1','2','3','4','5','6','7','8','9','10','11','12','13'],
+                               "Invalid choice. Please enter 1-13.")
         
         if choice == "1":
             admin_register_user()
@@ -162,16 +4983,253 @@ def admin_menu(admin_name):
         elif choice == "8":
             update_profile(admin_name)
         elif choice == "9":
-            return
+            maintenance_menu()
         elif choice == "10":
+            reports_menu()
+        elif choice == "11":
+            view_dashboard()
+        elif choice == "12":
+            return
+        elif choice == "13":
             sys.exit()
 
+def maintenance_menu():
+    """Administrator data maintenance tools"""
+    while True:
+        print("\n=== Data Maintenance ===")
+        print(f"Enrollment storage: {'monthly partitions' if partitions_enabled() else 'single file'}")
+        print(f"Student details: {'profile table' if profiles_enabled() else 'on every enrollment'}")
+        print(f"Status columns: {'fixed-width (updated in place)' if status_layout() else 'plain'}")
+        print("1. Split enrollments into monthly partitions")
+        print("2. Merge monthly partitions back into one file")
+        print("3. Verify income aggregates")
+        print("4. Export data")
+        print("5. Import a table")
+        print("6. Bulk register users from CSV")
+        print("7. Trainer roster report")
+        print("8. Compact trainer list")
+        print("9. Rebuild module recommendations")
+        print("10. Check data integrity")
+        print("11. Move student details into profiles")
+        print("12. Copy student details back onto enrollments")
+        print("13. Pad status columns for in-place updates")
+        print("14. Remove status column padding")
+        print("15. Archive old requests and feedback")
+        print("16. Campuses")
+        print("17. Notification outbox")
+        print("18. Run monthly billing cycle")
+        print("19. Back")
+        
+        choice = get_user_input("Enter your choice (1-19): ",
+                               lambda x: x in [str(n) for n in range(1, 20)],
+                               "Invalid choice. Please enter 1-19.")
+        
+        if choice == "1":
+            success, message = migrate_to_partitions()
+            print(message)
+        elif choice == "2":
+            success, message = merge_partitions()
+            print(message)
+        elif choice == "3":
+            if not run_aggregate_verification():
+                rebuild = input("Rebuild aggregates from the enrollments? (y/n): ").strip().lower()
+                if rebuild == 'y':
+                    success, message = rebuild_aggregates()
+                    print(message)
+        elif choice == "4":
+            export_format = get_user_input("Enter format (csv/jsonl/columnar): ",
+                                          lambda x: x in EXPORT_FORMATS,
+                                          "Format must be csv, jsonl or columnar.")
+            output_dir = input("Enter output directory (leave blank for 'exports'): ").strip() or os.path.join(DATA_DIR, "exports")
+            compress = input("Compress with gzip? (y/n): ").strip().lower() == 'y'
+            run_export(list(TABLE_SCHEMAS), export_format, output_dir, compress)
+        elif choice == "5":
+            table = get_user_input(f"Enter table ({'/'.join(TABLE_SCHEMAS)}): ",
+                                  lambda x: x in TABLE_SCHEMAS,
+                                  "Please enter a valid table name.")
+            file_path = input("Enter file to import: ").strip()
+            append = input("Append to existing rows instead of replacing them? (y/n): ").strip().lower() == 'y'
+            run_import(table, file_path, append=append)
+        elif choice == "6":
+            file_path = input("Enter CSV file (username,email,password,role): ").strip()
+            reject_file = input("Enter file for the reject report (leave blank to print it): ").strip()
+            success, message = bulk_add_users(file_path, reject_file or None)
+            print(message)
+        elif choice == "7":
+            view_trainer_roster()
+        elif choice == "8":
+            success, message = compact_trainer_roster()
+            print(message)
+        elif choice == "9":
+            success, message = rebuild_recommendations(force=True)
+            print(message)
+        elif choice == "10":
+            report = run_fsck()
+            print_fsck_report(report)
+            if report["issues"] and input("Apply the safe repairs? (y/n): ").strip().lower() == 'y':
+                print_fsck_report(run_fsck(repair=True), limit=0)
+        elif choice == "11":
+            success, message = migrate_to_profiles()
+            print(message)
+        elif choice == "12":
+            success, message = inline_profiles()
+            print(message)
+        elif choice == "13":
+            success, message = pad_status_columns()
+            print(message)
+        elif choice == "14":
+            success, message = unpad_status_columns()
+            print(message)
+        elif choice == "15":
+            print_archive_summary()
+            days = get_user_input(f"Archive history older than how many days? (default {ARCHIVE_AFTER_DAYS}): ",
+                                 lambda x: x == "" or x.isdigit(),
+                                 "Please enter a number of days.")
+            codec = get_user_input("Compression (gzip/lzma, default gzip): ",
+                                  lambda x: x == "" or x in ARCHIVE_CODECS,
+                                  "Please enter gzip or lzma.")
+            success, message = archive_history(int(days) if days else ARCHIVE_AFTER_DAYS, codec or ARCHIVE_CODEC)
+            print(message)
+        elif choice == "16":
+            campus_menu()
+        elif choice == "17":
+            print_outbox_status()
+            if input("Deliver queued notifications now? (y/n): ").strip().lower() == 'y':
+                counts = drain_outbox()
+                print("Another process is delivering notifications." if counts is None else
+                      f"Delivered {counts['delivered']}, retrying {counts['retrying']}, failed {counts['failed']}.")
+        elif choice == "18":
+            source_month = get_user_input("Bill the students of which month? (default: this month): ",
+                                         lambda x: x == "" or partition_key(x) in MONTHS,
+                                         "Please enter a month name, e.g. March.")
+            source_month, month = billing_cycle_months(source_month or None)
+            if input(f"Add {month} charges for the continuing {source_month} students? (y/n): ").strip().lower() == 'y':
+                success, message = run_billing_cycle(source_month, month)
+                print(message)
+        elif choice == "19":
+            return
+
+def reports_menu():
+    """Administrator reports computed with a full (parallel) scan of the enrollments"""
+    while True:
+        print("\n=== Reports ===")
+        print("1. Income by trainer, module and level")
+        print("2. Outstanding payments by student")
+        print("3. Enrollment counts by module and level")
+        print("4. Receivables aging")
+        print("5. Trainer workload")
+        print("6. Enrollment request trends")
+        print("7. Back")
+        
+        choice = get_user_input("Enter your choice (1-7): ",
+                               lambda x: x in ['1', '2', '3', '4', '5', '6', '7'],
+                               "Invalid choice. Please enter 1-7.")
+        if choice == "7":
+            return
+        if choice == "6":
+            request_trends_menu()
+            continue
+        
+        month = input("Enter month (leave blank for all months): ").strip()
+        months = [month] if month else None
+        archived = False
+        if choice in ("1", "2", "3", "4") and archive_segments("enrollments"):
+            archived = input("Include archived enrollments of deleted students? (y/n): ").strip().lower() == 'y'
+        if choice == "1":
+            print_income_report(months, archived=archived)
+        elif choice == "2":
+            print_outstanding_report(months, archived=archived)
+        elif choice == "3":
+            print_enrollment_count_report(months, archived=archived)
+        elif choice == "4":
+            as_of = get_user_input("Age as of month (leave blank for the current month): ",
+                                  lambda x: x == "" or partition_key(x) in MONTHS,
+                                  "Please enter a month name, e.g. March.")
+            output = input("Save as CSV to (leave blank to skip): ").strip()
+            print_aging_report(months, as_of=as_of or None, output=output or None, archived=archived)
+        elif choice == "5":
+            print_workload_report(months)
+
+def print_income_report(months=None, workers=None, archived=False):
+    """Print income per class"""
+    start = time.perf_counter()
+    report = income_report(months, workers, archived)
+    print(f"\n{'Trainer':<15} {'Module':<20} {'Level':<12} {'Paid':>6} {'Revenue':>12} {'Unpaid':>6} {'Outstanding':>12}")
+    print("-" * 90)
+    for (trainer, module, level), (paid, unpaid, revenue, outstanding) in sorted(report.items()):
+        print(f"{trainer:<15} {module:<20} {level:<12} {paid:>6} {'RM' + format(revenue, '.2f'):>12} "
+              f"{unpaid:>6} {'RM' + format(outstanding, '.2f'):>12}")
+    total_revenue = sum(values[2] for values in report.values())
+    total_outstanding = sum(values[3] for values in report.values())
+    print("-" * 90)
+    print(f"Total revenue: RM{total_revenue:.2f}  Total outstanding: RM{total_outstanding:.2f}")
+    print(f"(scanned in {time.perf_counter() - start:.2f}s)")
+
+def print_outstanding_report(months=None, workers=None, archived=False, limit=50):
+    """Print the students who owe the most"""
+    start = time.perf_counter()
+    report = outstanding_report(months, workers, archived)
+    print(f"\n{'Student':<20} {'TP Number':<12} {'Unpaid':>6} {'Amount':>12}")
+    print("-" * 55)
+    for name, tp_number, count, amount in report[:limit]:
+        print(f"{name:<20} {tp_number:<12} {count:>6} {'RM' + format(amount, '.2f'):>12}")
+    if len(report) > limit:
+        print(f"... and {len(report) - limit} more students")
+    print("-" * 55)
+    print(f"{len(report)} students owe RM{sum(row[3] for row in report):.2f} in total.")
+    print(f"(scanned in {time.perf_counter() - start:.2f}s)")
+
+def print_aging_report(months=None, workers=None, as_of=None, top=AGING_TOP_DEBTORS, output=None, archived=False):
+    """Print receivables aging by trainer and module, and the top debtors"""
+    start = time.perf_counter()
+    report = aging_report(months, workers, as_of, top, archived)
+    header = "".join(f"{label:>12}" for label in report["buckets"]) + f"{'Total':>13}"
+
+    def amounts(values):
+        return "".join(f"{'RM' + format(amount, '.2f'):>12}" for amount in values[:-1]) + f"{'RM' + format(sum(values[:-1]), '.2f'):>13}"
+
+    print(f"\nReceivables aging as of {report['as_of']}")
+    for group, title in (("trainers", "Trainer"), ("modules", "Module")):
+        print(f"\n{title:<20}{header}")
+        print("-" * (20 + len(header)))
+        for name, values in sorted(report[group].items()):
+            print(f"{name:<20}{amounts(values)}")
+    print("-" * (20 + len(header)))
+    print(f"{'Total':<20}{amounts(report['total'])}")
+
+    print(f"\nTop {len(report['debtors'])} of {report['students']} debtors")
+    print(f"{'Student':<20} {'TP Number':<12} {'Unpaid':>6} {'Amount':>12}  Oldest")
+    for name, tp_number, values in report["debtors"]:
+        oldest = max(i for i, amount in enumerate(values[:-1]) if amount or i == 0)
+        print(f"{name:<20} {tp_number:<12} {int(values[-1]):>6} {'RM' + format(sum(values[:-1]), '.2f'):>12}  "
+              f"{report['buckets'][oldest]}")
+    if output:
+        write_aging_csv(report, output)
+        print(f"Saved to {output}")
+    print(f"(scanned in {time.perf_counter() - start:.2f}s)")
+
+def print_enrollment_count_report(months=None, workers=None, archived=False):
+    """Print enrollment counts per class, with a monthly breakdown"""
+    start = time.perf_counter()
+    report = enrollment_count_report(months, workers, archived)
+    by_class = merge_totals([{key[:2]: values} for key, values in report.items()])
+    print(f"\n{'Module':<20} {'Level':<12} {'Enrolled':>9} {'Paid':>9}")
+    print("-" * 55)
+    for (module, level), (enrolled, paid) in sorted(by_class.items()):
+        print(f"{module:<20} {level:<12} {enrolled:>9} {paid:>9}")
+        months_seen = sorted(((m, values[0]) for (mod, lvl, m), values in report.items() if (mod, lvl) == (module, level)),
+                             key=lambda item: MONTHS.index(item[0]) if item[0] in MONTHS else len(MONTHS))
+        print("    " + ", ".join(f"{m}: {count}" for m, count in months_seen))
+    print("-" * 55)
+    print(f"Total enrollments: {sum(values[0] for values in by_class.values())}")
+    print(f"(scanned in {time.perf_counter() - start:.2f}s)")
+
 def admin_register_user():
     """Admin registers new users for all roles"""
     print("\n=== Register New User (Admin Only) ===")
     
     username = get_user_input("Enter username: ", 
-                             lambda x: len(x) >= 3,
+                             validate_username,
                              "Username must be at least 3 characters long.")
     
     email = get_user_input("Enter email: ",
@@ -179,7 +5237,7 @@ def admin_register_user():
                           "Please enter a valid email address.")
     
     password = get_user_input("Enter password: ",
-                             lambda x: len(x) >= 6,
+                             validate_password,
                              "Password must be at least 6 characters long.")
     
     print("\nSelect role:")
@@ -189,26 +5247,11 @@ def admin_register_user():
     print("d - Student")
     
     role = get_user_input("Enter role (a/b/c/d): ",
-                         lambda x: x in [ADMIN_ROLE, TRAINER_ROLE, LECTURER_ROLE, STUDENT_ROLE],
+                         lambda x: x in ROLE_NAMES,
                          "Please enter a valid role (a/b/c/d).")
 
-    # Check if user already exists
-    try:
-        with open(USER_FILE, 'r') as f:
-            for line in f:
-                user_info = line.strip().split(',')
-                if len(user_info) >= 2 and (user_info[0] == username or user_info[1] == email):
-                    print("Error: Username or email already exists.")
-                    return
-    except FileNotFoundError:
-        pass
-
-    with open(USER_FILE, 'a') as f:
-        f.write(f"{username},{email},{password},{role}\n")
-
-    role_names = {ADMIN_ROLE: "Administrator", TRAINER_ROLE: "Trainer", 
-                 LECTURER_ROLE: "Lecturer", STUDENT_ROLE: "Student"}
-    print(f"{role_names[role]} '{username}' registered successfully.")
+    success, message = add_user(username, email, password, role)
+    print(message)
 
 def admin_delete_user():
     """Admin deletes users"""
@@ -224,35 +5267,17 @@ def admin_delete_user():
             return
             
         print("Current users:")
-        role_names = {ADMIN_ROLE: "Administrator", TRAINER_ROLE: "Trainer", 
-                     LECTURER_ROLE: "Lecturer", STUDENT_ROLE: "Student"}
-        
         for i, line in enumerate(users, 1):
             user_info = line.strip().split(',')
             if len(user_info) >= 4:
-                role_name = role_names.get(user_info[3], "Unknown")
+                role_name = ROLE_NAMES.get(user_info[3], "Unknown")
                 print(f"{i}. {user_info[0]} ({user_info[1]}) - {role_name}")
         
         username_to_delete = input("\nEnter username to delete: ").strip()
         
         # Find and remove user
-        original_count = len(users)
-        filtered_users = []
-        deleted_user = None
-        
-        for line in users:
-            user_info = line.strip().split(',')
-            if len(user_info) >= 4 and user_info[0] != username_to_delete:
-                filtered_users.append(line)
-            elif len(user_info) >= 4 and user_info[0] == username_to_delete:
-                deleted_user = user_info
-        
-        if len(filtered_users) < original_count:
-            with open(USER_FILE, 'w') as f:
-                f.writelines(filtered_users)
-            print(f"User '{username_to_delete}' deleted successfully.")
-        else:
-            print("User not found.")
+        success, message = remove_user(username_to_delete)
+        print(message)
             
     except FileNotFoundError:
         print("User database not found.")
@@ -262,145 +5287,125 @@ def register_trainer():
     print("\n=== Register Trainer ===")
     
     trainer_name = get_user_input("Enter trainer name: ",
-                                 lambda x: len(x) >= 2,
-                                 "Trainer name must be at least 2 characters.")
-    
-    # Check if trainer already exists
-    try:
-        with open(TRAINERS_FILE, 'r') as f:
-            trainers = f.read().splitlines()
-            if trainer_name in trainers:
-                print("Error: Trainer already exists in trainer list.")
-                return
-    except FileNotFoundError:
-        trainers = []
-    
-    trainers.append(trainer_name)
+                                 lambda x: len(x) >= 2 and not x.startswith(TRAINER_TOMBSTONE) and "," not in x,
+                                 f"Trainer name must be at least 2 characters, without commas or a leading '{TRAINER_TOMBSTONE}'.")
     
-    with open(TRAINERS_FILE, 'w') as f:
-        for trainer in trainers:
-            if trainer.strip():
-                f.write(f"{trainer}\n")
-    
-    print("Trainer added to trainer list successfully.")
+    success, message = add_trainer(trainer_name)
+    print(message)
 
 def delete_trainer():
     """Delete a trainer from trainer list"""
     print("\n=== Delete Trainer ===")
     
-    try:
-        with open(TRAINERS_FILE, 'r') as f:
-            trainers = f.read().splitlines()
-            trainers = [t for t in trainers if t.strip()]
-    except FileNotFoundError:
-        print("No trainers found.")
-        return
-    
-    if not trainers:
-        print("No trainers available to delete.")
+    trainer_name = choose_trainer("Enter trainer name to delete (or the start of a name to search): ")
+    if trainer_name is None:
         return
     
-    print("Available trainers:")
-    for i, trainer in enumerate(trainers, 1):
-        print(f"{i}. {trainer}")
+    classes = modules_for_trainer(trainer_name)
+    if classes:
+        print(f"Note: {trainer_name} is still assigned to {len(classes)} class(es):")
+        for module, level in classes:
+            print(f"- {module} ({level})")
     
-    trainer_name = input("Enter trainer name to delete: ").strip()
+    success, message = remove_trainer(trainer_name)
+    print(message)
+
+def choose_trainer(prompt):
+    """Ask for a trainer name, listing prefix matches until an exact name is entered"""
+    roster = load_trainer_roster()
+    if not roster:
+        print("No trainers available. Please register trainers first.")
+        return None
     
-    if trainer_name in trainers:
-        trainers.remove(trainer_name)
-        
-        with open(TRAINERS_FILE, 'w') as f:
-            for trainer in trainers:
-                if trainer.strip():
-                    f.write(f"{trainer}\n")
-        
-        print("Trainer deleted from trainer list successfully.")
-    else:
-        print("Trainer not found.")
+    while True:
+        trainer_name = input(prompt).strip()
+        if trainer_name in roster:
+            return trainer_name
+        if not trainer_name:
+            return None
+        matches = search_trainers(trainer_name)
+        if matches:
+            print("Matching trainers:")
+            for trainer in matches:
+                print(f"- {trainer}")
+        else:
+            print("No trainers match that name.")
 
 def assign_trainer():
     """Assign trainer to a module and level"""
     print("\n=== Assign Trainer to Module ===")
     
-    # Display available trainers
-    try:
-        with open(TRAINERS_FILE, 'r') as f:
-            trainers = f.read().splitlines()
-            trainers = [t for t in trainers if t.strip()]
-    except FileNotFoundError:
-        print("No trainers found. Please register trainers first.")
-        return
-    
-    if not trainers:
-        print("No trainers available.")
+    trainer = choose_trainer("Enter trainer name (or the start of a name to search): ")
+    if trainer is None:
         return
     
-    print("Available trainers:")
-    for trainer in trainers:
-        print(f"- {trainer}")
-    
     module = get_user_input("Enter module name: ",
                            lambda x: len(x) >= 2,
                            "Module name must be at least 2 characters.")
-    
-    trainer = get_user_input("Enter trainer name: ",
-                           lambda x: x in trainers,
-                           f"Trainer must be one of: {', '.join(trainers)}")
+    module = resolve_module(module) or module
     
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
     
     charges = get_user_input("Enter charges (RM): ",
-                           lambda x: x.replace('.', '').isdigit(),
+                           validate_charges,
                            "Please enter a valid amount.")
+    
+    capacity = get_user_input("Enter class capacity (leave blank for unlimited): ",
+                             validate_capacity,
+                             "Capacity must be a positive whole number.")
+
+    success, message = assign_trainer_module(module, trainer, level, charges, capacity)
+    print(message)
 
-    with open(TRAINER_MODULES_FILE, 'a') as f:
-        f.write(f"{module},{trainer},{level},{charges},TBD\n")
+def view_trainer_roster():
+    """Show modules per trainer and trainers without any modules"""
+    print("\n=== Trainer Roster ===")
+    roster = load_trainer_roster()
+    print(f"Registered trainers: {len(roster)}")
     
-    print("Trainer assigned to module successfully.")
+    by_trainer = trainer_class_index()
+    print("\nModules per trainer:")
+    for trainer in roster:
+        if trainer in by_trainer:
+            classes = ", ".join(f"{module} ({level})" for module, level in by_trainer[trainer])
+            print(f"- {trainer}: {classes}")
+    
+    idle = trainers_without_modules()
+    print(f"\nTrainers with no modules: {len(idle)}")
+    for trainer in idle:
+        print(f"- {trainer}")
 
 def view_monthly_income():
     """View monthly income report"""
     print("\n=== Monthly Income Report ===")
     
     trainer_name = input("Enter trainer name: ").strip()
-    module_name = input("Enter module name: ").strip()
+    module_name = get_module_input("Enter module name: ")
     level = input("Enter level: ").strip()
+    month = input("Enter month (leave blank for all months): ").strip()
     
     try:
-        # Count paid students
-        student_count = 0
-        with open(STUDENTS_FILE, "r") as f:
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 10 and fields[2] == module_name and fields[3] == level and fields[4] == trainer_name and fields[9] == "paid":
-                    student_count += 1
-        
         # Get charges from trainer modules
-        charges = 0
-        found = False
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 4 and fields[0] == module_name and fields[1] == trainer_name and fields[2] == level:
-                    charges = float(fields[3])
-                    found = True
-                    break
+        charges = get_charges_for_module(module_name, level, trainer_name)
         
-        if found:
-            total_income = charges * student_count
+        if charges is not None:
+            charges = float(charges)
+            # Paid count and income come from the maintained aggregates
+            summary = get_income_summary(trainer_name, module_name, level, month or None)
             print(f"\nTrainer: {trainer_name}")
             print(f"Module: {module_name}")
             print(f"Level: {level}")
+            print(f"Month: {partition_key(month) if month else 'All months'}")
             print(f"Charges per student: RM{charges:.2f}")
-            print(f"Number of paid students: {student_count}")
-            print(f"Total monthly income: RM{total_income:.2f}")
+            print(f"Number of paid students: {summary['paid_count']}")
+            print(f"Number of unpaid students: {summary['unpaid_count']}")
+            print(f"Total monthly income: RM{summary['revenue']:.2f}")
+            print(f"Outstanding payments: RM{summary['outstanding']:.2f}")
         else:
             print("No matching trainer/module/level found.")
             
-    except FileNotFoundError as e:
-        print(f"Error: Required file not found - {e}")
     except ValueError:
         print("Error: Invalid charges format in database.")
 
@@ -419,55 +5424,67 @@ def view_feedback():
     except FileNotFoundError:
         print("No feedback file found.")
 
+def view_dashboard():
+    """Show the live dashboard until the admin presses q"""
+    try:
+        import curses
+    except ImportError:
+        # No curses (e.g. Windows without windows-curses): print one snapshot instead
+        print("\n".join(format_dashboard(refresh_dashboard(new_dashboard()))))
+        return
+
+    def run(screen):
+        curses.curs_set(0)
+        screen.timeout(DASHBOARD_REFRESH_SECONDS * 1000)
+        dashboard = new_dashboard()
+        while True:
+            refresh_dashboard(dashboard)
+            height, width = screen.getmaxyx()
+            screen.erase()
+            for row, line in enumerate(format_dashboard(dashboard)[:height - 1]):
+                screen.addstr(row, 0, line[:width - 1])
+            screen.refresh()
+            if screen.getch() in (ord("q"), ord("Q")):
+                return
+
+    curses.wrapper(run)
+
 def update_profile(username):
     """Update user profile"""
     print(f"\n=== Update Profile - {username} ===")
     
-    try:
-        with open(USER_FILE, 'r') as f:
-            users = f.readlines()
-        
-        updated = False
-        for i, line in enumerate(users):
-            user_data = line.strip().split(',')
-            if len(user_data) >= 4 and user_data[0] == username:
-                print("Current profile:")
-                print(f"Username: {user_data[0]}")
-                print(f"Email: {user_data[1]}")
-                
-                new_email = input("Enter new email (leave blank to keep current): ").strip()
-                if new_email:
-                    if validate_email(new_email):
-                        user_data[1] = new_email
-                    else:
-                        print("Invalid email format. Email not updated.")
-                
-                new_password = input("Enter new password (leave blank to keep current): ").strip()
-                if new_password:
-                    if len(new_password) >= 6:
-                        user_data[2] = new_password
-                    else:
-                        print("Password too short. Password not updated.")
-                
-                users[i] = ",".join(user_data) + "\n"
-                updated = True
-                break
-        
-        if updated:
-            with open(USER_FILE, 'w') as f:
-                f.writelines(users)
-            print("Profile updated successfully.")
-        else:
-            print("User profile not found.")
-            
-    except FileNotFoundError:
+    if not os.path.exists(USER_FILE):
         print("User database not found.")
+        return
+    
+    for user_data in read_records(USER_FILE, 4):
+        if user_data[0] == username:
+            print("Current profile:")
+            print(f"Username: {user_data[0]}")
+            print(f"Email: {user_data[1]}")
+            
+            new_email = input("Enter new email (leave blank to keep current): ").strip()
+            if new_email and not validate_email(new_email):
+                print("Invalid email format. Email not updated.")
+                new_email = None
+            
+            new_password = input("Enter new password (leave blank to keep current): ").strip()
+            if new_password and not validate_password(new_password):
+                print("Password too short. Password not updated.")
+                new_password = None
+            
+            success, message = update_user_profile(username, new_email, new_password)
+            print(message)
+            return
+    
+    print("User profile not found.")
 
 # ============= TRAINER FUNCTIONS =============
 # ONLY functions that trainers can perform according to assignment
 
 def trainer_menu(trainer_name):
     """Trainer main menu - restricted to trainer-only functions"""
+    print_trainer_workload(trainer_name)
     while True:
         print(f"\n=== Trainer Menu - {trainer_name} ===")
         
@@ -495,7 +5512,8 @@ def trainer_menu(trainer_name):
         elif choice == "3":
             delete_coaching_info(trainer_name)
         elif choice == "4":
-            view_enrolled_students(trainer_name)
+            current_only = input("Show only this month's students? (y/n): ").strip().lower()
+            view_enrolled_students(trainer_name, datetime.now().strftime("%B") if current_only == 'y' else None)
         elif choice == "5":
             send_feedback(trainer_name)
         elif choice == "6":
@@ -509,21 +5527,19 @@ def display_trainer_modules(trainer_name):
     """Display modules assigned to trainer"""
     print(f"\nModules assigned to {trainer_name}:")
     
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            found = False
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 3 and fields[1] == trainer_name:
-                    charges = fields[3] if len(fields) > 3 else 'TBD'
-                    schedule = fields[4] if len(fields) > 4 else 'TBD'
-                    print(f"- {fields[0]} ({fields[2]}) - Charges: RM{charges} - Schedule: {schedule}")
-                    found = True
-            
-            if not found:
-                print("No modules assigned to you yet.")
-    except FileNotFoundError:
-        print("No module assignments found.")
+    classes = modules_for_trainer(trainer_name)
+    if not classes:
+        print("No modules assigned to you yet.")
+    
+    for module, level in classes:
+        entry = find_class(trainer_name, module, level)
+        charges = entry["charges"] or 'TBD'
+        schedule = entry["schedule"] or 'TBD'
+        capacity = entry["capacity"]
+        seats = f"{class_occupancy(trainer_name, module, level)}/{capacity if capacity else 'unlimited'}"
+        waiting = len(get_waitlist(trainer_name, module, level))
+        print(f"- {module} ({level}) - Charges: RM{charges} - Schedule: {schedule} - "
+              f"Seats: {seats}" + (f" - Waitlist: {waiting}" if waiting else ""))
 
 def add_coaching_info(trainer_name):
     """Add coaching class information"""
@@ -542,77 +5558,40 @@ def add_coaching_info(trainer_name):
 
 def add_schedule(trainer_name):
     """Add schedule to coaching class"""
-    module = input("Enter module name: ").strip()
+    module = get_module_input("Enter module name: ")
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
-    
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            data = f.readlines()
-        
-        updated = False
-        for i, line in enumerate(data):
-            fields = line.strip().split(",")
-            if len(fields) >= 3 and fields[1] == trainer_name and fields[0] == module and fields[2] == level:
-                schedule = input("Enter the schedule: ").strip()
-                
-                # Ensure we have at least 5 fields
-                while len(fields) < 5:
-                    fields.append("TBD")
-                
-                fields[4] = schedule
-                data[i] = ",".join(fields) + "\n"
-                updated = True
-                break
-        
-        if updated:
-            with open(TRAINER_MODULES_FILE, "w") as f:
-                f.writelines(data)
-            print("Schedule added successfully.")
-        else:
-            print("Module assignment not found for you.")
-            
-    except FileNotFoundError:
+    
+    if not os.path.exists(TRAINER_MODULES_FILE):
         print("Trainer modules file not found.")
+        return
+    
+    if not is_trainer_class(trainer_name, module, level):
+        print("Module assignment not found for you.")
+        return
+    
+    schedule = input("Enter the schedule: ").strip()
+    success, message = set_class_details(trainer_name, module, level, schedule=schedule)
+    print("Schedule added successfully." if success else message)
 
 def add_charges(trainer_name):
     """Add charges to coaching class"""
-    module = input("Enter module name: ").strip()
+    module = get_module_input("Enter module name: ")
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
     
     charges = get_user_input("Enter charges (RM): ",
-                           lambda x: x.replace('.', '').isdigit(),
+                           validate_charges,
                            "Please enter a valid amount.")
     
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            data = f.readlines()
-        
-        updated = False
-        for i, line in enumerate(data):
-            fields = line.strip().split(",")
-            if len(fields) >= 3 and fields[1] == trainer_name and fields[0] == module and fields[2] == level:
-                # Ensure we have at least 4 fields
-                while len(fields) < 4:
-                    fields.append("TBD")
-                
-                fields[3] = charges
-                data[i] = ",".join(fields) + "\n"
-                updated = True
-                break
-        
-        if updated:
-            with open(TRAINER_MODULES_FILE, "w") as f:
-                f.writelines(data)
-            print("Charges added successfully.")
-        else:
-            print("Module assignment not found for you.")
-            
-    except FileNotFoundError:
+    if not os.path.exists(TRAINER_MODULES_FILE):
         print("Trainer modules file not found.")
+        return
+    
+    success, message = set_class_details(trainer_name, module, level, charges=charges)
+    print("Charges added successfully." if success else message)
 
 def update_coaching_info(trainer_name):
     """Update coaching class information"""
@@ -620,90 +5599,75 @@ def update_coaching_info(trainer_name):
     
     print("1. Update charges")
     print("2. Update schedule")
-    choice = get_user_input("Enter your choice (1-2): ",
-                           lambda x: x in ['1', '2'],
-                           "Please enter 1 or 2.")
+    print("3. Update class capacity")
+    choice = get_user_input("Enter your choice (1-3): ",
+                           lambda x: x in ['1', '2', '3'],
+                           "Please enter 1, 2 or 3.")
     
     if choice == '1':
         update_charges(trainer_name)
     elif choice == '2':
         update_schedule(trainer_name)
+    elif choice == '3':
+        update_capacity(trainer_name)
 
 def update_charges(trainer_name):
     """Update charges for coaching class"""
-    module = input("Enter module name: ").strip()
+    module = get_module_input("Enter module name: ")
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
     
     new_charges = get_user_input("Enter new charges (RM): ",
-                               lambda x: x.replace('.', '').isdigit(),
+                               validate_charges,
                                "Please enter a valid amount.")
     
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            data = f.readlines()
-        
-        updated = False
-        for i, line in enumerate(data):
-            fields = line.strip().split(",")
-            if len(fields) >= 3 and fields[1] == trainer_name and fields[0] == module and fields[2] == level:
-                while len(fields) < 4:
-                    fields.append("TBD")
-                fields[3] = new_charges
-                data[i] = ",".join(fields) + "\n"
-                updated = True
-                break
-        
-        if updated:
-            with open(TRAINER_MODULES_FILE, "w") as f:
-                f.writelines(data)
-            print("Charges updated successfully.")
-        else:
-            print("Module assignment not found for you.")
-            
-    except FileNotFoundError:
+    if not os.path.exists(TRAINER_MODULES_FILE):
         print("Trainer modules file not found.")
+        return
+    
+    success, message = set_class_details(trainer_name, module, level, charges=new_charges)
+    print("Charges updated successfully." if success else message)
 
 def update_schedule(trainer_name):
     """Update schedule for coaching class"""
-    module = input("Enter module name: ").strip()
+    module = get_module_input("Enter module name: ")
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
     
     new_schedule = input("Enter new schedule: ").strip()
     
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            data = f.readlines()
-        
-        updated = False
-        for i, line in enumerate(data):
-            fields = line.strip().split(",")
-            if len(fields) >= 3 and fields[1] == trainer_name and fields[0] == module and fields[2] == level:
-                while len(fields) < 5:
-                    fields.append("TBD")
-                fields[4] = new_schedule
-                data[i] = ",".join(fields) + "\n"
-                updated = True
-                break
-        
-        if updated:
-            with open(TRAINER_MODULES_FILE, "w") as f:
-                f.writelines(data)
-            print("Schedule updated successfully.")
-        else:
-            print("Module assignment not found for you.")
-            
-    except FileNotFoundError:
+    if not os.path.exists(TRAINER_MODULES_FILE):
+        print("Trainer modules file not found.")
+        return
+    
+    success, message = set_class_details(trainer_name, module, level, schedule=new_schedule)
+    print("Schedule updated successfully." if success else message)
+
+def update_capacity(trainer_name):
+    """Update capacity for coaching class"""
+    module = get_module_input("Enter module name: ")
+    level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
+                          validate_level,
+                          f"Level must be one of: {', '.join(LEVELS)}")
+    
+    new_capacity = get_user_input("Enter new capacity (leave blank for unlimited): ",
+                                 validate_capacity,
+                                 "Capacity must be a positive whole number.")
+    
+    if not os.path.exists(TRAINER_MODULES_FILE):
         print("Trainer modules file not found.")
+        return
+    
+    success, message = set_class_details(trainer_name, module, level, capacity=new_capacity)
+    print("Capacity updated successfully." if success else message)
 
 def delete_coaching_info(trainer_name):
     """Delete coaching class information"""
     print("\n=== Delete Coaching Class ===")
     
-    module = input("Enter module name to delete: ").strip()
+    module = get_module_input("Enter module name to delete: ")
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
@@ -711,53 +5675,36 @@ def delete_coaching_info(trainer_name):
     confirm = input(f"Are you sure you want to delete {module} ({level})? (y/n): ").strip().lower()
     
     if confirm == 'y':
-        try:
-            with open(TRAINER_MODULES_FILE, "r") as f:
-                data = f.readlines()
-            
-            original_count = len(data)
-            filtered_data = []
-            
-            for line in data:
-                fields = line.strip().split(",")
-                if not (len(fields) >= 3 and fields[1] == trainer_name and fields[0] == module and fields[2] == level):
-                    filtered_data.append(line)
-            
-            if len(filtered_data) < original_count:
-                with open(TRAINER_MODULES_FILE, "w") as f:
-                    f.writelines(filtered_data)
-                print("Coaching class deleted successfully.")
-            else:
-                print("Coaching class not found for you.")
-                
-        except FileNotFoundError:
+        if not os.path.exists(TRAINER_MODULES_FILE):
             print("Trainer modules file not found.")
+            return
+        
+        success, message = remove_class(trainer_name, module, level)
+        print(message)
     else:
         print("Deletion cancelled.")
 
-def view_enrolled_students(trainer_name):
-    """View students enrolled and paid for trainer's modules"""
+def view_enrolled_students(trainer_name, month=None):
+    """View students enrolled and paid for trainer's modules, optionally for one month"""
     print(f"\n=== Students Enrolled for {trainer_name} ===")
     
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            found = False
-            print("Paid Students:")
-            print("-" * 80)
-            print(f"{'Name':<15} {'TP Number':<10} {'Module':<15} {'Level':<12} {'Charges':<10} {'Status'}")
-            print("-" * 80)
-            
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 10 and fields[4] == trainer_name and fields[9] == "paid":
-                    print(f"{fields[0]:<15} {fields[1]:<10} {fields[2]:<15} {fields[3]:<12} RM{fields[8]:<8} {fields[9]}")
-                    found = True
-            
-            if not found:
-                print("No paid students found for your modules.")
-                
-    except FileNotFoundError:
+    if not os.path.exists(STUDENTS_FILE):
         print("Students file not found.")
+        return
+    
+    found = False
+    print(f"Paid Students ({partition_key(month) if month else 'all months'}):")
+    print("-" * 80)
+    print(f"{'Name':<15} {'TP Number':<10} {'Module':<15} {'Level':<12} {'Charges':<10} {'Status'}")
+    print("-" * 80)
+    
+    for fields in find_enrollments(4, trainer_name, months=[month] if month else None, min_fields=10):
+        if fields[9] == "paid":
+            print(f"{fields[0]:<15} {fields[1]:<10} {fields[2]:<15} {fields[3]:<12} RM{fields[8]:<8} {fields[9]}")
+            found = True
+    
+    if not found:
+        print("No paid students found for your modules.")
 
 def send_feedback(trainer_name):
     """Send feedback to administrator"""
@@ -767,12 +5714,8 @@ def send_feedback(trainer_name):
                             lambda x: len(x) >= 5,
                             "Feedback must be at least 5 characters long.")
     
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    with open(FEEDBACK_FILE, "a") as f:
-        f.write(f"[{timestamp}] {trainer_name}: {feedback}\n")
-    
-    print("Feedback sent successfully.")
+    success, message = add_feedback(trainer_name, feedback)
+    print(message)
 
 # ============= LECTURER FUNCTIONS =============
 # ONLY functions that lecturers can perform according to assignment
@@ -786,13 +5729,16 @@ def lecturer_menu(lecturer_name):
         print("2. Update subject enrollment of student")
         print("3. Approve requests from students")
         print("4. Delete students")
-        print("5. Update own profile")
-        print("6. Logout")
-        print("7. Exit")
+        print("5. View class waitlist")
+        print("6. Update student contact details")
+        print("7. Update own profile")
+        print("8. Mark student's class as completed")
+        print("9. Logout")
+        print("10. Exit")
         
-        choice = get_user_input("Enter your choice (1-7): ",
-                               lambda x: x in ['1','2','3','4','5','6','7'],
-                               "Invalid choice. Please enter 1-7.")
+        choice = get_user_input("Enter your choice (1-10): ",
+                               lambda x: x in ['1','2','3','4','5','6','7','8','9','10'],
+                               "Invalid choice. Please enter 1-10.")
         
         if choice == "1":
             lecturer_register_student()
@@ -803,38 +5749,48 @@ def lecturer_menu(lecturer_name):
         elif choice == "4":
             delete_student()
         elif choice == "5":
-            update_profile(lecturer_name)
+            view_class_waitlist()
         elif choice == "6":
-            return
+            update_student_contact()
         elif choice == "7":
+            update_profile(lecturer_name)
+        elif choice == "8":
+            complete_student_class()
+        elif choice == "9":
+            return
+        elif choice == "10":
             sys.exit()
 
 def lecturer_register_student():
     """Lecturer registers student to module"""
     print("\n=== Register Student to Module (Lecturer Only) ===")
     
-    student_name = get_user_input("Enter student name: ",
-                                 lambda x: len(x) >= 2,
-                                 "Student name must be at least 2 characters.")
-    
     tp_number = get_user_input("Enter TP number (format: TPxxxxxx): ",
-                              lambda x: x.startswith("TP") and len(x) >= 8,
+                              validate_tp_number,
                               "TP number must start with 'TP' and be at least 8 characters.")
     
-    email = get_user_input("Enter student email: ",
-                          validate_email,
-                          "Please enter a valid email address.")
-    
-    contact = get_user_input("Enter contact number: ",
-                           lambda x: x.isdigit() and len(x) >= 10,
-                           "Contact number must be at least 10 digits.")
+    # A returning student's details come from their profile
+    profile = student_profile(tp_number)
+    if profile:
+        student_name, email, contact, address = profile
+        print(f"Existing student: {student_name} ({email}, {contact})")
+    else:
+        student_name = get_user_input("Enter student name: ",
+                                     lambda x: len(x) >= 2,
+                                     "Student name must be at least 2 characters.")
+        
+        email = get_user_input("Enter student email: ",
+                              validate_email,
+                              "Please enter a valid email address.")
+        
+        contact = get_user_input("Enter contact number: ",
+                               validate_contact,
+                               "Contact number must be at least 10 digits.")
     
     # Display available modules and trainers
     display_available_modules()
     
-    module_name = get_user_input("Enter module name: ",
-                                lambda x: len(x) >= 2,
-                                "Module name must be at least 2 characters.")
+    module_name = get_module_input("Enter module name: ")
     
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
@@ -846,7 +5802,8 @@ def lecturer_register_student():
         print("No trainer found for this module/level combination.")
         return
     
-    address = input("Enter student address: ").strip()
+    if not profile:
+        address = input("Enter student address: ").strip()
     
     month_of_enrollment = get_user_input("Enter month of enrollment (e.g., January): ",
                                         lambda x: len(x) >= 3,
@@ -855,73 +5812,64 @@ def lecturer_register_student():
     charges = get_charges_for_module(module_name, level, trainer_name)
     if not charges:
         charges = get_user_input("Enter charges (RM): ",
-                               lambda x: x.replace('.', '').isdigit(),
+                               validate_charges,
                                "Please enter a valid amount.")
     
-    student_id = generate_student_id()
-    status = "unpaid"
+    tier = DEFAULT_WAITLIST_TIER
+    if not class_has_seat(trainer_name, module_name, level):
+        print("This class is full. The student will be placed on its waitlist.")
+        tier = get_user_input(f"Enter waitlist priority tier (1=highest, 3=lowest) [{DEFAULT_WAITLIST_TIER}]: ",
+                             lambda x: x == "" or x in WAITLIST_TIERS,
+                             "Please enter 1, 2 or 3.") or DEFAULT_WAITLIST_TIER
     
-    # Check if student already enrolled in this module
-    if is_student_already_enrolled(tp_number, module_name, level):
-        print("Student is already enrolled in this module and level.")
+    success, result = enroll_student(student_name, tp_number, module_name, level, trainer_name,
+                                     email, contact, month_of_enrollment, charges, address, tier)
+    if not success:
+        print(result)
         return
     
-    with open(STUDENTS_FILE, "a") as f:
-        f.write(f"{student_name},{tp_number},{module_name},{level},{trainer_name},{email},{contact},{month_of_enrollment},{charges},{status},{student_id},{address}\n")
-    
     print("Student registered successfully by lecturer.")
-    print(f"Student ID: {student_id}")
+    print(f"Student ID: {result}")
 
 def display_available_modules():
     """Display available modules and trainers"""
     print("\nAvailable modules:")
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            modules = set()
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 3:
-                    modules.add(f"{fields[0]} ({fields[2]}) - Trainer: {fields[1]}")
-            
-            for module in sorted(modules):
-                print(f"- {module}")
-    except FileNotFoundError:
+    listing = load_catalog()["listing"]
+    if not listing:
         print("No modules available.")
+    for module in listing:
+        print(f"- {module}")
+
+def get_module_input(prompt):
+    """Ask for an offered module name in any capitalisation, suggesting close matches"""
+    while True:
+        module_name = get_user_input(prompt,
+                                    lambda x: len(x) >= 2,
+                                    "Module name must be at least 2 characters.")
+        module = resolve_module(module_name)
+        if module:
+            return module
+        suggestions = suggest_modules(module_name)
+        if suggestions:
+            print(f"Module not found. Did you mean: {', '.join(suggestions)}?")
+        else:
+            print("Module not found. Please enter one of the available modules.")
 
 def get_trainer_for_module(module_name, level):
     """Get trainer assigned to specific module and level"""
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 3 and fields[0] == module_name and fields[2] == level:
-                    return fields[1]
-    except FileNotFoundError:
-        pass
-    return None
+    entries = find_classes(module_name, level)
+    return entries[0]["trainer"] if entries else None
 
 def get_charges_for_module(module_name, level, trainer_name):
     """Get charges for specific module, level, and trainer"""
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 4 and fields[0] == module_name and fields[1] == trainer_name and fields[2] == level:
-                    return fields[3]
-    except FileNotFoundError:
-        pass
-    return None
+    entry = find_class(trainer_name, module_name, level)
+    return entry["charges"] if entry else None
 
 def is_student_already_enrolled(tp_number, module_name, level):
     """Check if student is already enrolled in module"""
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 4 and fields[1] == tp_number and fields[2] == module_name and fields[3] == level:
-                    return True
-    except FileNotFoundError:
-        pass
+    for fields in find_enrollments(1, tp_number, min_fields=4):
+        if fields[2] == module_name and fields[3] == level:
+            return True
     return False
 
 def update_student_enrollment():
@@ -929,13 +5877,14 @@ def update_student_enrollment():
     print("\n=== Update Student Enrollment ===")
     
     tp_number = get_user_input("Enter student TP number: ",
-                              lambda x: x.startswith("TP") and len(x) >= 8,
+                              validate_tp_number,
                               "TP number must start with 'TP' and be at least 8 characters.")
     
     # Display current enrollments for student
     display_student_enrollments(tp_number)
     
     current_module = input("Enter current module name: ").strip()
+    current_module = resolve_module(current_module) or current_module
     current_level = get_user_input("Enter current level (Beginner/Intermediate/Advanced): ",
                                   validate_level,
                                   f"Level must be one of: {', '.join(LEVELS)}")
@@ -943,63 +5892,95 @@ def update_student_enrollment():
     # Display available modules
     display_available_modules()
     
-    new_module = input("Enter new module name: ").strip()
+    new_module = get_module_input("Enter new module name: ")
     new_level = get_user_input("Enter new level (Beginner/Intermediate/Advanced): ",
                               validate_level,
                               f"Level must be one of: {', '.join(LEVELS)}")
     
-    new_trainer = get_trainer_for_module(new_module, new_level)
-    if not new_trainer:
-        print("No trainer found for this module/level combination.")
+    if not os.path.exists(STUDENTS_FILE):
+        print("Students file not found.")
         return
     
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            data = f.readlines()
-        
-        updated = False
-        for i, line in enumerate(data):
-            fields = line.strip().split(",")
-            if len(fields) >= 4 and fields[1] == tp_number and fields[2] == current_module and fields[3] == current_level:
-                fields[2] = new_module
-                fields[3] = new_level
-                fields[4] = new_trainer
-                
-                # Update charges if available
-                new_charges = get_charges_for_module(new_module, new_level, new_trainer)
-                if new_charges and len(fields) >= 9:
-                    fields[8] = new_charges
-                
-                data[i] = ",".join(fields) + "\n"
-                updated = True
-                break
-        
-        if updated:
-            with open(STUDENTS_FILE, "w") as f:
-                f.writelines(data)
-            print("Student enrollment updated successfully.")
-        else:
-            print("Student enrollment record not found.")
-            
-    except FileNotFoundError:
-        print("Students file not found.")
+    success, message = change_enrollment(tp_number, current_module, current_level, new_module, new_level)
+    print(message)
 
 def display_student_enrollments(tp_number):
     """Display current enrollments for a student"""
-    print(f"\nCurrent enrollments for {tp_number}:")
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            found = False
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 4 and fields[1] == tp_number:
-                    print(f"- {fields[2]} ({fields[3]}) - Trainer: {fields[4] if len(fields) > 4 else 'TBD'}")
-                    found = True
-            
-            if not found:
-                print("No enrollments found for this student.")
-    except FileNotFoundError:
+    profile = student_profile(tp_number)
+    if profile:
+        print(f"\nCurrent enrollments for {tp_number} - {profile[0]} ({profile[1]}, {profile[2]}):")
+    else:
+        print(f"\nCurrent enrollments for {tp_number}:")
+    if not os.path.exists(STUDENTS_FILE):
         print("Students file not found.")
+        return
+    
+    found = False
+    for fields in find_enrollments(1, tp_number, min_fields=4):
+        if fields[1] == tp_number:
+            print(f"- {fields[2]} ({fields[3]}) - Trainer: {fields[4] if len(fields) > 4 else 'TBD'}")
+            found = True
+    
+    if not found:
+        print("No enrollments found for this student.")
+
+def update_student_contact():
+    """Update a student's email, contact number and address"""
+    print("\n=== Update Student Contact Details ===")
+    
+    tp_number = get_user_input("Enter student TP number: ",
+                              validate_tp_number,
+                              "TP number must start with 'TP' and be at least 8 characters.")
+    
+    profile = student_profile(tp_number)
+    if not profile:
+        print("Student not found.")
+        return
+    
+    print(f"Student: {profile[0]}")
+    print(f"Email: {profile[1]}")
+    print(f"Contact: {profile[2]}")
+    print(f"Address: {profile[3]}")
+    
+    new_email = input("Enter new email (leave blank to keep current): ").strip()
+    if new_email and not validate_email(new_email):
+        print("Invalid email format. Email not updated.")
+        new_email = ""
+    
+    new_contact = input("Enter new contact number (leave blank to keep current): ").strip()
+    if new_contact and not validate_contact(new_contact):
+        print("Contact number must be at least 10 digits. Contact not updated.")
+        new_contact = ""
+    
+    new_address = input("Enter new address (leave blank to keep current): ").strip()
+    
+    success, message = update_student_profile(tp_number, new_email or None, new_contact or None, new_address or None)
+    print(message)
+
+def complete_student_class():
+    """Mark a student's class as completed so it is no longer billed"""
+    print("\n=== Mark Class as Completed ===")
+    
+    tp_number = get_user_input("Enter student TP number: ",
+                              validate_tp_number,
+                              "TP number must start with 'TP' and be at least 8 characters.")
+    
+    classes = [(fields[2], fields[3]) for fields in find_enrollments(1, tp_number, min_fields=4)
+               if fields[1] == tp_number]
+    if not classes:
+        print("Student not found.")
+        return
+    
+    classes = list(dict.fromkeys(classes))
+    for i, (module, level) in enumerate(classes, 1):
+        print(f"{i}. {module} ({level})")
+    choice = get_user_input("Enter class number, or 'all' for every class: ",
+                           lambda x: x == "all" or (x.isdigit() and 1 <= int(x) <= len(classes)),
+                           "Please enter a listed class number or 'all'.")
+    
+    module, level = (None, None) if choice == "all" else classes[int(choice) - 1]
+    success, message = mark_completed(tp_number, module, level)
+    print(message)
 
 def approve_student_requests():
     """Approve or reject student requests"""
@@ -1038,19 +6019,8 @@ def approve_student_requests():
                                    lambda x: x in ['1', '2'],
                                    "Please enter 1 for Approve or 2 for Reject.")
             
-            if action == '1':
-                fields[3] = "approved"
-                # Add student to enrollment if approved
-                add_approved_student_to_enrollment(fields[0], fields[1], fields[2])
-                print("Request approved and student enrolled.")
-            else:
-                fields[3] = "rejected"
-                print("Request rejected.")
-            
-            requests[request_num - 1] = ",".join(fields) + "\n"
-            
-            with open(REQUESTS_FILE, "w") as f:
-                f.writelines(requests)
+            success, message = process_request(request_num, action == '1')
+            print(message)
                 
         else:
             print("Invalid request number.")
@@ -1058,15 +6028,56 @@ def approve_student_requests():
     except ValueError:
         print("Please enter a valid number.")
 
-def add_approved_student_to_enrollment(student_name, module_name, level):
-    """Add approved student to enrollment"""
+def view_class_waitlist():
+    """Show the seats and waitlist of a class"""
+    print("\n=== Class Waitlist ===")
+    display_available_modules()
+    
+    module_name = get_module_input("Enter module name: ")
+    level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
+                          validate_level,
+                          f"Level must be one of: {', '.join(LEVELS)}")
+    
     trainer_name = get_trainer_for_module(module_name, level)
-    charges = get_charges_for_module(module_name, level, trainer_name) or "0"
+    if not trainer_name:
+        print("No trainer found for this module/level combination.")
+        return
+    
+    capacity = class_capacity(trainer_name, module_name, level)
+    print(f"\nSeats taken: {class_occupancy(trainer_name, module_name, level)}"
+          f"/{capacity if capacity else 'unlimited'}")
     
-    student_id = generate_student_id()
+    entries = get_waitlist(trainer_name, module_name, level)
+    if not entries:
+        print("Nobody is waiting for this class.")
+        return
     
-    with open(STUDENTS_FILE, "a") as f:
-        f.write(f"{student_name},TBD,{module_name},{level},{trainer_name},TBD,TBD,TBD,{charges},unpaid,{student_id},TBD\n")
+    print("Waitlist (in promotion order):")
+    for position, fields in enumerate(entries, 1):
+        print(f"{position}. {fields[7]} ({fields[8]}) - Tier {fields[1]} - Waiting since {fields[2]} - via {fields[3]}")
+
+def add_approved_student_to_enrollment(student_name, module_name, level, request_timestamp=""):
+    """Add approved student to enrollment; returns False if they were waitlisted instead"""
+    with transaction():
+        trainer_name = get_trainer_for_module(module_name, level)
+        if trainer_name is None:
+            raise ValueError(f"No class for {module_name} ({level})")
+        if not class_has_seat(trainer_name, module_name, level):
+            timestamp = request_timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            add_to_waitlist("request", DEFAULT_WAITLIST_TIER, timestamp, trainer_name, module_name, level,
+                            student_name, "TBD", "TBD", "TBD", "TBD", "TBD")
+            return False
+        
+        charges = get_charges_for_module(module_name, level, trainer_name) or "0"
+        
+        # Allocated in the same transaction as the row, so a failed enrollment burns no ID
+        student_id = generate_student_id()
+        
+        row = [student_name, "TBD", module_name, level, trainer_name, "TBD", "TBD", "TBD",
+               charges, "unpaid", student_id, "TBD"]
+        append_enrollment(row)
+        emit_event("student_enrolled", row=row)
+    return True
 
 def delete_student():
     """Delete completed students"""
@@ -1076,18 +6087,14 @@ def delete_student():
                               lambda x: len(x) >= 6,
                               "TP number must be at least 6 characters.")
     
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            students = f.readlines()
-    except FileNotFoundError:
+    if not os.path.exists(STUDENTS_FILE):
         print("Students file not found.")
         return
     
     # Find and display student info
     student_found = False
-    for line in students:
-        fields = line.strip().split(",")
-        if len(fields) >= 2 and fields[1] == tp_number:
+    for fields in find_enrollments(1, tp_number, min_fields=2):
+        if fields[1] == tp_number:
             print(f"\nStudent found: {fields[0]} ({fields[1]})")
             print(f"Modules: {fields[2] if len(fields) > 2 else 'N/A'}")
             student_found = True
@@ -1100,16 +6107,8 @@ def delete_student():
     confirm = input("Are you sure you want to delete this student? (y/n): ").strip().lower()
     
     if confirm == 'y':
-        filtered_students = []
-        for line in students:
-            fields = line.strip().split(",")
-            if not (len(fields) >= 2 and fields[1] == tp_number):
-                filtered_students.append(line)
-        
-        with open(STUDENTS_FILE, "w") as f:
-            f.writelines(filtered_students)
-        
-        print("Student deleted successfully.")
+        success, message = remove_student(tp_number)
+        print(message)
     else:
         print("Deletion cancelled.")
 
@@ -1152,42 +6151,35 @@ def view_student_schedule(student_name):
     """View student's coaching class schedule"""
     print(f"\n=== Class Schedule for {student_name} ===")
     
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            found = False
-            print("-" * 80)
-            print(f"{'Module':<15} {'Level':<12} {'Trainer':<15} {'Schedule':<20} {'Status'}")
-            print("-" * 80)
+    if not os.path.exists(STUDENTS_FILE):
+        print("Students file not found.")
+        return
+    
+    found = False
+    print("-" * 80)
+    print(f"{'Module':<15} {'Level':<12} {'Trainer':<15} {'Schedule':<20} {'Status'}")
+    print("-" * 80)
+    
+    for fields in find_enrollments(0, student_name, min_fields=10):
+        if fields[9] == "paid":
+            module_name = fields[2]
+            level = fields[3]
+            trainer_name = fields[4]
             
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 10 and fields[0] == student_name and fields[9] == "paid":
-                    module_name = fields[2]
-                    level = fields[3]
-                    trainer_name = fields[4]
-                    
-                    # Get schedule from trainer modules
-                    schedule = get_schedule_for_module(module_name, level, trainer_name)
-                    
-                    print(f"{module_name:<15} {level:<12} {trainer_name:<15} {schedule:<20} {fields[9]}")
-                    found = True
+            # Get schedule from trainer modules
+            schedule = get_schedule_for_module(module_name, level, trainer_name)
             
-            if not found:
-                print("No paid coaching classes found. Please make payment to view schedules.")
-                
-    except FileNotFoundError:
-        print("Students file not found.")
+            print(f"{module_name:<15} {level:<12} {trainer_name:<15} {schedule:<20} {fields[9]}")
+            found = True
+    
+    if not found:
+        print("No paid coaching classes found. Please make payment to view schedules.")
 
 def get_schedule_for_module(module_name, level, trainer_name):
     """Get schedule for specific module"""
-    try:
-        with open(TRAINER_MODULES_FILE, "r") as f:
-            for line in f:
-                fields = line.strip().split(",")
-                if len(fields) >= 5 and fields[0] == module_name and fields[1] == trainer_name and fields[2] == level:
-                    return fields[4] if fields[4] != "TBD" else "Schedule TBD"
-    except FileNotFoundError:
-        pass
+    entry = find_class(trainer_name, module_name, level)
+    if entry and entry["schedule"] and entry["schedule"] != "TBD":
+        return entry["schedule"]
     return "Schedule TBD"
 
 def send_enrollment_request(student_name):
@@ -1197,26 +6189,21 @@ def send_enrollment_request(student_name):
     # Display available modules
     display_available_modules()
     
-    module = get_user_input("Enter module name for additional coaching: ",
-                           lambda x: len(x) >= 2,
-                           "Module name must be at least 2 characters.")
+    recommendations = recommend_modules(student_name)
+    if recommendations:
+        print("\nRecommended for you:")
+        for module, level, score in recommendations:
+            reason = "often taken together with your classes" if score else "popular with other students"
+            print(f"- {module} ({level}) - {reason}")
+    
+    module = get_module_input("Enter module name for additional coaching: ")
     
     level = get_user_input("Enter level (Beginner/Intermediate/Advanced): ",
                           validate_level,
                           f"Level must be one of: {', '.join(LEVELS)}")
     
-    # Check if request already exists
-    if is_request_already_sent(student_name, module, level):
-        print("You have already sent a request for this module and level.")
-        return
-    
-    status = "pending"
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    with open(REQUESTS_FILE, "a") as f:
-        f.write(f"{student_name},{module},{level},{status},{timestamp}\n")
-    
-    print("Enrollment request sent successfully.")
+    success, message = add_enrollment_request(student_name, module, level)
+    print(message)
 
 def is_request_already_sent(student_name, module, level):
     """Check if request already exists"""
@@ -1224,7 +6211,7 @@ def is_request_already_sent(student_name, module, level):
         with open(REQUESTS_FILE, "r") as f:
             for line in f:
                 fields = line.strip().split(",")
-                if len(fields) >= 4 and fields[0] == student_name and fields[1] == module and fields[2] == level and fields[3] == "pending":
+                if len(fields) >= 4 and fields[0] == student_name and fields[1] == module and fields[2] == level and fields[3] in ("pending", "waitlisted"):
                     return True
     except FileNotFoundError:
         pass
@@ -1261,16 +6248,8 @@ def delete_pending_request(student_name):
         if request_num == 0:
             return
         
-        if 1 <= request_num <= len(student_requests):
-            original_index = student_requests[request_num - 1][0]
-            requests.pop(original_index)
-            
-            with open(REQUESTS_FILE, "w") as f:
-                f.writelines(requests)
-            
-            print("Request deleted successfully.")
-        else:
-            print("Invalid request number.")
+        success, message = remove_pending_request(student_name, request_num)
+        print(message)
             
     except ValueError:
         print("Please enter a valid number.")
@@ -1279,29 +6258,26 @@ def view_invoice_and_pay(student_name):
     """View invoice and make payment"""
     print(f"\n=== Invoice for {student_name} ===")
     
-    try:
-        with open(STUDENTS_FILE, "r") as f:
-            data = f.readlines()
-    except FileNotFoundError:
+    if not os.path.exists(STUDENTS_FILE):
         print("Students file not found.")
         return
     
-    total_charges = 0.0
-    unpaid_modules = []
+    month = input("Enter month to invoice (leave blank for all months): ").strip()
+    rows, total_charges = get_student_invoice(student_name, month or None)
+    
+    for tp_number in dict.fromkeys(row["tp_number"] for row in rows):
+        profile = student_profile(tp_number)
+        if profile:
+            print(f"Billed to: {profile[0]} ({tp_number}), {profile[1]}, {profile[2]}")
+            if profile[3]:
+                print(f"Address: {profile[3]}")
     
     print("-" * 70)
     print(f"{'Module':<15} {'Level':<12} {'Trainer':<15} {'Charges':<10} {'Status'}")
     print("-" * 70)
     
-    for i, line in enumerate(data):
-        fields = line.strip().split(",")
-        if len(fields) >= 10 and fields[0] == student_name:
-            charges = float(fields[8]) if fields[8].replace('.', '').isdigit() else 0.0
-            print(f"{fields[2]:<15} {fields[3]:<12} {fields[4]:<15} RM{charges:<8.2f} {fields[9]}")
-            
-            if fields[9] == "unpaid":
-                total_charges += charges
-                unpaid_modules.append(i)
+    for row in rows:
+        print(f"{row['module']:<15} {row['level']:<12} {row['trainer']:<15} RM{row['charges']:<8.2f} {row['status']}")
     
     if total_charges == 0:
         print("\nNo outstanding payments.")
@@ -1324,14 +6300,7 @@ def view_invoice_and_pay(student_name):
         
         if confirm_payment == 'y':
             # Update payment status
-            for index in unpaid_modules:
-                fields = data[index].strip().split(",")
-                if len(fields) >= 10:
-                    fields[9] = "paid"
-                    data[index] = ",".join(fields) + "\n"
-            
-            with open(STUDENTS_FILE, "w") as f:
-                f.writelines(data)
+            pay_outstanding(student_name, month or None)
             
             print("Payment successful! Thank you.")
             print("You can now view your class schedules.")
@@ -1342,5 +6311,203 @@ def view_invoice_and_pay(student_name):
 
 # ============= MAIN FUNCTION =============
 
+def run_command(argv):
+    """Run a non-interactive maintenance command, e.g. from a scheduled job"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="programming_management_system.py",
+                                     description="APU Programming Café maintenance commands "
+                                                 "(run without arguments for the interactive menu)")
+    parser.add_argument("--campus", help="work on this campus shard")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate-partitions", help="split zstudents.txt into monthly partitions")
+    commands.add_parser("merge-partitions", help="merge monthly partitions back into zstudents.txt")
+    commands.add_parser("migrate-profiles", help="move student details from the enrollments into zprofiles.txt")
+    commands.add_parser("inline-profiles", help="copy student details back onto the enrollments")
+    commands.add_parser("pad-status-columns", help="store status columns fixed-width so changes are written in place")
+    commands.add_parser("unpad-status-columns", help="remove the status column padding")
+    archive = commands.add_parser("archive", help="move old decided requests and feedback into compressed segments")
+    archive.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive rows older than this")
+    archive.add_argument("--codec", choices=list(ARCHIVE_CODECS), default=ARCHIVE_CODEC, help="segment compression")
+    archive.add_argument("--list", action="store_true", help="only list the archive segments")
+    verify = commands.add_parser("verify-aggregates", help="recompute income aggregates and diff them")
+    verify.add_argument("--rebuild", action="store_true", help="replace the aggregates if they differ")
+    export = commands.add_parser("export", help="stream tables to CSV, JSONL or columnar files")
+    export.add_argument("--table", choices=["all"] + list(TABLE_SCHEMAS), default="all")
+    export.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    export.add_argument("--output-dir", default=os.path.join(DATA_DIR, "exports"))
+    export.add_argument("--gzip", action="store_true", help="gzip-compress the output files")
+    import_parser = commands.add_parser("import", help="stream an exported file into a table")
+    import_parser.add_argument("--table", choices=list(TABLE_SCHEMAS), required=True)
+    import_parser.add_argument("--input", required=True, help="file to import (.gz is decompressed)")
+    import_parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="defaults to the file extension")
+    import_parser.add_argument("--append", action="store_true", help="append instead of replacing the table")
+    users = commands.add_parser("import-users", help="bulk register users from a CSV file")
+    users.add_argument("--input", required=True, help="CSV with username,email,password,role columns")
+    users.add_argument("--rejects", help="write rejected rows and reasons to this CSV")
+    recommendations = commands.add_parser("build-recommendations",
+                                          help="rebuild the module recommendation model if enrollments changed")
+    recommendations.add_argument("--force", action="store_true", help="rebuild even if it is up to date")
+    report = commands.add_parser("report", help="run a full-scan report on all cores")
+    report.add_argument("name", choices=["income", "outstanding", "enrollments", "aging", "workload"])
+    report.add_argument("--month", help="limit the report to one month of enrollment")
+    report.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    report.add_argument("--as-of", help="aging: month to age unpaid enrollments against (default: this month)")
+    report.add_argument("--top", type=int, default=AGING_TOP_DEBTORS, help="aging: number of top debtors")
+    report.add_argument("--csv", help="aging: also write the report to this CSV file")
+    report.add_argument("--archived", action="store_true", help="include the archived enrollments of deleted students")
+    trends = commands.add_parser("trends", help="show enrollment request trends with rolling averages")
+    trends.add_argument("--by", choices=TREND_GRANULARITIES, default="day", help="bucket size")
+    trends.add_argument("--module", help="only this module")
+    trends.add_argument("--level", choices=LEVELS, help="only this level")
+    trends.add_argument("--window", type=int, default=TREND_WINDOW, help="buckets in the rolling average")
+    campuses = commands.add_parser("campus", help="list or add campuses, or run a cross-campus report")
+    campuses.add_argument("action", choices=["list", "add", "income", "enrollments", "feedback"])
+    campuses.add_argument("name", nargs="?", help="add: the new campus")
+    campuses.add_argument("--month", help="limit the report to one month of enrollment")
+    for kind in ("trainer", "module"):
+        move = commands.add_parser(f"move-{kind}", help=f"move a {kind} and its classes to another campus")
+        move.add_argument("name")
+        move.add_argument("--from", dest="source", required=True, help="campus to move from")
+        move.add_argument("--to", dest="target", required=True, help="campus to move to")
+    billing = commands.add_parser("billing-cycle", help="bill continuing students for the next month")
+    billing.add_argument("--from", dest="source", help="month whose students are billed (default: this month)")
+    billing.add_argument("--to", dest="month", help="month to bill (default: the month after --from)")
+    notify_parser = commands.add_parser("notify", help="show or deliver the notification outbox")
+    mode = notify_parser.add_mutually_exclusive_group()
+    mode.add_argument("--drain", action="store_true", help="deliver every queued notification, then exit")
+    mode.add_argument("--worker", action="store_true", help="keep delivering in the foreground")
+    notify_parser.add_argument("--interval", type=float, default=NOTIFY_INTERVAL_SECONDS,
+                               help="worker: seconds between batches")
+    commands.add_parser("dashboard", help="show the live admin dashboard")
+    fsck = commands.add_parser("fsck", help="check all data files for malformed rows, orphans and duplicates")
+    fsck.add_argument("--repair", action="store_true", help="apply the safe bulk repairs")
+    fsck.add_argument("--output", help="write the JSON report here (default: print it)")
+    fsck.add_argument("--workers", type=int, help="worker processes (default: one per file)")
+    events = commands.add_parser("events", help="print logged events as JSON lines")
+    events.add_argument("--after", type=int, default=0, help="only events after this seq")
+    events.add_argument("--type", help="only events of this type")
+    replay = commands.add_parser("replay-events", help="rebuild the data files by replaying the event log")
+    target = replay.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output-dir", help="write the rebuilt files here")
+    target.add_argument("--in-place", action="store_true", help="overwrite the live data files")
+    replay.add_argument("--up-to", type=int, help="stop after this seq")
+    args = parser.parse_args(argv)
+    if args.campus:
+        if args.campus not in list_campuses():
+            print(f"Unknown campus: {args.campus}")
+            return 1
+        use_campus(args.campus)
+    else:
+        use_environment_campus()
+    
+    create_files_if_not_exist()
+    if args.command == "migrate-partitions":
+        success, message = migrate_to_partitions()
+    elif args.command == "merge-partitions":
+        success, message = merge_partitions()
+    elif args.command == "migrate-profiles":
+        success, message = migrate_to_profiles()
+    elif args.command == "inline-profiles":
+        success, message = inline_profiles()
+    elif args.command == "pad-status-columns":
+        success, message = pad_status_columns()
+    elif args.command == "unpad-status-columns":
+        success, message = unpad_status_columns()
+    elif args.command == "archive" and args.list:
+        print_archive_summary()
+        return 0
+    elif args.command == "archive":
+        success, message = archive_history(args.days, args.codec)
+    elif args.command == "verify-aggregates":
+        return 0 if run_aggregate_verification(args.rebuild) else 1
+    elif args.command == "export":
+        tables = list(TABLE_SCHEMAS) if args.table == "all" else [args.table]
+        run_export(tables, args.format, args.output_dir, args.gzip)
+        return 0
+    elif args.command == "import":
+        return 0 if run_import(args.table, args.input, args.format, args.append) else 1
+    elif args.command == "import-users":
+        success, message = bulk_add_users(args.input, args.rejects)
+    elif args.command == "build-recommendations":
+        success, message = rebuild_recommendations(args.force)
+    elif args.command == "report" and args.name == "aging":
+        if args.as_of and partition_key(args.as_of) not in MONTHS:
+            print("--as-of must be a month name, e.g. March.")
+            return 1
+        print_aging_report([args.month] if args.month else None, args.workers, args.as_of, args.top, args.csv,
+                           args.archived)
+        return 0
+    elif args.command == "report" and args.name == "workload":
+        print_workload_report([args.month] if args.month else None)
+        return 0
+    elif args.command == "report":
+        months = [args.month] if args.month else None
+        {"income": print_income_report, "outstanding": print_outstanding_report,
+         "enrollments": print_enrollment_count_report}[args.name](months, args.workers, args.archived)
+        return 0
+    elif args.command == "trends":
+        print_request_trends(args.by, args.module, args.level, max(1, args.window))
+        return 0
+    elif args.command == "fsck":
+        report = run_fsck(args.repair, args.workers)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print_fsck_report(report)
+        else:
+            print(json.dumps(report, indent=2))
+        return 1 if report["errors"] and not args.repair else 0
+    elif args.command == "campus" and args.action == "add":
+        success, message = add_campus(args.name or "")
+    elif args.command == "campus":
+        months = [args.month] if args.month else None
+        if args.action == "list":
+            print("\n".join(list_campuses()) or "No campuses (single data directory).")
+        elif args.action == "income":
+            print_campus_income_report(months)
+        elif args.action == "enrollments":
+            print_campus_enrollment_report(months)
+        else:
+            print_campus_feedback()
+        return 0
+    elif args.command == "move-trainer":
+        success, message = move_trainer(args.name, args.source, args.target)
+    elif args.command == "move-module":
+        success, message = move_module(args.name, args.source, args.target)
+    elif args.command == "billing-cycle":
+        success, message = run_billing_cycle(args.source, args.month)
+    elif args.command == "notify" and args.worker:
+        try:
+            notification_worker(threading.Event(), args.interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+    elif args.command == "notify" and args.drain:
+        counts = drain_outbox()
+        if counts is None:
+            print("Another process is delivering notifications.")
+            return 1
+        print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+        return 1 if counts["failed"] else 0
+    elif args.command == "notify":
+        print_outbox_status()
+        return 0
+    elif args.command == "dashboard":
+        view_dashboard()
+        return 0
+    elif args.command == "events":
+        for event, _ in read_events(args.after):
+            if args.type is None or event["type"] == args.type:
+                print(json.dumps(event, ensure_ascii=False))
+        return 0
+    elif args.command == "replay-events":
+        success, message = run_event_replay(args.output_dir, args.up_to)
+    print(message)
+    return 0 if success else 1
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
+    use_environment_campus()
     main_menu()
\ No newline at end of file
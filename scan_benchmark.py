@@ -0,0 +1,157 @@
+"""
+Benchmark for the scan paths of the APU Programming Café Management System.
+
+Generates (or reuses) a large zstudents.txt-style file and times the same
+lookups two ways: the line-by-line path (iter_enrollments, which builds a str
+and a field list for every row) and the mmap path (find_enrollments, which only
+decodes rows that contain the searched value). With --workers it also times the
+parallel full-scan reports with 1, 2, 4 ... worker processes. With --profiles it
+compares storage size and scan times of inline student details against the
+normalized layout (zprofiles.txt plus slim enrollment rows); the file is
+migrated for the measurement and then restored.
+
+Usage: python scan_benchmark.py [--size-mb 2048] [--file path/to/zstudents.txt] [--keep]
+                                [--workers 8] [--profiles] [--per-student 4]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import programming_management_system as pms
+
+TRAINERS = ["john_trainer", "mary_trainer", "alex_trainer", "jenny_trainer"]
+MODULES = ["Python Programming", "Java Programming", "Web Development", "Database Systems",
+           "C++ Programming", "Data Structures"]
+
+def generate_file(file_path, size_mb, per_student=1):
+    """Write random enrollment rows until the file reaches size_mb; returns the row count.
+    Each student gets per_student consecutive rows."""
+    target = size_mb * 1024 * 1024
+    rows = 0
+    random.seed(42)
+    with open(file_path, 'w') as f:
+        while f.tell() < target:
+            batch = []
+            for _ in range(10000):
+                rows += 1
+                student = (rows - 1) // per_student + 1
+                # One row in a thousand belongs to a guest trainer's small class
+                trainer = "guest_trainer" if rows % 1000 == 0 else random.choice(TRAINERS)
+                batch.append(f"student{student},TP{student:08d},{random.choice(MODULES)},"
+                             f"{random.choice(pms.LEVELS)},{trainer},student{student}@apu.edu.my,"
+                             f"0123456789,{random.choice(pms.MONTHS)},150.00,"
+                             f"{random.choice(['paid', 'unpaid'])},STU{rows:07d},123 Main St KL\n")
+            f.write("".join(batch))
+    return rows
+
+def line_scan(column, value):
+    """The old path: split every row and compare"""
+    return sum(1 for fields in pms.iter_enrollments(min_fields=10) if fields[column] == value)
+
+def mmap_scan(column, value):
+    """The new path: find the value in the mapped bytes"""
+    return sum(1 for fields in pms.find_enrollments(column, value, min_fields=10))
+
+def full_scan():
+    """Read every row, joining slim rows to their profiles"""
+    return sum(1 for fields in pms.iter_enrollments(min_fields=10))
+
+def profile_comparison(file_path):
+    """Time the same scans with inline student details and with the profile table"""
+    if pms.profiles_enabled():
+        print("\nThe enrollments already use the profile table; skipping the profile comparison.")
+        return
+    queries = [("full scan", full_scan, ()),
+               ("student name", mmap_scan, (0, "student4321")),
+               ("TP number", mmap_scan, (1, "TP00004321")),
+               ("small trainer (0.1%)", mmap_scan, (4, "guest_trainer"))]
+    inline_size = os.path.getsize(file_path)
+    inline = [timed(func, *args) for label, func, args in queries]
+
+    success, message = pms.migrate_to_profiles()
+    print(f"\n{message}")
+    slim_size = os.path.getsize(file_path)
+    profiles_size = os.path.getsize(pms.PROFILES_FILE)
+    normalized = [timed(func, *args) for label, func, args in queries]
+    pms.inline_profiles()
+
+    mb = 1024 * 1024
+    print(f"\n{'Storage':<26} {'Inline':>11} {'Normalized':>11}")
+    print(f"{'enrollments':<26} {inline_size / mb:>9.1f}MB {slim_size / mb:>9.1f}MB")
+    print(f"{'profiles':<26} {'-':>11} {profiles_size / mb:>9.1f}MB")
+    print(f"{'total':<26} {inline_size / mb:>9.1f}MB {(slim_size + profiles_size) / mb:>9.1f}MB")
+    print(f"\n{'Lookup':<26} {'Rows':>6} {'Inline':>11} {'Normalized':>11}")
+    for (label, func, args), (expected, inline_seconds), (found, seconds) in zip(queries, inline, normalized):
+        if found != expected:
+            print(f"{label}: MISMATCH inline found {expected}, normalized found {found}")
+            continue
+        print(f"{label:<26} {found:>6} {inline_seconds:>10.2f}s {seconds:>10.2f}s")
+
+def timed(func, *args):
+    """Return (result, seconds)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    """Parse arguments, prepare the data file and print the timings"""
+    parser = argparse.ArgumentParser(description="Compare line-by-line and mmap enrollment scans")
+    parser.add_argument("--size-mb", type=int, default=2048, help="size of the generated file")
+    parser.add_argument("--file", help="existing enrollments file to scan instead of generating one")
+    parser.add_argument("--keep", action="store_true", help="keep the generated file")
+    parser.add_argument("--workers", type=int, help="also time the parallel reports with up to this many workers")
+    parser.add_argument("--profiles", action="store_true",
+                        help="also compare inline student details with the profile table")
+    parser.add_argument("--per-student", type=int, default=1, help="enrollments per generated student")
+    args = parser.parse_args()
+
+    if args.file:
+        file_path = args.file
+    else:
+        file_path = os.path.join(tempfile.mkdtemp(prefix="scan_benchmark_"), "zstudents.txt")
+        print(f"Generating {args.size_mb} MB of enrollments in {file_path} ...")
+        rows = generate_file(file_path, args.size_mb, args.per_student)
+        print(f"{rows} rows written")
+
+    # Point the storage layer at the benchmark file (unpartitioned)
+    pms.STUDENTS_FILE = file_path
+    pms.PARTITION_MANIFEST_FILE = file_path + ".no-manifest"
+    pms.PROFILES_FILE = os.path.join(os.path.dirname(file_path), "zprofiles.txt")
+
+    queries = [("TP number (1 row)", 1, "TP00001234"),
+               ("student name (1 row)", 0, "student4321"),
+               ("small trainer (0.1%)", 4, "guest_trainer"),
+               ("large trainer (~25%)", 4, "mary_trainer"),
+               ("unknown trainer (0 rows)", 4, "nobody_trainer")]
+    print(f"\n{'Lookup':<26} {'Rows':>6} {'Line scan':>11} {'mmap scan':>11} {'Speedup':>8}")
+    for label, column, value in queries:
+        expected, line_seconds = timed(line_scan, column, value)
+        found, mmap_seconds = timed(mmap_scan, column, value)
+        if found != expected:
+            print(f"{label}: MISMATCH line scan found {expected}, mmap scan found {found}")
+            continue
+        print(f"{label:<26} {found:>6} {line_seconds:>10.2f}s {mmap_seconds:>10.2f}s "
+              f"{line_seconds / mmap_seconds if mmap_seconds else 0:>7.1f}x")
+
+    if args.workers:
+        print(f"\n{'Workers':>7} {'Income':>9} {'Outstanding':>12} {'Counts':>9}")
+        workers = 1
+        while True:
+            timings = [timed(report, None, workers)[1] for report in
+                       (pms.income_report, pms.outstanding_report, pms.enrollment_count_report)]
+            print(f"{workers:>7} {timings[0]:>8.2f}s {timings[1]:>11.2f}s {timings[2]:>8.2f}s")
+            if workers >= args.workers:
+                break
+            workers = min(workers * 2, args.workers)
+
+    if args.profiles:
+        profile_comparison(file_path)
+
+    if not args.file and not args.keep:
+        os.remove(file_path)
+        os.rmdir(os.path.dirname(file_path))
+
+if __name__ == "__main__":
+    main()
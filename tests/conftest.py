@@ -0,0 +1,38 @@
+"""Shared fixtures: every test runs against its own copy of the seed data files"""
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import programming_management_system as pms
+
+SEED_FILES = ["apu_list.txt", "trainerslist.txt", "trainermodules.txt", "zstudents.txt", "zrequests.txt",
+              "feedback.txt"]
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point every data file path at a fresh copy of the seed files in tmp_path"""
+    for name in SEED_FILES:
+        shutil.copy(os.path.join(REPO_DIR, name), tmp_path)
+    base = getattr(pms, "DATA_DIR", pms.SCRIPT_DIR)
+    for name, value in list(vars(pms).items()):
+        if name.isupper() and name != "SCRIPT_DIR" and isinstance(value, str) \
+                and (value == base or value.startswith(base + os.sep)):
+            monkeypatch.setattr(pms, name, os.path.normpath(os.path.join(tmp_path, os.path.relpath(value, base))))
+    for name, value in vars(pms).items():
+        if name.endswith("_CACHE") and isinstance(value, dict) and "signature" in value:
+            monkeypatch.setitem(value, "signature", None)
+    if hasattr(pms, "reset_caches"):
+        pms.reset_caches()
+    pms.create_files_if_not_exist()
+    yield tmp_path
+    if hasattr(pms, "reset_caches"):
+        pms.reset_caches()
+
+def table_rows(file_path):
+    """Return a data file's non-blank rows without padding or line endings"""
+    return [line.strip() for line in pms.read_lines(file_path) if line.strip()]
@@ -0,0 +1,31 @@
+"""Tests for the incrementally maintained income aggregates"""
+import programming_management_system as pms
+
+
+def test_summary_follows_enrollment_writes(data_dir):
+    assert pms.get_income_summary("john_trainer", "Python Programming", "Beginner") == \
+        {"paid_count": 1, "unpaid_count": 0, "revenue": 150.0, "outstanding": 0.0}
+
+    assert pms.enroll_student("zara_student", "TP55555555", "Python Programming", "Beginner", "john_trainer",
+                              "zara@apu.edu.my", "0123456000", "January", "150.00", "1 Jalan Test")[0]
+    assert pms.pay_outstanding("bob_student")[0]
+    assert pms.remove_student("TP12345678")[0]
+
+    assert pms.get_income_summary("john_trainer", "Python Programming", "Beginner", "January") == \
+        {"paid_count": 0, "unpaid_count": 1, "revenue": 0.0, "outstanding": 150.0}
+    assert pms.get_income_summary("john_trainer", "C++ Programming", "Advanced")["revenue"] == 280.0
+    assert pms.verify_aggregates() == []
+
+def test_new_charges_reprice_the_class(data_dir):
+    assert pms.set_class_details("mary_trainer", "Java Programming", "Beginner", charges="200.00")[0]
+    assert pms.get_income_summary("mary_trainer", "Java Programming", "Beginner")["outstanding"] == 200.0
+    assert pms.verify_aggregates() == []
+
+def test_full_scan_report_matches_the_maintained_totals(data_dir):
+    assert pms.pay_outstanding("bob_student", "April")[0]
+    report = pms.income_report(workers=1)
+    for (trainer, module, level), (paid, unpaid, revenue, outstanding) in report.items():
+        summary = pms.get_income_summary(trainer, module, level)
+        assert (summary["paid_count"], summary["unpaid_count"]) == (paid, unpaid)
+        assert (summary["revenue"], summary["outstanding"]) == (revenue, outstanding)
+    assert report[("john_trainer", "Python Programming", "Beginner")] == [1, 0, 150.0, 0.0]
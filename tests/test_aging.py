@@ -0,0 +1,20 @@
+"""Tests for the receivables aging report"""
+import csv
+
+import programming_management_system as pms
+
+
+def test_unpaid_charges_are_aged_by_month(data_dir, tmp_path):
+    report = pms.aging_report(as_of="April", workers=1)
+    # Unpaid: bob Feb 180 (2 months), james Mar 220 and alice Mar 250 (1 month), bob Apr 280 (current)
+    assert report["total"] == [280.0, 470.0, 180.0, 0.0, 0.0, 0.0, 4]
+    assert report["trainers"]["mary_trainer"] == [0.0, 250.0, 180.0, 0.0, 0.0, 0.0, 2]
+    assert report["debtors"][0][:2] == ["bob_student", "TP23456789"]
+    assert report["students"] == 3
+
+    output = tmp_path / "aging.csv"
+    pms.write_aging_csv(report, str(output))
+    with open(output, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[-1][:3] == ["total", "as of April", ""]
+    assert rows[-1][-2:] == ["930.00", "4"]
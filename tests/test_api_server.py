@@ -0,0 +1,136 @@
+"""Tests for the JSON API server, driven through dispatch without a socket"""
+import asyncio
+import json
+
+import pytest
+
+import api_server
+import programming_management_system as pms
+from conftest import table_rows
+
+
+@pytest.fixture
+def api(data_dir, monkeypatch):
+    """Give each test its own sessions, index and write queue"""
+    monkeypatch.setattr(api_server, "SESSIONS", {})
+    monkeypatch.setattr(api_server, "INDEX", {})
+    monkeypatch.setattr(api_server, "INDEX_STATE", {"signature": None, "events": None, "followers": {}, "lock": None})
+    return data_dir
+
+async def start_api():
+    """Load the index and start the writer task the way run_server does"""
+    api_server.WRITE_QUEUE = asyncio.Queue()
+    api_server.INDEX_STATE["lock"] = asyncio.Lock()
+    await api_server.refresh_index()
+    return asyncio.create_task(api_server.writer_task())
+
+def run_api(scenario):
+    """Run an async scenario against a started API"""
+    async def main():
+        writer = await start_api()
+        try:
+            return await scenario()
+        finally:
+            writer.cancel()
+    return asyncio.run(main())
+
+async def call(method, target, token=None, **params):
+    """Send one request and return (status, payload)"""
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    body = json.dumps(params).encode() if params else b""
+    return await api_server.dispatch(method, target, headers, body)
+
+async def login(email, password="pass123"):
+    """Log in and return the session token"""
+    status, payload = await call("POST", "/login", email=email, password=password)
+    assert status == 200, payload
+    return payload["data"]["token"]
+
+def test_roles_are_enforced(api):
+    async def scenario():
+        assert (await call("GET", "/modules"))[0] == 401
+        assert (await call("POST", "/login", email="alice@apu.edu.my", password="wrong1"))[0] == 401
+        token = await login("alice@apu.edu.my")
+        assert (await call("GET", "/admin/users", token))[0] == 403
+        assert (await call("GET", "/nowhere", token))[0] == 404
+        status, payload = await call("GET", "/modules", token)
+        assert status == 200
+        return payload["data"]
+
+    modules = run_api(scenario)
+    assert ("Python Programming", "Beginner", "john_trainer") in {(m["module"], m["level"], m["trainer"]) for m in modules}
+
+def test_writes_are_visible_to_the_next_read(api):
+    async def scenario():
+        token = await login("alice@apu.edu.my")
+        status, payload = await call("POST", "/student/request", token, module="Web Development", level="Intermediate")
+        assert status == 200, payload
+        status, payload = await call("GET", "/student/requests", token)
+        assert [(r["module"], r["level"]) for r in payload["data"]] == [("Web Development", "Intermediate")]
+
+        status, payload = await call("POST", "/student/pay", token)
+        assert status == 200, payload
+        status, payload = await call("GET", "/student/invoice", token)
+        return payload["data"]
+
+    invoice = run_api(scenario)
+    assert invoice["total_outstanding"] == 0
+    assert {row["status"] for row in invoice["enrollments"]} == {"paid"}
+    assert pms.get_student_invoice("alice_student")[1] == 0
+
+def test_failed_write_returns_the_operation_message(api):
+    async def scenario():
+        token = await login("admin@apu.edu.my", "admin123")
+        return await call("POST", "/admin/register_user", token, username="bob_student",
+                          email="bob2@apu.edu.my", password="pass123", role="d")
+
+    status, payload = run_api(scenario)
+    assert status == 400
+    assert payload == {"ok": False, "error": "Error: Username or email already exists."}
+
+def test_writes_by_other_processes_are_picked_up(api):
+    async def scenario():
+        token = await login("admin@apu.edu.my", "admin123")
+        feedback = (await call("GET", "/admin/feedback", token))[1]["data"]
+        # The menus write the data files directly
+        assert pms.add_feedback("john_trainer", "Room 2 needs a projector")[0]
+        assert pms.add_user("zara_student", "zara@apu.edu.my", "pass123", pms.STUDENT_ROLE)[0]
+        users = (await call("GET", "/admin/users", token))[1]["data"]
+        return feedback, (await call("GET", "/admin/feedback", token))[1]["data"], users
+
+    before, after, users = run_api(scenario)
+    assert len(after) == len(before) + 1
+    assert after[-1].endswith("john_trainer: Room 2 needs a projector")
+    assert "zara_student" in {user["username"] for user in users}
+
+def test_field_separators_are_rejected(api):
+    async def scenario():
+        token = await login("alice@apu.edu.my")
+        status, payload = await call("POST", "/profile", token, password="secret99\nevil,evil@x.com,hacked1,a")
+        assert status == 400, payload
+        assert (await call("POST", "/student/request", token, module="Web,Development", level="Beginner"))[0] == 400
+        trainer = await login("john@apu.edu.my")
+        assert (await call("POST", "/trainer/feedback", trainer, feedback="Fine\nadmin: forged"))[0] == 400
+        assert (await call("POST", "/trainer/feedback", trainer, feedback="Projector, please"))[0] == 200
+        status, payload = await call("POST", "/trainer/update_class", trainer, module="Python Programming",
+                                     level="Beginner", schedule="Mon 9am,extra")
+        assert status == 400, payload
+
+    users = table_rows(pms.USER_FILE)
+    run_api(scenario)
+    assert table_rows(pms.USER_FILE) == users
+    assert not pms.add_user("eve_student", "eve@apu.edu.my", "pass123\nevil", pms.STUDENT_ROLE)[0]
+    assert not pms.add_enrollment_request("alice_student", "Web Development\nmallory", "Beginner")[0]
+    assert table_rows(pms.USER_FILE) == users
+
+def test_registering_a_student_resolves_the_module_name(api):
+    async def scenario():
+        token = await login("sarah@apu.edu.my")
+        return await call("POST", "/lecturer/register_student", token, name="Zara Ali", tp_number="TP55555555",
+                          email="zara@apu.edu.my", contact="0123456000", module="python programming",
+                          level="Beginner", month="March")
+
+    status, payload = run_api(scenario)
+    assert status == 200, payload
+    assert payload["data"]["trainer"] == "john_trainer"
+    assert [fields[2] for fields in pms.iter_enrollments() if fields[1] == "TP55555555"] == ["Python Programming"]
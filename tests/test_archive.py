@@ -0,0 +1,38 @@
+"""Tests for compressed archive segments"""
+import os
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_old_history_moves_into_segments(data_dir):
+    requests = table_rows(pms.REQUESTS_FILE)
+    success, message = pms.archive_history(days=365, codec="lzma")
+    assert success, message
+
+    assert table_rows(pms.REQUESTS_FILE) == requests[:2]
+    assert table_rows(pms.FEEDBACK_FILE) == []
+    assert [",".join(fields) for fields in pms.iter_archive("requests")] == requests[2:]
+    assert [fields[1] for fields in pms.iter_archive("feedback")] == ["john_trainer", "mary_trainer", "alex_trainer",
+                                                                      "jenny_trainer"]
+    assert all(entry["file"].endswith(".xz") and os.path.exists(entry["file"]) for entry in pms.read_archive_index())
+    assert pms.archive_history(days=365)[0] is False
+
+def test_deleted_enrollments_stay_in_the_reports(data_dir):
+    assert pms.remove_student("TP23456789")[0]
+    assert pms.remove_student("TP56789012")[0]
+    assert [fields[0] for fields in pms.iter_archive("enrollments")] == ["bob_student", "bob_student", "lisa_student"]
+    assert ("jenny_trainer", "Database Systems", "Beginner") not in pms.income_report(workers=1)
+    assert pms.income_report(workers=1, archived=True)[("jenny_trainer", "Database Systems", "Beginner")][0] == 1
+
+def test_deleted_enrollments_are_folded_into_one_segment(data_dir):
+    assert pms.remove_student("TP23456789")[0]
+    assert pms.remove_student("TP56789012")[0]
+    assert pms.archive_segments("enrollments") == []
+
+    success, message = pms.archive_history(days=100000)
+    assert success and message.endswith("Folded 3 deleted enrollments into a segment."), message
+    assert table_rows(pms.ARCHIVE_DELETED_FILE) == []
+    assert [entry["rows"] for entry in pms.archive_segments("enrollments")] == [3]
+    assert [fields[0] for fields in pms.iter_archive("enrollments")] == ["bob_student", "bob_student", "lisa_student"]
+    assert pms.income_report(workers=1, archived=True)[("jenny_trainer", "Database Systems", "Beginner")][0] == 1
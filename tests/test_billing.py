@@ -0,0 +1,37 @@
+"""Tests for the monthly billing cycle"""
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_billing_rolls_students_into_the_next_month(data_dir):
+    assert pms.mark_completed("TP34567890")[0]
+    assert pms.set_class_details("john_trainer", "Python Programming", "Beginner", charges="175.00")[0]
+    success, message = pms.run_billing_cycle("January", "February")
+    assert success, message
+
+    february = [row for row in table_rows(pms.STUDENTS_FILE) if ",February," in row]
+    assert february[-1] == ("alice_student,TP12345678,Python Programming,Beginner,john_trainer,alice@apu.edu.my,"
+                            "0123456789,February,175.00,unpaid,STU0008,123 Main St KL")
+    assert len(february) == 3
+    assert pms.verify_aggregates() == []
+
+def test_fsck_is_clean_after_a_billing_cycle(data_dir):
+    success, message = pms.run_billing_cycle("January", "February")
+    assert success, message
+    rows = table_rows(pms.STUDENTS_FILE)
+
+    report = pms.run_fsck()
+    assert report["errors"] == 0, report["issues"]
+
+    report = pms.run_fsck(repair=True)
+    assert report["repairs"] == {}
+    assert table_rows(pms.STUDENTS_FILE) == rows
+
+def test_billing_cycle_runs_once_per_period(data_dir):
+    success, message = pms.run_billing_cycle("January", "February")
+    assert success and message.startswith("Billed"), message
+    rows = table_rows(pms.STUDENTS_FILE)
+
+    success, message = pms.run_billing_cycle("January", "February")
+    assert success and message.startswith("Nothing to bill"), message
+    assert table_rows(pms.STUDENTS_FILE) == rows
@@ -0,0 +1,30 @@
+"""Tests for bulk user registration"""
+import csv
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_bulk_import_skips_duplicates_and_invalid_rows(data_dir, tmp_path):
+    source = tmp_path / "new_users.csv"
+    source.write_text("username,email,password,role\n"
+                      "zara_student,zara@apu.edu.my,pass123,student\n"
+                      "zara_student,zara2@apu.edu.my,pass123,d\n"
+                      "nina,ALICE@apu.edu.my,pass123,d\n"
+                      "tom_trainer,tom@apu.edu.my,123,b\n"
+                      "ken_lecturer,ken@apu.edu.my,pass123,c\n")
+    reject_file = tmp_path / "rejected.csv"
+    users = table_rows(pms.USER_FILE)
+
+    success, message = pms.bulk_add_users(str(source), str(reject_file))
+    assert success, message
+    assert message.startswith("Registered 2 users, rejected 3.")
+    assert table_rows(pms.USER_FILE) == users + ["zara_student,zara@apu.edu.my,pass123,d",
+                                                 "ken_lecturer,ken@apu.edu.my,pass123,c"]
+    with open(reject_file, newline="") as f:
+        reasons = [row[-1] for row in csv.reader(f)][1:]
+    assert reasons == ["username already exists", "email already exists",
+                       "password must be at least 6 characters long"]
+
+def test_bulk_import_of_a_missing_file(data_dir, tmp_path):
+    assert pms.bulk_add_users(str(tmp_path / "missing.csv")) == (False, f"File not found: {tmp_path / 'missing.csv'}")
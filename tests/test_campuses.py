@@ -0,0 +1,37 @@
+"""Tests for campus data shards"""
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_moving_a_trainer_to_another_campus(data_dir, monkeypatch):
+    monkeypatch.setattr(pms, "CURRENT_CAMPUS", None)
+    assert pms.add_campus("north")[0]
+    assert not pms.add_campus("north")[0]
+    assert not pms.add_campus("../elsewhere")[0]
+    assert pms.list_campuses() == ["north"]
+    users = table_rows(pms.USER_FILE)
+
+    assert pms.add_campus("south")[0]
+    with pms.on_campus("north"):
+        assert pms.add_user("nina_trainer", "nina@apu.edu.my", "pass123", pms.TRAINER_ROLE)[0]
+        assert pms.add_user("zara_student", "zara@apu.edu.my", "pass123", pms.STUDENT_ROLE)[0]
+        assert pms.add_trainer("nina_trainer")[0]
+        assert pms.assign_trainer_module("Rust Programming", "nina_trainer", "Beginner", "210.00")[0]
+        assert pms.enroll_student("zara_student", "TP55555555", "Rust Programming", "Beginner", "nina_trainer",
+                                  "zara@apu.edu.my", "0123456000", "March", "210.00", "1 Jalan Test")[0]
+    assert "nina_trainer" not in pms.load_trainer_roster()
+
+    success, message = pms.move_trainer("nina_trainer", "north", "south")
+    assert success, message
+    with pms.on_campus("north"):
+        assert list(pms.load_trainer_roster()) == []
+        assert list(pms.iter_enrollments()) == []
+        assert [row.split(",")[0] for row in table_rows(pms.USER_FILE)] == ["admin"]
+    with pms.on_campus("south"):
+        assert list(pms.load_trainer_roster()) == ["nina_trainer"]
+        assert [fields[0] for fields in pms.iter_enrollments()] == ["zara_student"]
+        assert pms.get_income_summary("nina_trainer", "Rust Programming", "Beginner")["unpaid_count"] == 1
+    assert pms.CURRENT_CAMPUS is None
+    assert table_rows(pms.USER_FILE) == users
+
+    assert pms.fan_out(pms.read_trainers) == {"north": [], "south": ["nina_trainer"]}
@@ -0,0 +1,20 @@
+"""Tests for the module catalog and fuzzy module matching"""
+import programming_management_system as pms
+
+
+def test_module_names_resolve_to_the_catalog_spelling(data_dir):
+    assert pms.resolve_module("  python   PROGRAMMING ") == "Python Programming"
+    assert pms.resolve_module("Rust Programming") is None
+    assert pms.suggest_modules("Pyhton Programing")[0] == "Python Programming"
+    assert pms.suggest_modules("java") == ["Java Programming"]
+    assert [entry["trainer"] for entry in pms.find_classes("web development", "Intermediate")] == ["alex_trainer"]
+
+def test_catalog_follows_the_class_file(data_dir):
+    assert pms.find_class("nina_trainer", "rust programming", "Beginner") is None
+    assert pms.add_trainer("nina_trainer")[0]
+    assert pms.assign_trainer_module("Rust Programming", "nina_trainer", "Beginner", "210.00")[0]
+    assert pms.find_class("nina_trainer", "rust programming", "Beginner")["charges"] == "210.00"
+
+def test_requests_use_the_catalog_spelling(data_dir):
+    assert pms.add_enrollment_request("alice_student", "web  development", "Intermediate")[0]
+    assert pms.read_lines(pms.REQUESTS_FILE)[-1].startswith("alice_student,Web Development,Intermediate,pending,")
@@ -0,0 +1,26 @@
+"""Tests for the tail-following admin dashboard"""
+import programming_management_system as pms
+
+
+def test_refresh_reads_only_new_lines(data_dir):
+    dashboard = pms.refresh_dashboard(pms.new_dashboard())
+    assert len(dashboard["requests"]["totals"]["pending"]) == 2
+
+    assert pms.add_enrollment_request("alice_student", "Web Development", "Intermediate")[0]
+    assert pms.add_feedback("john_trainer", "Room 2 needs a projector")[0]
+    dashboard = pms.refresh_dashboard(dashboard)
+    assert len(dashboard["requests"]["totals"]["pending"]) == 3
+    assert dashboard["feedback"]["totals"]["count"] == 5
+    assert dashboard["feedback"]["totals"]["latest"][-1].endswith("john_trainer: Room 2 needs a projector")
+    assert dashboard["lines_read"] < 10
+
+def test_payments_and_rewrites_are_picked_up(data_dir):
+    dashboard = pms.refresh_dashboard(pms.new_dashboard())
+    assert pms.pay_outstanding("bob_student")[0]
+    assert pms.process_request(1, False)[0]
+    dashboard = pms.refresh_dashboard(dashboard)
+
+    lines = pms.format_dashboard(dashboard)
+    assert "Pending requests: 1 " in lines[3]
+    assert "Today's payments: 1 (RM460.00)" in lines[3]
+    assert "Outstanding: RM470.00" in lines[3]
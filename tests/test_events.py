@@ -0,0 +1,60 @@
+"""Tests for the event log and its replay"""
+import os
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_approving_a_request_for_a_removed_class_fails(data_dir):
+    success, message = pms.remove_class("mary_trainer", "Data Structures", "Intermediate")
+    assert success, message
+    enrollments = table_rows(pms.STUDENTS_FILE)
+
+    assert pms.process_request(1, True) == (False, "Class no longer exists.")
+    assert table_rows(pms.REQUESTS_FILE)[0].split(",")[3] == "pending"
+    assert table_rows(pms.STUDENTS_FILE) == enrollments
+
+def make_changes():
+    """Run a mix of operations that each log an event"""
+    assert pms.add_trainer("nina_trainer")[0]
+    assert pms.assign_trainer_module("Rust Programming", "nina_trainer", "Beginner", "210.00")[0]
+    assert pms.enroll_student("zara_student", "TP55555555", "Rust Programming", "Beginner", "nina_trainer",
+                              "zara@apu.edu.my", "0123456000", "March", "210.00", "1 Jalan Test")[0]
+    assert pms.add_enrollment_request("zara_student", "Java Programming", "Beginner")[0]
+    assert pms.process_request(len(pms.read_lines(pms.REQUESTS_FILE)), True)[0]
+    assert pms.pay_outstanding("zara_student")[0]
+    assert pms.add_feedback("nina_trainer", "Projector in room 3 is broken")[0]
+    assert pms.remove_student("TP23456789")[0]
+
+def test_replay_matches_the_live_tables(data_dir, tmp_path_factory):
+    make_changes()
+    output_dir = tmp_path_factory.mktemp("replayed")
+    success, message = pms.run_event_replay(str(output_dir))
+    assert success, message
+
+    for table in pms.TABLE_SCHEMAS:
+        live = pms.table_file(table)
+        assert table_rows(os.path.join(output_dir, os.path.basename(live))) == table_rows(live), table
+
+def test_replay_in_place_leaves_the_tables_unchanged(data_dir):
+    make_changes()
+    before = {table: table_rows(pms.table_file(table)) for table in pms.TABLE_SCHEMAS}
+    success, message = pms.run_event_replay()
+    assert success, message
+    assert {table: table_rows(pms.table_file(table)) for table in pms.TABLE_SCHEMAS} == before
+
+def test_passwords_stay_out_of_the_event_log(data_dir, tmp_path_factory):
+    assert pms.add_user("zara_student", "zara@apu.edu.my", "zarasecret", pms.STUDENT_ROLE)[0]
+    assert pms.update_user_profile("alice_student", new_password="alicesecret")[0]
+    csv_file = data_dir / "new_users.csv"
+    csv_file.write_text("nina_trainer,nina@apu.edu.my,ninasecret,b\n")
+    assert pms.bulk_add_users(str(csv_file))[0]
+
+    with open(pms.EVENTS_FILE) as f:
+        log = f.read()
+    for password in ("zarasecret", "alicesecret", "ninasecret"):
+        assert password not in log
+
+    output_dir = tmp_path_factory.mktemp("replayed")
+    assert pms.run_event_replay(str(output_dir))[0]
+    assert table_rows(os.path.join(output_dir, os.path.basename(pms.USER_FILE))) == table_rows(pms.USER_FILE)
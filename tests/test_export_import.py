@@ -0,0 +1,32 @@
+"""Tests for streaming table export and import"""
+import os
+
+import pytest
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+@pytest.mark.parametrize("export_format,compress", [("csv", False), ("jsonl", True), ("columnar", False)])
+def test_export_and_import_round_trip(data_dir, tmp_path_factory, export_format, compress):
+    output_dir = str(tmp_path_factory.mktemp("exports"))
+    rows = table_rows(pms.STUDENTS_FILE)
+
+    success, file_path = pms.export_table("enrollments", export_format, output_dir, compress)
+    assert success, file_path
+    assert os.path.exists(file_path)
+
+    pms.write_lines(pms.STUDENTS_FILE, [])
+    success, message = pms.import_table("enrollments", file_path)
+    assert success, message
+    assert table_rows(pms.STUDENTS_FILE) == rows
+
+def test_import_can_append(data_dir, tmp_path_factory):
+    output_dir = str(tmp_path_factory.mktemp("exports"))
+    rows = table_rows(pms.REQUESTS_FILE)
+    success, file_path = pms.export_table("requests", "jsonl", output_dir)
+    assert success, file_path
+
+    success, message = pms.import_table("requests", file_path, append=True)
+    assert success, message
+    assert table_rows(pms.REQUESTS_FILE) == rows + rows
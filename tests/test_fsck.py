@@ -0,0 +1,30 @@
+"""Tests for the integrity checker and its repairs"""
+import programming_management_system as pms
+from conftest import table_rows
+
+BROKEN_ENROLLMENT = ("zara_student,TP55555555,Python Programming,Beginner,john_trainer,zara@apu.edu.my,"
+                     "0123456000,January,150.00,paid,STU0001,1 Jalan Test")
+
+
+def test_seed_data_has_no_errors(data_dir):
+    report = pms.run_fsck(workers=1)
+    assert report["errors"] == 0, report["issues"]
+    assert report["files"]["zstudents.txt"]["rows"] == 7
+
+def test_repair_fixes_only_the_reported_rows(data_dir):
+    pms.append_line(pms.STUDENTS_FILE, BROKEN_ENROLLMENT + "\n")
+    pms.append_line(pms.USER_FILE, "broken_row\n")
+    users = table_rows(pms.USER_FILE)
+    enrollments = table_rows(pms.STUDENTS_FILE)
+
+    report = pms.run_fsck(workers=2)
+    assert report["summary"]["bad_row"] == 1
+    assert report["summary"]["duplicate_student_id"] == 1
+    assert table_rows(pms.USER_FILE) == users
+
+    report = pms.run_fsck(repair=True, workers=1)
+    assert report["repairs"] == {"users_quarantined": 1, "student_ids_reassigned": 1}
+    assert table_rows(pms.USER_FILE) == users[:-1]
+    assert table_rows(pms.STUDENTS_FILE) == enrollments[:-1] + [BROKEN_ENROLLMENT.replace("STU0001", "STU0008")]
+    assert "broken_row" in open(pms.FSCK_QUARANTINE_FILE).read()
+    assert pms.run_fsck(workers=1)["errors"] == 0
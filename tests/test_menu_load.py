@@ -0,0 +1,14 @@
+"""Tests for the scripted menu load tester"""
+import os
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+
+def test_short_load_run_finds_no_problems(data_dir):
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "menu_load_test.py"), "--users", "4",
+                             "--sessions", "2", "--actions", "3", "--data-dir", str(data_dir)],
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert " 0 problem(s)" in result.stdout
@@ -0,0 +1,17 @@
+"""Tests for the mmap single-column scan path"""
+import programming_management_system as pms
+
+
+def test_scan_matches_whole_fields_only(data_dir):
+    rows = list(pms.scan_records(pms.STUDENTS_FILE, 1, "TP12345678", min_fields=12))
+    assert [fields[2] for fields in rows] == ["Python Programming", "Java Programming"]
+    assert list(pms.scan_records(pms.STUDENTS_FILE, 1, "TP1234567")) == []
+    assert [fields[1] for fields in pms.scan_records(pms.STUDENTS_FILE, 0, "bob_student")] == ["TP23456789"] * 2
+    assert list(pms.scan_records(pms.STUDENTS_FILE, 0, "alice_student,TP12345678")) == []
+
+def test_scan_sees_staged_writes(data_dir):
+    with pms.transaction():
+        assert pms.enroll_student("zara_student", "TP55555555", "Python Programming", "Beginner", "john_trainer",
+                                  "zara@apu.edu.my", "0123456000", "January", "150.00", "1 Jalan Test")[0]
+        assert [fields[0] for fields in pms.find_enrollments(1, "TP55555555")] == ["zara_student"]
+    assert [fields[0] for fields in pms.find_enrollments(1, "TP55555555")] == ["zara_student"]
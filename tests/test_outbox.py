@@ -0,0 +1,40 @@
+"""Tests for the notification outbox"""
+import os
+
+import programming_management_system as pms
+
+
+def test_decisions_are_delivered_once(data_dir, monkeypatch):
+    monkeypatch.setattr(pms, "NOTIFY_SINKS", ["spool", "drop"])
+    assert pms.process_request(1, False)[0]
+    assert pms.pay_outstanding("bob_student")[0]
+    assert pms.outbox_status()["queued"] == 2
+
+    assert pms.drain_outbox() == {"delivered": 2, "duplicate": 0, "retrying": 0, "failed": 0}
+    assert pms.outbox_status()["queued"] == 0
+    with open(os.path.join(pms.MAIL_SPOOL_DIR, "emma_student")) as f:
+        assert "Subject: Enrollment request rejected" in f.read()
+    assert len(os.listdir(pms.NOTIFY_DROP_DIR)) == 2
+
+    # A batch read again after a crash is not sent twice
+    state = pms.load_outbox_state()
+    state["offset"] = 0
+    pms.save_outbox_state(state)
+    assert pms.drain_outbox() == {"delivered": 0, "duplicate": 2, "retrying": 0, "failed": 0}
+
+def test_a_failing_sink_is_retried_then_dead_lettered(data_dir, monkeypatch):
+    def broken(record, recipients):
+        raise OSError("mail server down")
+
+    monkeypatch.setitem(pms.NOTIFICATION_SINKS, "broken", broken)
+    monkeypatch.setattr(pms, "NOTIFY_SINKS", ["broken"])
+    monkeypatch.setattr(pms, "NOTIFY_RETRY_SECONDS", 0)
+    assert pms.add_feedback("john_trainer", "The lab printer is out of toner")[0]
+
+    assert pms.drain_outbox()["retrying"] == 1
+    for _ in range(pms.NOTIFY_MAX_ATTEMPTS - 2):
+        assert pms.deliver_notifications()["retrying"] == 1
+    assert pms.deliver_notifications()["failed"] == 1
+    status = pms.outbox_status()
+    assert (status["retrying"], status["dead"]) == (0, 1)
+    assert "mail server down" in status["dead_letters"][0]["error"]
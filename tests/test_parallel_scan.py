@@ -0,0 +1,25 @@
+"""Tests for the multi-core chunked scanner"""
+import programming_management_system as pms
+
+
+def add_enrollments(count):
+    rows = [[f"student{i}", f"TP9{i:07d}", "Python Programming", "Beginner", "john_trainer", f"s{i}@apu.edu.my",
+             "0123456000", pms.MONTHS[i % 12], "150.00", "paid" if i % 3 else "unpaid", f"STU9{i:04d}", "KL"]
+            for i in range(count)]
+    pms.append_line(pms.STUDENTS_FILE, "".join(",".join(row) + "\n" for row in rows))
+
+def test_chunked_scan_matches_a_single_pass(data_dir, monkeypatch):
+    add_enrollments(500)
+    expected = pms.income_report(workers=1)
+    monkeypatch.setattr(pms, "SCAN_CHUNK_BYTES", 4096)
+    assert len(pms.chunk_ranges(pms.STUDENTS_FILE, 4096)) > 1
+    assert pms.income_report(workers=2) == expected
+    assert expected[("john_trainer", "Python Programming", "Beginner")][:2] == [334, 167]
+
+def test_reports_can_be_limited_to_months(data_dir):
+    counts = pms.enrollment_count_report(months=["jan", "feb"], workers=1)
+    assert counts == {("Python Programming", "Beginner", "January"): [1, 1],
+                      ("Python Programming", "Intermediate", "January"): [1, 1],
+                      ("Java Programming", "Beginner", "February"): [1, 0],
+                      ("Database Systems", "Beginner", "February"): [1, 1]}
+    assert pms.outstanding_report(workers=1)[0] == ("bob_student", "TP23456789", 2, 460.0)
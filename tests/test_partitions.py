@@ -0,0 +1,48 @@
+"""Regression tests for month-partitioned enrollment storage"""
+import os
+
+import pytest
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def enrollment_rows():
+    """Return every enrollment row, in a stable order"""
+    return sorted(",".join(fields) for fields in pms.iter_enrollments())
+
+def test_migrate_and_merge_round_trip(data_dir):
+    rows = enrollment_rows()
+    stored = sorted(table_rows(pms.STUDENTS_FILE))
+
+    success, message = pms.migrate_to_partitions()
+    assert success, message
+    assert pms.partitions_enabled()
+    assert table_rows(pms.STUDENTS_FILE) == []
+    assert os.path.exists(pms.STUDENTS_FILE + ".premigration")
+    assert enrollment_rows() == rows
+
+    success, message = pms.merge_partitions()
+    assert success, message
+    assert not pms.partitions_enabled()
+    assert not os.path.exists(pms.PARTITION_MANIFEST_FILE)
+    assert sorted(table_rows(pms.STUDENTS_FILE)) == stored
+    assert enrollment_rows() == rows
+
+def test_failed_merge_leaves_the_partitions(data_dir, monkeypatch):
+    assert pms.migrate_to_partitions()[0]
+    manifest = pms.read_partition_manifest()
+    rows = enrollment_rows()
+
+    def fail(file_path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pms, "remove_file", fail)
+    with pytest.raises(OSError):
+        pms.merge_partitions()
+
+    assert pms.partitions_enabled()
+    assert pms.read_partition_manifest() == manifest
+    assert table_rows(pms.STUDENTS_FILE) == []
+    assert all(os.path.exists(entry["file"]) for entry in manifest.values())
+    assert enrollment_rows() == rows
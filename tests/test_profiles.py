@@ -0,0 +1,32 @@
+"""Tests for the student profile table"""
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def enrollment_rows():
+    return sorted(",".join(fields) for fields in pms.iter_enrollments())
+
+def test_migrate_and_inline_round_trip(data_dir):
+    rows = enrollment_rows()
+    stored = table_rows(pms.STUDENTS_FILE)
+
+    success, message = pms.migrate_to_profiles()
+    assert success, message
+    assert pms.profiles_enabled()
+    assert table_rows(pms.STUDENTS_FILE)[0] == ",TP12345678,Python Programming,Beginner,john_trainer,,,January,150.00,paid,STU0001,"
+    assert sorted(",".join(pms.expand_enrollment(fields, pms.load_profiles())) for fields in pms.iter_enrollments()) == rows
+    assert [fields[10] for fields in pms.find_enrollments(0, "alice_student")] == ["STU0001", "STU0006"]
+
+    success, message = pms.inline_profiles()
+    assert success, message
+    assert not pms.profiles_enabled()
+    assert table_rows(pms.STUDENTS_FILE) == stored
+
+def test_contact_update_writes_the_profile_only(data_dir):
+    assert pms.migrate_to_profiles()[0]
+    stored = table_rows(pms.STUDENTS_FILE)
+
+    assert pms.update_student_profile("TP12345678", email="alice.new@apu.edu.my")[0]
+    assert table_rows(pms.STUDENTS_FILE) == stored
+    assert pms.student_profile("TP12345678") == ["alice_student", "alice.new@apu.edu.my", "0123456789", "123 Main St KL"]
+    assert {fields[5] for fields in pms.find_enrollments(1, "TP12345678")} == {"alice.new@apu.edu.my"}
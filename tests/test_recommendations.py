@@ -0,0 +1,33 @@
+"""Tests for co-enrollment recommendations"""
+import programming_management_system as pms
+
+
+def test_recommendations_follow_co_enrollment(data_dir):
+    # Zara shares Python Beginner with Alice, so Zara's other class is Alice's best neighbour
+    for module, level, trainer in [("Python Programming", "Beginner", "john_trainer"),
+                                   ("Web Development", "Intermediate", "alex_trainer")]:
+        assert pms.enroll_student("zara_student", "TP55555555", module, level, trainer, "zara@apu.edu.my",
+                                  "0123456000", "March", "150.00", "1 Jalan Test")[0]
+    recommendations = pms.recommend_modules("alice_student", limit=3)
+    assert recommendations[0][:2] == ("Web Development", "Intermediate")
+    assert recommendations[0][2] > 0
+    taken = pms.student_classes("alice_student")
+    assert all((module, level) not in taken for module, level, score in recommendations)
+    assert len(recommendations) == 3
+
+def test_model_is_rebuilt_when_the_enrollments_change(data_dir):
+    pms.load_recommendation_model()
+    assert pms.rebuild_recommendations() == (True, "Recommendations are already up to date.")
+    assert pms.enroll_student("zara_student", "TP55555555", "Web Development", "Intermediate", "alex_trainer",
+                              "zara@apu.edu.my", "0123456000", "March", "220.00", "1 Jalan Test")[0]
+    success, message = pms.rebuild_recommendations()
+    assert success and message.startswith("Recommendations rebuilt from 6 students"), message
+
+def test_students_with_the_same_name_are_kept_apart(data_dir):
+    for tp_number, module, level, trainer in [("TP55555555", "Rust Programming", "Beginner", "nina_trainer"),
+                                              ("TP66666666", "Go Programming", "Beginner", "nina_trainer")]:
+        assert pms.enroll_student("Lee Wei", tp_number, module, level, trainer, "lee@apu.edu.my",
+                                  "0123456000", "March", "150.00", "1 Jalan Test")[0]
+    model = pms.build_recommendation_model()
+    assert "Rust Programming|Beginner" not in model["neighbors"]
+    assert "Go Programming|Beginner" not in model["neighbors"]
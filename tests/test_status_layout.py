@@ -0,0 +1,26 @@
+"""Tests for fixed-width status columns"""
+import os
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_status_flips_are_written_in_place(data_dir):
+    enrollments = table_rows(pms.STUDENTS_FILE)
+    success, message = pms.pad_status_columns()
+    assert success, message
+    assert table_rows(pms.STUDENTS_FILE) == enrollments
+    size = os.path.getsize(pms.STUDENTS_FILE)
+    inode = os.stat(pms.STUDENTS_FILE).st_ino
+
+    assert pms.pay_outstanding("bob_student")[0]
+    assert pms.process_request(1, False)[0]
+    assert (os.path.getsize(pms.STUDENTS_FILE), os.stat(pms.STUDENTS_FILE).st_ino) == (size, inode)
+    assert [fields[9] for fields in pms.find_enrollments(0, "bob_student")] == ["paid", "paid"]
+    assert table_rows(pms.REQUESTS_FILE)[0].startswith("emma_student,Data Structures,Intermediate,rejected,2024-01-15 10:30:00")
+
+    success, message = pms.unpad_status_columns()
+    assert success, message
+    assert table_rows(pms.STUDENTS_FILE) == [row.replace("unpaid", "paid") if row.startswith("bob_student") else row
+                                             for row in enrollments]
+    assert all(line == line.rstrip() + "\n" for line in pms.read_lines(pms.STUDENTS_FILE))
@@ -0,0 +1,24 @@
+"""Tests for the append-only trainer roster"""
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_removal_appends_a_tombstone(data_dir):
+    assert pms.add_trainer("nina_trainer")[0]
+    assert not pms.add_trainer("nina_trainer")[0]
+    assert pms.remove_trainer("alex_trainer")[0]
+    assert not pms.remove_trainer("alex_trainer")[0]
+
+    assert table_rows(pms.TRAINERS_FILE)[-2:] == ["nina_trainer", "-alex_trainer"]
+    assert list(pms.load_trainer_roster()) == ["john_trainer", "mary_trainer", "jenny_trainer", "nina_trainer"]
+    assert pms.read_trainers() == ["john_trainer", "mary_trainer", "jenny_trainer", "nina_trainer"]
+    assert pms.search_trainers("J") == ["jenny_trainer", "john_trainer"]
+
+def test_names_that_look_like_tombstones_are_rejected(data_dir):
+    assert not pms.add_trainer("-john_trainer")[0]
+    assert "john_trainer" in pms.load_trainer_roster()
+
+def test_compaction_keeps_the_live_trainers(data_dir):
+    assert pms.remove_trainer("mary_trainer")[0]
+    assert pms.compact_trainer_roster()[0]
+    assert table_rows(pms.TRAINERS_FILE) == ["john_trainer", "alex_trainer", "jenny_trainer"]
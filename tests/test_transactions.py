@@ -0,0 +1,41 @@
+"""Tests for journaled multi-file transactions"""
+import os
+
+import pytest
+
+import programming_management_system as pms
+from conftest import table_rows
+
+
+def test_a_failed_transaction_changes_nothing(data_dir):
+    users = table_rows(pms.USER_FILE)
+    trainers = table_rows(pms.TRAINERS_FILE)
+    with pytest.raises(RuntimeError):
+        with pms.transaction():
+            assert pms.add_user("zara_student", "zara@apu.edu.my", "pass123", "d")[0]
+            assert pms.add_trainer("nina_trainer")[0]
+            # Staged writes are visible inside the transaction
+            assert "nina_trainer" in pms.load_trainer_roster()
+            raise RuntimeError("abort")
+
+    assert table_rows(pms.USER_FILE) == users
+    assert table_rows(pms.TRAINERS_FILE) == trainers
+    assert "nina_trainer" not in pms.load_trainer_roster()
+    assert not os.path.exists(pms.JOURNAL_FILE)
+
+def test_recovery_finishes_a_committed_journal(data_dir, monkeypatch):
+    def crash(entries):
+        raise SystemExit("crashed while applying the journal")
+
+    with monkeypatch.context() as m:
+        m.setattr(pms, "apply_journal", crash)
+        with pytest.raises(SystemExit):
+            with pms.transaction():
+                pms.add_trainer("nina_trainer")
+                pms.add_user("nina_trainer", "nina@apu.edu.my", "pass123", "b")
+    assert os.path.exists(pms.JOURNAL_FILE)
+
+    pms.recover_transactions()
+    assert not os.path.exists(pms.JOURNAL_FILE)
+    assert table_rows(pms.TRAINERS_FILE)[-1] == "nina_trainer"
+    assert table_rows(pms.USER_FILE)[-1] == "nina_trainer,nina@apu.edu.my,pass123,b"
@@ -0,0 +1,22 @@
+"""Tests for the request trend series"""
+import programming_management_system as pms
+
+
+def test_daily_series_fills_gaps_and_counts_decisions(data_dir):
+    pms.append_line(pms.REQUESTS_FILE, "alice_student,Web Development,Intermediate,pending,2024-01-18 09:00:00\n")
+    rows = pms.request_trends("day", window=3)
+    assert [row["bucket"] for row in rows] == ["2024-01-13", "2024-01-14", "2024-01-15", "2024-01-16",
+                                               "2024-01-17", "2024-01-18"]
+    assert [row["requested"] for row in rows] == [1, 1, 1, 1, 0, 1]
+    assert rows[0]["rejected"] == 1 and rows[1]["approved"] == 1
+    assert rows[-2]["rolling_requested"] == 2 / 3
+
+def test_series_follow_new_requests_and_decisions(data_dir):
+    before = pms.request_trends_by_class().get(("Web Development", "Intermediate"), [0, 0, 0, 0.0, 0])
+    assert pms.add_enrollment_request("alice_student", "Web Development", "Intermediate")[0]
+    number = len(pms.read_lines(pms.REQUESTS_FILE))
+    assert pms.process_request(number, True)[0]
+
+    requested, approved, rejected, latency, decided = pms.request_trends_by_class()[("Web Development", "Intermediate")]
+    assert (requested, approved, decided) == (before[0] + 1, before[1] + 1, before[4] + 1)
+    assert pms.request_trends("month", "web development")[-1]["approved"] == 1
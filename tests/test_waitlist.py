@@ -0,0 +1,25 @@
+"""Tests for class capacities and the waitlist"""
+import programming_management_system as pms
+
+
+def enroll(name, tp_number, tier=pms.DEFAULT_WAITLIST_TIER):
+    return pms.enroll_student(name, tp_number, "Python Programming", "Beginner", "john_trainer",
+                              f"{name}@apu.edu.my", "0123456000", "January", "150.00", "1 Jalan Test", tier)
+
+def test_a_full_class_waitlists_and_promotes_by_tier(data_dir):
+    assert pms.set_class_details("john_trainer", "Python Programming", "Beginner", capacity="2")[0]
+    assert enroll("zara", "TP55555555")[0]
+
+    success, message = enroll("yuki", "TP66666666")
+    assert not success and "waitlist at position 1" in message
+    success, message = enroll("xena", "TP77777777", tier="1")
+    assert not success and "waitlist at position 1" in message
+    assert [fields[7] for fields in pms.get_waitlist("john_trainer", "Python Programming", "Beginner")] == ["xena", "yuki"]
+
+    success, message = pms.remove_student("TP55555555")
+    assert success and message.endswith("Promoted from waitlist: xena."), message
+    assert [fields[7] for fields in pms.get_waitlist("john_trainer", "Python Programming", "Beginner")] == ["yuki"]
+
+    assert pms.set_class_details("john_trainer", "Python Programming", "Beginner", capacity="")[0]
+    assert pms.get_waitlist("john_trainer", "Python Programming", "Beginner") == []
+    assert pms.class_occupancy("john_trainer", "Python Programming", "Beginner") == 3
@@ -0,0 +1,19 @@
+"""Tests for trainer workload analytics"""
+import programming_management_system as pms
+
+
+def test_schedules_are_parsed_into_weekly_slots(data_dir):
+    assert pms.parse_schedule("Monday 2-4 PM") == [(0, 14, 16)]
+    assert pms.parse_schedule("Tue & Thu 10:30am - 12pm") == [(1, 10.5, 12), (3, 10.5, 12)]
+    assert pms.parse_schedule("TBD") == []
+
+def test_workload_sums_classes_hours_and_revenue(data_dir):
+    assert pms.set_class_details("john_trainer", "Python Programming", "Intermediate", schedule="Wednesday 9-11 AM")[0]
+    assert pms.set_class_details("john_trainer", "C++ Programming", "Advanced", schedule="TBD")[0]
+    workload = pms.trainer_workload()["john_trainer"]
+    assert len(workload["classes"]) == 3
+    assert workload["students"] == 3
+    assert workload["weekly_hours"] == 4
+    assert workload["revenue"] == 350.0
+    assert workload["unscheduled"] == 1
+    assert (0, 14, 16) not in workload["idle"] and (0, 9, 14) in workload["idle"]